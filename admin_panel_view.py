@@ -2,11 +2,17 @@
 
 import customtkinter
 from db_manager import DBManager, Guest, Room
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 from datetime import datetime, date
+from widgets import VirtualTable
+from data_export import export_reservations
 
 
 class AdminPanelView(customtkinter.CTkFrame):
+    RESERVATION_PAGE_SIZE = 100
+    GUEST_SEARCH_LIMIT = 100
+    GUEST_SEARCH_DEBOUNCE_MS = 250
+
     def __init__(self, master, db_manager, app_controller):
         super().__init__(master)
         self.db_manager = db_manager
@@ -16,7 +22,7 @@ class AdminPanelView(customtkinter.CTkFrame):
         customtkinter.CTkLabel(self, text="Hotel Administration Panel", font=customtkinter.CTkFont(
             size=20, weight="bold")).grid(row=0, column=0, padx=20, pady=10, sticky="w")
 
-        self.tab_view = customtkinter.CTkTabview(self)
+        self.tab_view = customtkinter.CTkTabview(self, command=self._on_tab_selected)
         self.tab_view.grid(row=1, column=0, padx=20, pady=10, sticky="nsew")
         self.grid_rowconfigure(1, weight=1)
 
@@ -41,11 +47,47 @@ class AdminPanelView(customtkinter.CTkFrame):
         self.tab_view.tab("Reporting").grid_columnconfigure(0, weight=1)
         self.tab_view.tab("Reporting").grid_rowconfigure(1, weight=1)
 
-        self._setup_guest_management_tab()
-        self._setup_room_management_tab()
-        self._setup_housekeeping_tab()
-        self._setup_reservation_tab()
-        self._setup_reporting_tab()
+        # A tab's widgets are built, and its data first loaded, only when the
+        # tab is first shown (see show_selected_tab), so opening the panel
+        # costs one tab however large the database is.
+        self._tab_setups = {
+            "Guest Management": self._setup_guest_management_tab,
+            "Room Management": self._setup_room_management_tab,
+            "Housekeeping": self._setup_housekeeping_tab,
+            "Reservations": self._setup_reservation_tab,
+            "Reporting": self._setup_reporting_tab,
+        }
+        # Reloaded on every later visit: other terminals keep changing these.
+        # The others keep the clerk's search, filters and results.
+        self._tab_refreshes = {
+            "Room Management": self.load_room_list,
+            "Housekeeping": self.load_housekeeping_list,
+        }
+        self._built_tabs = set()
+
+        # Only present when the app was started with HMS_DIAGNOSTICS set.
+        if self.db_manager.instrumentation is not None:
+            self.tab_view.add("Diagnostics")
+            self.tab_view.tab("Diagnostics").grid_columnconfigure(0, weight=1)
+            self.tab_view.tab("Diagnostics").grid_rowconfigure(1, weight=1)
+            self._tab_setups["Diagnostics"] = self._setup_diagnostics_tab
+            self._tab_refreshes["Diagnostics"] = self.refresh_diagnostics
+
+    def show_selected_tab(self):
+        """
+        Builds the selected tab the first time it is shown; after that,
+        reloads it if its data goes stale (see _tab_refreshes). Called when
+        the panel is shown and whenever the clerk switches tabs.
+        """
+        tab_name = self.tab_view.get()
+        if tab_name not in self._built_tabs:
+            self._built_tabs.add(tab_name)
+            self._tab_setups[tab_name]()
+        elif tab_name in self._tab_refreshes:
+            self._tab_refreshes[tab_name]()
+
+    def _on_tab_selected(self):
+        self.show_selected_tab()
 
     # --- Guest Management Tab Methods ---
 
@@ -64,52 +106,72 @@ class AdminPanelView(customtkinter.CTkFrame):
         customtkinter.CTkButton(search_frame, text="Search", command=self.search_guests).grid(
             row=0, column=2, padx=10, pady=10)
 
-        self.guest_results_frame = customtkinter.CTkScrollableFrame(
-            self.tab_view.tab("Guest Management"), label_text="Search Results")
+        # Search as the clerk types, once they pause; Enter searches at once.
+        self._guest_search_after_id = None
+        self._last_guest_query = None
+        self.guest_search_entry.bind("<KeyRelease>", self._schedule_guest_search)
+        self.guest_search_entry.bind("<Return>", lambda event: self.search_guests())
+
+        self.guest_results_frame = VirtualTable(
+            self.tab_view.tab("Guest Management"),
+            headers=["ID", "Name", "Email", "Phone", "Blacklisted", "Action"],
+            col_weights=[1, 3, 3, 2, 1, 1],
+            format_row=self._format_guest_row,
+            page_size=self.GUEST_SEARCH_LIMIT,
+            action_text="Edit",
+            on_action=lambda guest: self.open_guest_edit_popup(guest['id']))
         self.guest_results_frame.grid(
             row=1, column=0, padx=10, pady=10, sticky="nsew")
-        self.guest_results_frame.grid_columnconfigure(0, weight=1)
 
         self.search_guests()
 
-    def search_guests(self):
-        query = self.guest_search_entry.get()
-        results = self.db_manager.search_guests(query)
-
-        for widget in self.guest_results_frame.winfo_children():
-            widget.destroy()
-
-        if not results:
-            customtkinter.CTkLabel(
-                self.guest_results_frame, text=f"No guests found matching '{query}'. Showing all guests if query is empty.").pack(pady=20)
-            return
+    def _schedule_guest_search(self, event=None):
+        if self._guest_search_after_id is not None:
+            self.after_cancel(self._guest_search_after_id)
+        self._guest_search_after_id = self.after(
+            self.GUEST_SEARCH_DEBOUNCE_MS, self._search_if_changed)
 
-        headers = ["ID", "Name", "Email", "Phone", "Blacklisted", "Action"]
-        for col, header in enumerate(headers):
-            customtkinter.CTkLabel(self.guest_results_frame, text=header, font=customtkinter.CTkFont(
-                weight="bold")).grid(row=0, column=col, padx=10, pady=5)
+    def _search_if_changed(self):
+        self._guest_search_after_id = None
+        # Arrow keys, Shift etc. also fire KeyRelease without changing the text.
+        if self.guest_search_entry.get().strip() != self._last_guest_query:
+            self.search_guests()
 
-        for row_idx, guest in enumerate(results, start=1):
-            customtkinter.CTkLabel(self.guest_results_frame, text=guest['id']).grid(
-                row=row_idx, column=0, padx=10, pady=5)
-            customtkinter.CTkLabel(self.guest_results_frame, text=guest['name']).grid(
-                row=row_idx, column=1, padx=10, pady=5, sticky="w")
-            customtkinter.CTkLabel(self.guest_results_frame, text=guest['email']).grid(
-                row=row_idx, column=2, padx=10, pady=5, sticky="w")
-            customtkinter.CTkLabel(self.guest_results_frame, text=guest['phone']).grid(
-                row=row_idx, column=3, padx=10, pady=5)
-
-            status_text = "Yes" if guest['blacklisted'] else "No"
-            status_color = "red" if guest['blacklisted'] else "green"
-            customtkinter.CTkLabel(self.guest_results_frame, text=status_text, text_color=status_color).grid(
-                row=row_idx, column=4, padx=10, pady=5)
-
-            customtkinter.CTkButton(self.guest_results_frame, text="Edit", width=60,
-                                    command=lambda g_id=guest['id']: self.open_guest_edit_popup(g_id)).grid(row=row_idx, column=5, padx=10, pady=5)
-
-        self.guest_results_frame.grid_columnconfigure(1, weight=3)
-        self.guest_results_frame.grid_columnconfigure(2, weight=3)
-        self.guest_results_frame.grid_columnconfigure(0, weight=1)
+    def search_guests(self):
+        if self._guest_search_after_id is not None:
+            self.after_cancel(self._guest_search_after_id)
+            self._guest_search_after_id = None
+
+        query = self.guest_search_entry.get().strip()
+        self._last_guest_query = query
+        self.guest_results_frame.empty_text = (
+            f"No guests found matching '{query}'." if query else "No guests on file.")
+
+        # Resubmitting under 'guest_search' supersedes the previous query, and
+        # the table ignores pages from an older load(), so a slow stale search
+        # can never overwrite newer results.
+        def fetch_page(last_row, deliver):
+            if last_row is not None:
+                # Results are capped at GUEST_SEARCH_LIMIT: no second page.
+                deliver(True, [])
+                return
+            self.app_controller.db_worker.submit(
+                'guest_search', self.db_manager.search_guests, query,
+                limit=self.GUEST_SEARCH_LIMIT,
+                on_done=lambda results: deliver(True, results),
+                on_error=lambda error: deliver(False, f"Search failed: {error}"))
+
+        self.guest_results_frame.load(fetch_page, keep_rows=True)
+
+    def _format_guest_row(self, guest):
+        return [
+            (guest['id'], None),
+            (guest['name'], None),
+            (guest['email'], None),
+            (guest['phone'], None),
+            ("Yes" if guest['blacklisted'] else "No",
+             "red" if guest['blacklisted'] else "green"),
+        ]
 
     def open_guest_edit_popup(self, guest_id):
         guest = self.db_manager.get_guest_by_id(guest_id)
@@ -304,32 +366,28 @@ class AdminPanelView(customtkinter.CTkFrame):
                     raise ValueError(
                         "Price and Capacity must be positive numbers.")
 
-                # 1. Update Details
+                # Details and (unless occupied) status in one update
                 details_data = {
                     'room_type': type_var.get(),
                     'price_per_night': new_price,
                     'capacity': new_capacity,
                     'description': description_entry.get("1.0", "end-1c")
                 }
-                success_det, msg_det = self.db_manager.update_room_details(
-                    room_number, details_data)
-
-                # 2. Update Status (if not occupied)
-                success_stat = True
                 if room_data['status'] != 'Occupied':
                     new_status = status_dropdown.get()
                     # Only update if it's actually changed
                     if new_status != room_data['status']:
-                        self.db_manager.update_room_status(
-                            room_number, new_status)
-                        success_stat = True
+                        details_data['status'] = new_status
+
+                success, msg = self.db_manager.update_room_details(
+                    room_number, details_data)
 
-                if success_det or success_stat:
+                if success:
                     edit_window.destroy()
                     self.load_room_list()
                     self.app_controller.show_room_status_view()
                 else:
-                    error_label.configure(text=msg_det)
+                    error_label.configure(text=msg)
 
             except ValueError as e:
                 error_label.configure(text=f"Input Error: {e}")
@@ -433,6 +491,9 @@ class AdminPanelView(customtkinter.CTkFrame):
 
         customtkinter.CTkButton(controls_frame, text="Search History", command=self.load_reservation_history).grid(
             row=0, column=5, padx=5, pady=5, sticky="e")
+        self.res_export_button = customtkinter.CTkButton(
+            controls_frame, text="Export...", command=self.export_reservation_history)
+        self.res_export_button.grid(row=1, column=5, padx=5, pady=5, sticky="e")
 
         # Row 1: Date Range
         customtkinter.CTkLabel(controls_frame, text="Start Date (YYYY-MM-DD):").grid(
@@ -449,17 +510,21 @@ class AdminPanelView(customtkinter.CTkFrame):
         self.res_end_date_entry.grid(
             row=1, column=3, padx=5, pady=5, sticky="ew")
 
-        self.res_list_frame = customtkinter.CTkScrollableFrame(
-            res_tab, label_text="Reservation History")
+        # Only the visible rows get widgets; pages are fetched on scroll.
+        self.res_list_frame = VirtualTable(
+            res_tab,
+            headers=["ID", "Room #", "Guest Name",
+                     "Check-in", "Check-out", "Bill Total", "Status"],
+            col_weights=[1, 1, 3, 2, 2, 2, 1],
+            format_row=self._format_reservation_row,
+            page_size=self.RESERVATION_PAGE_SIZE,
+            empty_text="No matching reservations found.")
         self.res_list_frame.grid(
             row=1, column=0, padx=10, pady=10, sticky="nsew")
 
         self.load_reservation_history()
 
     def load_reservation_history(self):
-        for widget in self.res_list_frame.winfo_children():
-            widget.destroy()
-
         search_query = self.res_search_entry.get()
         status_filter = self.res_status_var.get()
 
@@ -473,55 +538,77 @@ class AdminPanelView(customtkinter.CTkFrame):
             end_date = datetime.strptime(
                 end_date_str, '%Y-%m-%d').date() if end_date_str else None
         except ValueError:
-            customtkinter.CTkLabel(
-                self.res_list_frame, text="Error: Invalid date format. Use YYYY-MM-DD.", text_color="red").pack(pady=20)
+            self.res_list_frame.show_message(
+                "Error: Invalid date format. Use YYYY-MM-DD.", text_color="red")
             return
 
-        success, results = self.db_manager.get_reservation_history(
-            search_query=search_query,
-            status_filter=status_filter,
-            start_date=start_date,
-            end_date=end_date
-        )
-
-        if not success:
-            customtkinter.CTkLabel(
-                self.res_list_frame, text=results, text_color="red").pack(pady=20)
+        def fetch_page(last_row, deliver):
+            self.app_controller.db_worker.submit(
+                'reservation_history', self.db_manager.get_reservation_history,
+                search_query=search_query,
+                status_filter=status_filter,
+                start_date=start_date,
+                end_date=end_date,
+                limit=self.RESERVATION_PAGE_SIZE,
+                after=last_row['cursor'] if last_row else None,
+                on_done=lambda result: deliver(*result),
+                on_error=lambda error: deliver(False, f"Error loading reservations: {error}")
+            )
+
+        self.res_list_frame.load(fetch_page)
+
+    def export_reservation_history(self):
+        """Exports the rows matching the current filters, charges included."""
+        try:
+            start_date_str = self.res_start_date_entry.get()
+            end_date_str = self.res_end_date_entry.get()
+            start_date = datetime.strptime(
+                start_date_str, '%Y-%m-%d').date() if start_date_str else None
+            end_date = datetime.strptime(
+                end_date_str, '%Y-%m-%d').date() if end_date_str else None
+        except ValueError:
+            messagebox.showerror("Export Error", "Invalid date format. Use YYYY-MM-DD.")
             return
 
-        if not results:
-            customtkinter.CTkLabel(
-                self.res_list_frame, text="No matching reservations found.").pack(pady=20)
+        path = filedialog.asksaveasfilename(
+            parent=self, title="Export Reservations", defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("Parquet", "*.parquet")])
+        if not path:
             return
 
-        headers = ["ID", "Room #", "Guest Name",
-                   "Check-in", "Check-out", "Bill Total", "Status"]
-        col_weights = [1, 1, 3, 2, 2, 2, 1]
+        self.res_export_button.configure(state="disabled", text="Exporting...")
 
-        for col, header in enumerate(headers):
-            customtkinter.CTkLabel(self.res_list_frame, text=header, font=customtkinter.CTkFont(
-                weight="bold")).grid(row=0, column=col, padx=10, pady=5, sticky="w")
-            self.res_list_frame.grid_columnconfigure(
-                col, weight=col_weights[col])
+        def finished():
+            self.res_export_button.configure(state="normal", text="Export...")
 
-        for row_idx, res in enumerate(results, start=1):
-            status_text = "Paid" if res['is_paid'] else "UNPAID"
-            status_color = "green" if res['is_paid'] else "red"
+        def on_done(count):
+            finished()
+            messagebox.showinfo("Export Complete", f"Exported {count:,} rows to {path}.")
 
-            customtkinter.CTkLabel(self.res_list_frame, text=res['booking_id']).grid(
-                row=row_idx, column=0, padx=10, pady=5, sticky="w")
-            customtkinter.CTkLabel(self.res_list_frame, text=res['room_number']).grid(
-                row=row_idx, column=1, padx=10, pady=5, sticky="w")
-            customtkinter.CTkLabel(self.res_list_frame, text=res['guest_name']).grid(
-                row=row_idx, column=2, padx=10, pady=5, sticky="w")
-            customtkinter.CTkLabel(self.res_list_frame, text=res['check_in']).grid(
-                row=row_idx, column=3, padx=10, pady=5, sticky="w")
-            customtkinter.CTkLabel(self.res_list_frame, text=res['check_out']).grid(
-                row=row_idx, column=4, padx=10, pady=5, sticky="w")
-            customtkinter.CTkLabel(self.res_list_frame, text=f"${res['bill']:.2f}", font=customtkinter.CTkFont(
-                weight="bold")).grid(row=row_idx, column=5, padx=10, pady=5, sticky="w")
-            customtkinter.CTkLabel(self.res_list_frame, text=status_text, text_color=status_color).grid(
-                row=row_idx, column=6, padx=10, pady=5, sticky="w")
+        def on_error(error):
+            finished()
+            messagebox.showerror("Export Error", str(error))
+
+        self.app_controller.db_worker.submit(
+            'reservation_export', export_reservations, self.db_manager, path,
+            search_query=self.res_search_entry.get(),
+            status_filter=self.res_status_var.get(),
+            start_date=start_date,
+            end_date=end_date,
+            on_done=on_done, on_error=on_error)
+
+    def _format_reservation_row(self, res):
+        status_text = "Paid" if res['is_paid'] else "UNPAID"
+        status_color = "green" if res['is_paid'] else "red"
+        return [
+            (res['booking_id'], None),
+            (res['room_number'], None),
+            (res['guest_name'], None),
+            (res['check_in'], None),
+            (res['check_out'], None),
+            (f"${res['bill']:.2f}", None),
+            (status_text, status_color),
+        ]
 
     # --- Reporting Tab Methods ---
 
@@ -579,8 +666,17 @@ class AdminPanelView(customtkinter.CTkFrame):
                 self.report_display_frame, text="Error: Please enter dates in YYYY-MM-DD format.", text_color="red").pack(pady=20)
             return
 
-        success, results = self.db_manager.get_revenue_report(
-            start_date, end_date)
+        customtkinter.CTkLabel(
+            self.report_display_frame, text="Generating report...").pack(pady=20)
+
+        self.app_controller.db_worker.submit(
+            'revenue_report', self.db_manager.get_revenue_report, start_date, end_date,
+            on_done=lambda result: self._show_revenue_report(*result),
+            on_error=lambda error: self._show_revenue_report(False, error))
+
+    def _show_revenue_report(self, success, results):
+        for widget in self.report_display_frame.winfo_children():
+            widget.destroy()
 
         if not success:
             customtkinter.CTkLabel(
@@ -636,3 +732,48 @@ class AdminPanelView(customtkinter.CTkFrame):
                 row=i, column=0, padx=10, pady=2, sticky="w")
             customtkinter.CTkLabel(detail_frame, text=value, font=customtkinter.CTkFont(
                 weight="bold")).grid(row=i, column=1, padx=10, pady=2, sticky="e")
+
+    # --- Diagnostics Tab Methods ---
+
+    def _setup_diagnostics_tab(self):
+        diag_tab = self.tab_view.tab("Diagnostics")
+
+        controls_frame = customtkinter.CTkFrame(diag_tab)
+        controls_frame.grid(row=0, column=0, padx=10, pady=10, sticky="ew")
+
+        customtkinter.CTkButton(controls_frame, text="Refresh", command=self.refresh_diagnostics).grid(
+            row=0, column=0, padx=5, pady=5)
+        customtkinter.CTkButton(controls_frame, text="Reset", command=self.reset_diagnostics).grid(
+            row=0, column=1, padx=5, pady=5)
+        customtkinter.CTkButton(controls_frame, text="Save to File...", command=self.dump_diagnostics).grid(
+            row=0, column=2, padx=5, pady=5)
+
+        self.diagnostics_text = customtkinter.CTkTextbox(
+            diag_tab, font=customtkinter.CTkFont(family="Courier", size=12), wrap="none")
+        self.diagnostics_text.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
+
+        self.refresh_diagnostics()
+
+    def refresh_diagnostics(self):
+        self.diagnostics_text.configure(state="normal")
+        self.diagnostics_text.delete("1.0", "end")
+        self.diagnostics_text.insert("1.0", self.db_manager.instrumentation.format_report())
+        self.diagnostics_text.configure(state="disabled")
+
+    def reset_diagnostics(self):
+        self.db_manager.instrumentation.reset()
+        self.refresh_diagnostics()
+
+    def dump_diagnostics(self):
+        path = filedialog.asksaveasfilename(
+            parent=self, title="Save Query Diagnostics", defaultextension=".json",
+            initialfile=f"hms_diagnostics_{datetime.now():%Y%m%d_%H%M%S}.json",
+            filetypes=[("JSON", "*.json")])
+        if not path:
+            return
+        try:
+            self.db_manager.instrumentation.dump(path)
+        except OSError as e:
+            messagebox.showerror("Diagnostics", f"Could not save: {e}")
+            return
+        messagebox.showinfo("Diagnostics", f"Saved to {path}.")
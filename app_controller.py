@@ -1,17 +1,28 @@
 # app_controller.py
 
+import os
 import customtkinter
 from db_manager import DBManager
-from room_view import RoomStatusView
-from admin_panel_view import AdminPanelView
 from login_view import LoginView  # NEW IMPORT
 from tkinter import messagebox  # NEW IMPORT
+from db_worker import DBWorker
 
 
 class AppController(customtkinter.CTk):
     def __init__(self):
         super().__init__()
-        self.db_manager = DBManager()
+        # With HMS_SERVICE_URL set, this terminal goes through the HMS service
+        # (see hms_service.py) instead of opening the database itself.
+        service_url = os.environ.get('HMS_SERVICE_URL')
+        if service_url:
+            from hms_service import HMSClient
+            self.db_manager = HMSClient(service_url)
+        else:
+            self.db_manager = DBManager()
+        # Hidden diagnostics: query timings and a Diagnostics tab in the admin panel.
+        if os.environ.get('HMS_DIAGNOSTICS') and not service_url:
+            self.db_manager.enable_instrumentation()
+        self.db_worker = DBWorker(self, self.db_manager)
 
         # --- Authentication State ---
         self.is_logged_in = False
@@ -27,12 +38,14 @@ class AppController(customtkinter.CTk):
         self.grid_columnconfigure(0, weight=1)
 
         # --- View initialization ---
+        # Only the login screen is built up front. The dashboard and the admin
+        # panel query the database as they are built, so they wait until
+        # first shown: reaching the login screen costs the same however large
+        # the hotel's history is.
         self.login_view = LoginView(
             master=self, app_controller=self, db_manager=self.db_manager)
-        self.room_status_view = RoomStatusView(
-            master=self, db_manager=self.db_manager, app_controller=self)
-        self.admin_panel_view = AdminPanelView(
-            master=self, db_manager=self.db_manager, app_controller=self)
+        self.room_status_view = None
+        self.admin_panel_view = None
 
         # Start with the Login View
         self.show_login_view()
@@ -57,7 +70,8 @@ class AppController(customtkinter.CTk):
     def show_view(self, view_instance):
         """Helper to hide all views and show the target view."""
         for view in [self.login_view, self.room_status_view, self.admin_panel_view]:
-            view.grid_forget()
+            if view is not None:
+                view.grid_forget()
 
         view_instance.grid(row=0, column=0, sticky="nsew")
 
@@ -67,7 +81,14 @@ class AppController(customtkinter.CTk):
     def show_room_status_view(self):
         if self.is_logged_in:
             # Note: RoomStatusView needs a logout button added to its UI!
-            self.room_status_view.update_status_list()
+            if self.room_status_view is None:
+                # Loads its rooms as it is built. Its module is imported here
+                # too, so the login screen comes up without it.
+                from room_view import RoomStatusView
+                self.room_status_view = RoomStatusView(
+                    master=self, db_manager=self.db_manager, app_controller=self)
+            else:
+                self.room_status_view.update_status_list()
             self.show_view(self.room_status_view)
         else:
             self.show_login_view()
@@ -75,8 +96,12 @@ class AppController(customtkinter.CTk):
     def show_admin_panel(self):
         # Only allow access if the user is logged in AND is an Admin
         if self.is_logged_in and self.user_role == 'Admin':
-            self.admin_panel_view.load_room_list()
+            if self.admin_panel_view is None:
+                from admin_panel_view import AdminPanelView
+                self.admin_panel_view = AdminPanelView(
+                    master=self, db_manager=self.db_manager, app_controller=self)
             self.show_view(self.admin_panel_view)
+            self.admin_panel_view.show_selected_tab()
         elif self.is_logged_in:
             messagebox.showwarning(
                 "Access Denied", "You do not have administrative privileges.")
@@ -0,0 +1,508 @@
+# async_db_manager.py
+
+"""
+AsyncDBManager: DBManager's front-desk operations on SQLAlchemy's asyncio
+extension (AsyncSession over aiosqlite), for services and schedulers that run
+on an event loop and must not block it on SQL.
+
+Every public method is a coroutine with the same arguments, results and
+(success, msg) tuples as its DBManager namesake. Both managers run the same
+statements and shape their results with the same helpers (see "Statements and
+Result Shapes" in db_manager.py); `python benchmark.py async` checks the two
+against each other and measures concurrent read throughput.
+
+    manager = await AsyncDBManager.open('sqlite+aiosqlite:///hotel_management.db')
+    rooms = await manager.get_room_status()
+
+Needs `pip install aiosqlite` (which brings in SQLAlchemy's greenlet support).
+"""
+
+import hashlib
+import re
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, event, func, insert, select, text, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from availability import RoomAvailabilityIndex
+from db_manager import (
+    Base, Charge, Guest, GuestArrival, Reservation, Room, RoomNight, User,
+    AVAILABILITY_VERSION_SQL, FOLIOS_VERSION_SQL, GUEST_SEARCH_SQL, ROOMS_VERSION_SQL, SCHEMA_MIGRATIONS, STORAGE_PROFILES,
+    _active_stay_select, _availability_stays_select, _conflicts_select, _folio, _folio_select, _guest_search_tiers, _guest_summary,
+    _history_entry, _history_page_select, _record_schema_fingerprint, _revenue_kpis,
+    _revenue_select, _room_dict, _room_nights_rows, _schema_is_current, _unarrived_stays_select,
+)
+from folio_cache import FolioCache
+from room_cache import RoomCache
+
+
+class AsyncDBManager:
+    """
+    Unlike DBManager there is no per-thread session: each call opens its own
+    AsyncSession for one unit of work, and what DBManager keeps per thread
+    (staged room changes, after-commit callbacks) lives in session.info.
+    The room cache, folio cache and availability index work as in DBManager.
+    """
+
+    def __init__(self, db_url='sqlite+aiosqlite:///hotel_management.db', pool_size=5, max_overflow=10,
+                 storage_profile='default'):
+        if isinstance(storage_profile, str):
+            storage_profile = STORAGE_PROFILES[storage_profile]
+        self.storage_profile = dict(STORAGE_PROFILES['default'], **storage_profile)
+
+        self.engine = create_async_engine(
+            db_url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=30
+        )
+        if self.engine.dialect.name == 'sqlite':
+            self._configure_sqlite()
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.write_sessions = async_sessionmaker(
+            self.engine.execution_options(begin_immediate=True), expire_on_commit=False)
+
+        self.availability = RoomAvailabilityIndex()
+        self.room_cache = RoomCache()
+        self.folios = FolioCache()
+
+    @classmethod
+    async def open(cls, *args, **kwargs):
+        """Creates the manager and prepares the database (see initialize)."""
+        manager = cls(*args, **kwargs)
+        await manager.initialize()
+        return manager
+
+    async def initialize(self):
+        """Brings the schema up to date (as DBManager) and loads the availability index."""
+        await self._ensure_schema()
+        await self.load_availability_index()
+
+    async def dispose(self):
+        await self.engine.dispose()
+
+    # --- SQLite Connection Setup ---
+
+    def _configure_sqlite(self):
+        """
+        As DBManager._configure_sqlite: the storage profile's PRAGMAs on every
+        connection, and write units of work start with BEGIN IMMEDIATE. Lock
+        waits rely on busy_timeout alone; retrying with time.sleep would stall
+        the event loop.
+        """
+        profile = self.storage_profile
+
+        @event.listens_for(self.engine.sync_engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout_ms'])}")
+            if profile['journal_mode']:
+                cursor.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+            if profile['synchronous']:
+                cursor.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+            if profile['mmap_size'] is not None:
+                cursor.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+            if profile['cache_size'] is not None:
+                cursor.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+            cursor.close()
+
+        @event.listens_for(self.engine.sync_engine, "begin")
+        def on_begin(conn):
+            immediate = conn.get_execution_options().get('begin_immediate')
+            conn.exec_driver_sql(f"BEGIN {'IMMEDIATE' if immediate else 'DEFERRED'}")
+
+    # --- Sessions / Unit of Work ---
+
+    @asynccontextmanager
+    async def session_scope(self, write=False):
+        """One unit of work: commits on success, rolls back on error."""
+        async with (self.write_sessions if write else self.sessions)() as session:
+            session.info.update(room_changes={}, after_commit=[])
+            try:
+                yield session
+                await self._commit(session)
+            except Exception:
+                await self._rollback(session)
+                raise
+
+    async def _commit(self, session):
+        """
+        Commits, then applies the staged room changes to the room cache and
+        runs the after-commit callbacks (see DBManager._commit).
+        """
+        room_changes = session.info['room_changes']
+        if room_changes:
+            await session.flush()
+            db_version = (await session.execute(text(ROOMS_VERSION_SQL))).scalar()
+        await session.commit()
+
+        callbacks = session.info['after_commit']
+        session.info.update(room_changes={}, after_commit=[])
+        if room_changes:
+            self.room_cache.patch(room_changes, db_version)
+        for callback in callbacks:
+            callback()
+
+    async def _rollback(self, session):
+        await session.rollback()
+        session.info.update(room_changes={}, after_commit=[])
+
+    # --- Schema Migrations ---
+
+    async def _ensure_schema(self):
+        async with self.engine.connect() as conn:
+            if await conn.run_sync(_schema_is_current):
+                return
+        async with self.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await self._run_migrations()
+        async with self.engine.begin() as conn:
+            await conn.run_sync(_record_schema_fingerprint)
+
+    async def get_schema_version(self):
+        """Returns the last migration version applied to the database."""
+        async with self.engine.connect() as conn:
+            return (await conn.exec_driver_sql("PRAGMA user_version")).scalar()
+
+    async def _run_migrations(self):
+        """Applies any SCHEMA_MIGRATIONS newer than the stored version."""
+        current_version = await self.get_schema_version()
+        for version, description, statements in SCHEMA_MIGRATIONS:
+            if version <= current_version:
+                continue
+            async with self.engine.begin() as conn:
+                for statement in statements:
+                    await conn.exec_driver_sql(statement)
+                # PRAGMA does not accept bound parameters
+                await conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+    # --- Availability Index ---
+
+    async def _availability_db_version(self, session):
+        return (await session.execute(text(AVAILABILITY_VERSION_SQL))).scalar()
+
+    async def load_availability_index(self):
+        """(Re)builds the in-memory availability index from the database."""
+        async with self.session_scope() as session:
+            db_version = await self._availability_db_version(session)
+            rooms = (await session.execute(select(Room.room_number, Room.room_type))).all()
+            stays = (await session.execute(_availability_stays_select(date.today()))).all()
+            self.availability.load(rooms, stays, db_version)
+
+    async def _stage_availability_change(self, session, db_version_before, *changes):
+        """As DBManager._stage_availability_change."""
+        await session.flush()
+        db_version = await self._availability_db_version(session)
+
+        def apply():
+            with self.availability.lock:
+                for change in changes:
+                    change()
+                self.availability.advance(db_version_before, db_version)
+        session.info['after_commit'].append(apply)
+
+    async def is_room_available(self, room_number, check_in_date, check_out_date):
+        async with self.session_scope() as session:
+            return not (await session.execute(_conflicts_select(
+                [room_number], check_in_date, check_out_date))).first()
+
+    async def find_available_rooms(self, check_in_date, check_out_date, room_type=None):
+        async with self.session_scope() as session:
+            current = self.availability.is_current(await self._availability_db_version(session))
+        if not current:
+            await self.load_availability_index()
+        return self.availability.free_rooms(check_in_date, check_out_date, room_type)
+
+    # --- User Authentication Methods ---
+
+    def hash_password(self, password):
+        return hashlib.sha256(password.encode()).hexdigest()
+
+    async def count_users(self):
+        async with self.session_scope() as session:
+            return (await session.execute(select(func.count()).select_from(User))).scalar()
+
+    async def check_credentials(self, username, password):
+        async with self.session_scope() as session:
+            user = (await session.execute(
+                select(User).filter_by(username=username).limit(1))).scalar()
+            if user and user.password_hash == self.hash_password(password):
+                return True, user.role
+            return False, None
+
+    # --- Room Cache ---
+
+    async def _fresh_room_cache(self):
+        """Returns the room cache, first reloading it if any process changed the rooms."""
+        async with self.session_scope() as session:
+            db_version = (await session.execute(text(ROOMS_VERSION_SQL))).scalar()
+            if not self.room_cache.is_current(db_version):
+                rooms = (await session.scalars(select(Room))).all()
+                self.room_cache.load([_room_dict(r) for r in rooms], db_version)
+        return self.room_cache
+
+    async def _stage_room_status(self, session, room_numbers, new_status):
+        """Sets the status of the rooms (not committed); returns how many exist."""
+        updated = (await session.execute(update(Room).where(
+            Room.room_number.in_(room_numbers)).values(status=new_status))).rowcount
+        if updated == len(room_numbers):
+            for room_number in room_numbers:
+                session.info['room_changes'].setdefault(room_number, {})['status'] = new_status
+        elif updated:
+            session.info['after_commit'].append(self.room_cache.invalidate)
+        return updated
+
+    async def _stage_arrivals(self, session, room_numbers, day):
+        """Records the guests of the rooms' stays in progress on `day` as arrived (not committed)."""
+        booking_ids = (await session.execute(_unarrived_stays_select(room_numbers, day))).scalars().all()
+        if booking_ids:
+            await session.execute(insert(GuestArrival), [
+                {'booking_id_fk': booking_id, 'arrived_on': day} for booking_id in booking_ids])
+
+    # --- Room Status & Basic Room Methods ---
+
+    async def get_room_status(self):
+        _, rooms = (await self._fresh_room_cache()).snapshot()
+        return [{'number': r['number'], 'type': r['type'], 'status': r['status']} for r in rooms]
+
+    async def get_room_status_if_changed(self, known_version):
+        version, rooms = (await self._fresh_room_cache()).snapshot()
+        if version == known_version:
+            return version, None
+        return version, [{'number': r['number'], 'type': r['type'], 'status': r['status']} for r in rooms]
+
+    async def get_room_by_number(self, room_number):
+        room = (await self._fresh_room_cache()).get(room_number)
+        if room is None:
+            return None
+
+        async with self.session_scope() as session:
+            active = (await session.execute(_active_stay_select(room_number, date.today()))).first()
+        active_reservation, guest, arrived_on = active if active else (None, None, None)
+
+        return dict(room, reservation=active_reservation, guest=guest, arrived_on=arrived_on)
+
+    async def get_all_rooms(self):
+        _, rooms = (await self._fresh_room_cache()).snapshot()
+        return rooms
+
+    async def update_room_status(self, room_number, new_status):
+        async with self.session_scope(write=True) as session:
+            if await self._stage_room_status(session, [room_number], new_status):
+                if new_status == 'Occupied':
+                    await self._stage_arrivals(session, [room_number], date.today())
+                await self._commit(session)
+                return True
+            return False
+
+    async def get_rooms_needing_cleaning(self):
+        _, rooms = (await self._fresh_room_cache()).snapshot()
+        return [r for r in rooms if r['status'] == 'Needs Cleaning']
+
+    # --- Guest Management Methods ---
+
+    async def search_guests(self, query, limit=100):
+        """Ranked prefix search over guests, as DBManager.search_guests."""
+        async with self.session_scope() as session:
+            terms = re.findall(r"\w+", query or "")
+
+            if not query or not query.strip():
+                guests = (await session.scalars(select(Guest).order_by(
+                    Guest.last_name, Guest.first_name).limit(limit))).all()
+            elif not terms:
+                guests = []
+            else:
+                candidates = text(GUEST_SEARCH_SQL)
+                ranked_ids = {}
+                for match_expr in _guest_search_tiers(terms):
+                    for (guest_id,) in await session.execute(
+                            candidates, {'match_expr': match_expr, 'limit': limit}):
+                        ranked_ids.setdefault(guest_id, len(ranked_ids))
+                    if len(ranked_ids) >= limit:
+                        break
+
+                guests = list((await session.scalars(select(Guest).where(
+                    Guest.guest_id.in_(list(ranked_ids)[:limit])))).all())
+                guests.sort(key=lambda g: ranked_ids[g.guest_id])
+
+            return [_guest_summary(g) for g in guests]
+
+    async def get_guest_by_id(self, guest_id):
+        async with self.session_scope() as session:
+            return await session.get(Guest, guest_id)
+
+    # --- Transaction & Billing Methods ---
+
+    async def check_in_guest(self, guest_data, reservation_data):
+        async with self.session_scope(write=True) as session:
+            try:
+                check_in_date = datetime.strptime(
+                    reservation_data['check_in_date_str'], '%Y-%m-%d').date()
+                checkout_date = datetime.strptime(
+                    reservation_data['checkout_date_str'], '%Y-%m-%d').date()
+
+                if check_in_date < date.today():
+                    return False, "Check-in date cannot be in the past."
+                if checkout_date <= check_in_date:
+                    return False, "Check-out date must be after the check-in date."
+
+                room_number = reservation_data['room_number']
+                if await session.get(Room, room_number) is None:
+                    return False, "Room not found."
+
+                # Checked in the database under the write lock, as in DBManager.
+                if (await session.execute(_conflicts_select(
+                        [room_number], check_in_date, checkout_date))).first():
+                    return False, f"Room {room_number} is already booked for part of {check_in_date} to {checkout_date}."
+                availability_version = await self._availability_db_version(session)
+
+                guest = (await session.execute(select(Guest).filter_by(
+                    contact_email=guest_data['email']).limit(1))).scalar()
+                if not guest:
+                    guest = Guest(
+                        first_name=guest_data['first_name'],
+                        last_name=guest_data['last_name'],
+                        contact_email=guest_data['email'],
+                        contact_phone=guest_data['phone'],
+                        address=guest_data['address']
+                    )
+                    session.add(guest)
+                    await session.flush()
+
+                res = Reservation(
+                    room_number_fk=room_number,
+                    guest_id_fk=guest.guest_id,
+                    check_in_date=check_in_date,
+                    check_out_date=checkout_date,
+                    total_bill=0.0
+                )
+                session.add(res)
+                await session.flush()
+                await self._sync_room_nights(
+                    session, res, reservation_data.get('price'), replace=False)
+
+                await self._stage_room_status(
+                    session, [room_number],
+                    'Occupied' if check_in_date == date.today() else 'Booked')
+                if check_in_date == date.today():
+                    session.add(GuestArrival(booking_id_fk=res.booking_id, arrived_on=check_in_date))
+
+                await self._stage_availability_change(
+                    session, availability_version, lambda: self.availability.add_stay(
+                        room_number, check_in_date, checkout_date, res.booking_id))
+                await self._commit(session)
+                return True, "Check-in/Booking successful."
+
+            except ValueError:
+                await self._rollback(session)
+                return False, "Invalid date format. Use YYYY-MM-DD."
+            except Exception as e:
+                await self._rollback(session)
+                return False, f"Database Error: {e}"
+
+    async def check_out_guest(self, room_number, reservation_id, price_per_night):
+        async with self.session_scope(write=True) as session:
+            try:
+                availability_version = await self._availability_db_version(session)
+                rows = (await session.execute(_folio_select(reservation_id))).all()
+                if not rows:
+                    return False, "Reservation not found."
+                folio = _folio(rows, price_per_night)
+                stay = rows[0]
+
+                await session.execute(update(Reservation).where(
+                    Reservation.booking_id == reservation_id
+                ).values(total_bill=folio['total'], is_paid=True))
+
+                # Early departure: the remaining booked nights were never used.
+                departure_date = max(date.today(), stay.check_in_date + timedelta(days=1))
+                if departure_date < stay.check_out_date:
+                    res = await session.get(Reservation, reservation_id)
+                    res.check_out_date = departure_date
+                    await self._sync_room_nights(session, res)
+
+                await self._stage_room_status(session, [room_number], 'Needs Cleaning')
+
+                await self._stage_availability_change(
+                    session, availability_version, lambda: self.availability.remove_stay(reservation_id))
+                await self._commit(session)
+                return True, f"Check-out successful. Final Bill: ${folio['total']:.2f} ({folio['nights']} nights + ${folio['extras']:.2f} extras)"
+
+            except Exception as e:
+                await self._rollback(session)
+                return False, f"Check-out Error: {e}"
+
+    async def _sync_room_nights(self, session, res, rate=None, replace=True):
+        """Replaces the room_nights rows of one reservation (not committed)."""
+        if rate is None:
+            rate = (await session.execute(select(RoomNight.rate).filter_by(
+                booking_id_fk=res.booking_id).limit(1))).scalar()
+            if rate is None:
+                rate = (await session.execute(select(Room.price_per_night).filter_by(
+                    room_number=res.room_number_fk))).scalar()
+
+        if replace:
+            await session.execute(
+                delete(RoomNight).where(RoomNight.booking_id_fk == res.booking_id),
+                execution_options={'synchronize_session': False})
+
+        nights = _room_nights_rows(
+            res.room_number_fk, res.booking_id, res.check_in_date, res.check_out_date, rate)
+        if nights:
+            await session.execute(insert(RoomNight), nights)
+
+    # --- Folios ---
+
+    async def get_folio(self, reservation_id, rate=None):
+        """The bill of a reservation as of today, as DBManager.get_folio."""
+        async with self.session_scope() as session:
+            db_version = (await session.execute(text(FOLIOS_VERSION_SQL))).scalar()
+            rows = self.folios.get(reservation_id, db_version)
+            if rows is None:
+                rows = (await session.execute(_folio_select(reservation_id))).all()
+                self.folios.put(reservation_id, rows, db_version)
+        return _folio(rows, rate) if rows else None
+
+    async def add_extra_charge(self, room_number, reservation_id, description, amount):
+        async with self.session_scope(write=True) as session:
+            try:
+                session.add(Charge(
+                    reservation_id_fk=reservation_id,
+                    room_number_fk=room_number,
+                    description=description,
+                    amount=amount,
+                    charge_date=date.today()
+                ))
+                await self._commit(session)
+                return True, "Charge added successfully."
+            except Exception as e:
+                await self._rollback(session)
+                return False, f"Error adding charge: {e}"
+
+    # --- Reservation History & Reporting Methods ---
+
+    async def get_reservation_history(self, search_query="", status_filter="All", start_date=None,
+                                      end_date=None, limit=None, after=None):
+        """The filtered reservation history, as DBManager.get_reservation_history."""
+        async with self.session_scope() as session:
+            try:
+                rows = (await session.execute(_history_page_select(
+                    search_query, status_filter, start_date, end_date, limit, after))).all()
+                return True, [_history_entry(row) for row in rows]
+            except Exception as e:
+                return False, f"Database query failed: {e}"
+
+    async def get_revenue_report(self, start_date, end_date):
+        """Revenue and occupancy KPIs for a date range, as DBManager.get_revenue_report."""
+        async with self.session_scope() as session:
+            try:
+                delta = (end_date - start_date).days + 1
+                if delta <= 0:
+                    return False, "End date must be after or equal to the start date."
+
+                row = (await session.execute(_revenue_select(start_date, end_date))).one()
+                return True, _revenue_kpis(start_date, end_date, delta, row)
+            except Exception as e:
+                return False, f"Reporting error: {e}"
@@ -0,0 +1,164 @@
+# availability.py
+
+import bisect
+import threading
+
+
+class RoomAvailabilityIndex:
+    """
+    In-memory interval index of open reservations, one sorted list per room.
+
+    Stays are half-open [check_in, check_out): a new guest may check in on the
+    day the previous guest checks out. For each room the stays are kept sorted
+    by check-in date together with a running maximum of check-out dates, so an
+    overlap test is a single bisect regardless of how many stays the room has.
+
+    The index answers availability searches. It is not the authority on
+    whether a booking may go ahead: other processes book too, so writers check
+    the database (see DBManager._conflicting_stays). `db_version` is the
+    value of the availability change counter (bumped by triggers on every
+    write to reservations and to the room list, from any process) that the
+    index corresponds to.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.db_version = None  # None = not loaded, or known to be stale
+        self._room_types = {}
+        self._starts = {}     # room -> sorted check-in dates
+        self._stays = {}      # room -> [(check_in, check_out, booking_id)], parallel to _starts
+        self._max_ends = {}   # room -> running max of check-out dates, parallel to _starts
+        self._booking_rooms = {}  # booking_id -> room
+
+    def load(self, rooms, stays, db_version=None):
+        """
+        Rebuilds the index.
+        rooms: iterable of (room_number, room_type)
+        stays: iterable of (room_number, check_in_date, check_out_date, booking_id)
+        db_version: the counter, read in the same transaction as rooms and stays
+        """
+        with self.lock:
+            self.db_version = db_version
+            self._room_types = {number: room_type for number, room_type in rooms}
+            self._starts = {}
+            self._stays = {}
+            self._max_ends = {}
+            self._booking_rooms = {}
+
+            grouped = {}
+            for room_number, check_in, check_out, booking_id in stays:
+                grouped.setdefault(room_number, []).append(
+                    (check_in, check_out, booking_id))
+                self._booking_rooms[booking_id] = room_number
+
+            for room_number, room_stays in grouped.items():
+                room_stays.sort()
+                self._stays[room_number] = room_stays
+                self._reindex_room(room_number)
+
+    def _reindex_room(self, room_number):
+        room_stays = self._stays.get(room_number, [])
+        if not room_stays:
+            self._stays.pop(room_number, None)
+            self._starts.pop(room_number, None)
+            self._max_ends.pop(room_number, None)
+            return
+
+        self._starts[room_number] = [s[0] for s in room_stays]
+        max_ends = []
+        running_max = None
+        for _, check_out, _ in room_stays:
+            if running_max is None or check_out > running_max:
+                running_max = check_out
+            max_ends.append(running_max)
+        self._max_ends[room_number] = max_ends
+
+    # --- Versioning ---
+
+    def is_current(self, db_version):
+        with self.lock:
+            return self.db_version is not None and self.db_version == db_version
+
+    def invalidate(self):
+        with self.lock:
+            self.db_version = None
+
+    def advance(self, db_version_before, db_version):
+        """
+        Records a committed local write, already applied to the index. The
+        counters were read inside the writing transaction, before and after
+        the write: an index that was current before is current after. If a
+        reload in the meantime already saw the write, it stays as it is;
+        otherwise the next read reloads.
+        """
+        with self.lock:
+            if self.db_version == db_version_before:
+                self.db_version = db_version
+            elif self.db_version is None or self.db_version < db_version:
+                self.db_version = None
+
+    # --- Maintenance ---
+
+    def set_room_type(self, room_number, room_type):
+        with self.lock:
+            self._room_types[room_number] = room_type
+
+    def add_stay(self, room_number, check_in, check_out, booking_id):
+        with self.lock:
+            if booking_id in self._booking_rooms:
+                self.remove_stay(booking_id)
+            room_stays = self._stays.setdefault(room_number, [])
+            bisect.insort(room_stays, (check_in, check_out, booking_id))
+            self._booking_rooms[booking_id] = room_number
+            self._reindex_room(room_number)
+
+    def remove_stay(self, booking_id):
+        with self.lock:
+            room_number = self._booking_rooms.pop(booking_id, None)
+            if room_number is None:
+                return False
+            self._stays[room_number] = [
+                s for s in self._stays.get(room_number, []) if s[2] != booking_id]
+            self._reindex_room(room_number)
+            return True
+
+    # --- Queries ---
+
+    def is_free(self, room_number, check_in, check_out):
+        """True if no indexed stay in the room overlaps [check_in, check_out)."""
+        with self.lock:
+            starts = self._starts.get(room_number)
+            if not starts:
+                return True
+            # Stays that begin before the requested check-out...
+            idx = bisect.bisect_left(starts, check_out)
+            if idx == 0:
+                return True
+            # ...are all over by the requested check-in.
+            return self._max_ends[room_number][idx - 1] <= check_in
+
+    def conflicts(self, room_number, check_in, check_out):
+        """Returns the booking ids of stays overlapping [check_in, check_out)."""
+        with self.lock:
+            starts = self._starts.get(room_number)
+            if not starts:
+                return []
+            idx = bisect.bisect_left(starts, check_out)
+            return [booking_id for s_in, s_out, booking_id in self._stays[room_number][:idx]
+                    if s_out > check_in]
+
+    def free_rooms(self, check_in, check_out, room_type=None):
+        """Returns the sorted room numbers free for the whole stay."""
+        free = []
+        with self.lock:
+            for number, r_type in self._room_types.items():
+                if room_type is not None and r_type != room_type:
+                    continue
+                starts = self._starts.get(number)
+                if starts:
+                    idx = bisect.bisect_left(starts, check_out)
+                    if idx and self._max_ends[number][idx - 1] > check_in:
+                        continue
+                free.append(number)
+        free.sort()
+        return free
@@ -0,0 +1,934 @@
+# benchmark.py
+
+"""
+Performance benchmarks for DBManager.
+
+Usage:
+    python benchmark.py revenue [--reservations 1000000] [--rooms 300] [--db bench_revenue.db]
+    python benchmark.py contention [--writers 4] [--reporters 2] [--seconds 10] [--profile all]
+    python benchmark.py guest-search [--guests 2000000] [--db bench_guests.db]
+    python benchmark.py commits [--cycles 200] [--profile all] [--db bench_commits.db]
+    python benchmark.py service [--terminals 16] [--seconds 10] [--write-every 5] [--db bench_service.db]
+    python benchmark.py async [--concurrency 1,4,16] [--seconds 5] [--reservations 200000] [--db bench_async.db]
+    python benchmark.py portfolio [--properties 10] [--reservations 200000] [--repeat 5] [--db-prefix bench_property]
+    python benchmark.py startup [--repeat 5] [--reservations 200000] [--db bench_startup.db]
+    python benchmark.py suite [--scales small,medium,large] [--repeat 20]
+                              [--output bench_results.json] [--baseline baseline.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+import sqlalchemy
+from sqlalchemy import event, func
+
+from data_generator import FIRST_NAMES, LAST_NAMES, generate
+from db_manager import DBManager, Reservation, Room, STORAGE_PROFILES
+
+
+def _legacy_occupied_nights(db, start_date, end_date):
+    """The pre-aggregate implementation: load every overlapping stay and clip in Python."""
+    occupied_nights = 0
+    reservations = db.session.query(Reservation).filter(
+        Reservation.check_in_date <= end_date,
+        Reservation.check_out_date >= start_date
+    ).all()
+    for res in reservations:
+        nights = (min(res.check_out_date, end_date) -
+                  max(res.check_in_date, start_date)).days
+        if nights > 0:
+            occupied_nights += nights
+    return occupied_nights
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def bench_revenue(args):
+    if not os.path.exists(args.db):
+        print(f"Generating {args.reservations:,} reservations over {args.rooms} rooms...")
+        generate(args.db, rooms=args.rooms, guests=max(1, args.reservations // 3),
+                 reservations=args.reservations, charges=0)
+    db = DBManager(f"sqlite:///{args.db}")
+
+    end_date = date.today()
+    start_date = end_date - timedelta(days=364)
+
+    legacy_nights, legacy_time = _timed(
+        _legacy_occupied_nights, db, start_date, end_date)
+    db.session.expunge_all()
+    (success, report), sql_time = _timed(
+        db.get_revenue_report, start_date, end_date)
+
+    if not success:
+        raise SystemExit(report)
+
+    print(f"One-year report {start_date} to {end_date}")
+    print(f"  legacy Python loop : {legacy_time * 1000:10.1f} ms  ({legacy_nights:,} nights)")
+    print(f"  room_nights query  : {sql_time * 1000:10.1f} ms  ({report['occupied_nights']:,} nights)")
+    if legacy_nights != report['occupied_nights']:
+        raise SystemExit("Mismatch between legacy and room_nights occupied nights!")
+
+
+def _contention_writer(db_path, profile, writer_id, rooms, seconds, results):
+    """Books back-to-back one-night stays in its own block of rooms."""
+    db = DBManager(f"sqlite:///{db_path}", storage_profile=profile)
+    first_room = 1000 + writer_id * rooms
+    done = failed = 0
+    deadline = time.perf_counter() + seconds
+    booking = 0
+    while time.perf_counter() < deadline:
+        room_number = first_room + booking % rooms
+        check_in = date.today() + timedelta(days=booking // rooms)
+        success, _ = db.check_in_guest(
+            {'first_name': 'Bench', 'last_name': f"W{writer_id}",
+             'email': f"w{writer_id}-{booking}@bench.example", 'phone': '', 'address': ''},
+            {'room_number': room_number,
+             'check_in_date_str': check_in.isoformat(),
+             'checkout_date_str': (check_in + timedelta(days=1)).isoformat(),
+             'price': 100.0})
+        booking += 1
+        if success:
+            done += 1
+        else:
+            failed += 1
+    results.put(('writer', done, failed))
+
+
+def _contention_reporter(db_path, profile, seconds, results):
+    """Runs one-year revenue reports back to back."""
+    db = DBManager(f"sqlite:///{db_path}", storage_profile=profile)
+    done = failed = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        success, _ = db.get_revenue_report(
+            date.today() - timedelta(days=364), date.today())
+        if success:
+            done += 1
+        else:
+            failed += 1
+    results.put(('reporter', done, failed))
+
+
+def _run_contention(profile, args):
+    db_path = f"{args.db}.{profile}"
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+
+    generate(db_path, rooms=50, guests=max(1, args.history // 3), reservations=args.history, charges=0)
+    db = DBManager(f"sqlite:///{db_path}", storage_profile=profile)
+    with db.session_scope(write=True) as session:
+        session.add_all([
+            Room(room_number=1000 + n, room_type='Bench', description='', capacity=2,
+                 price_per_night=100.0, status='Available')
+            for n in range(args.writers * args.rooms_per_writer)])
+    db.engine.dispose()
+
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(
+        target=_contention_writer,
+        args=(db_path, profile, w, args.rooms_per_writer, args.seconds, results))
+        for w in range(args.writers)]
+    processes += [multiprocessing.Process(
+        target=_contention_reporter, args=(db_path, profile, args.seconds, results))
+        for _ in range(args.reporters)]
+
+    for process in processes:
+        process.start()
+    totals = {'writer': [0, 0], 'reporter': [0, 0]}
+    for _ in processes:
+        role, done, failed = results.get()
+        totals[role][0] += done
+        totals[role][1] += failed
+    for process in processes:
+        process.join()
+
+    print(f"  {profile:<15} check-ins/s: {totals['writer'][0] / args.seconds:8.1f}"
+          f"  (failed {totals['writer'][1]})"
+          f"   reports/s: {totals['reporter'][0] / args.seconds:6.1f}"
+          f"  (failed {totals['reporter'][1]})")
+
+
+def bench_contention(args):
+    profiles = list(STORAGE_PROFILES) if args.profile == 'all' else [args.profile]
+    print(f"{args.writers} writer and {args.reporters} reporter processes, "
+          f"{args.seconds}s each, {args.history:,} historical reservations")
+    for profile in profiles:
+        _run_contention(profile, args)
+
+
+def bench_guest_search(args):
+    if not os.path.exists(args.db):
+        print(f"Generating {args.guests:,} guest profiles...")
+        generate(args.db, rooms=0, guests=args.guests, reservations=0, charges=0)
+    db = DBManager(f"sqlite:///{args.db}")
+
+    rng = random.Random(1)
+    queries = ([name[:n] for name in FIRST_NAMES + LAST_NAMES for n in (2, 3, 5)]
+               + [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)[:3]}" for _ in range(50)]
+               + [f"555-{rng.randint(100, 999)}" for _ in range(50)]
+               + [f"{rng.choice(FIRST_NAMES).lower()}.{rng.choice(LAST_NAMES).lower()}{rng.randint(1, args.guests)}"
+                  for _ in range(50)])
+
+    timings = []
+    for query in queries:
+        _, elapsed = _timed(db.search_guests, query)
+        timings.append(elapsed * 1000)
+    timings.sort()
+
+    print(f"{len(queries)} searches (limit 100) over {args.guests:,} guests")
+    print(f"  p50 {timings[len(timings) // 2]:7.2f} ms   p95 {timings[int(len(timings) * 0.95)]:7.2f} ms"
+          f"   max {timings[-1]:7.2f} ms")
+
+# --- Commits per Operation ---
+
+_WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def _terminal(target, terminal_id, rooms, seconds, write_every, results):
+    """
+    One front-desk terminal: polls the room grid, opens a room and searches
+    guests, and every `write_every` operations books a one-night stay in its
+    own block of rooms. target is a database path (opened directly) or an
+    HMS service URL.
+    """
+    if target.startswith(('http://', 'unix://')):
+        from hms_service import HMSClient
+        db = HMSClient(target)
+    else:
+        db = DBManager(f"sqlite:///{target}")
+    first_room = 1000 + terminal_id * rooms
+    latencies = {'read': [], 'write': []}
+    failed = operation = booking = 0
+    version = None
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        operation += 1
+        started = time.perf_counter()
+        try:
+            if operation % write_every == 0:
+                kind = 'write'
+                check_in = date.today() + timedelta(days=booking // rooms)
+                success, _ = db.check_in_guest(
+                    {'first_name': 'Bench', 'last_name': f"T{terminal_id}",
+                     'email': f"t{terminal_id}-{booking}@bench.example", 'phone': '', 'address': ''},
+                    {'room_number': first_room + booking % rooms,
+                     'check_in_date_str': check_in.isoformat(),
+                     'checkout_date_str': (check_in + timedelta(days=1)).isoformat(),
+                     'price': 100.0})
+                booking += 1
+                failed += not success
+            else:
+                kind = 'read'
+                step = operation % 3
+                if step == 0:
+                    version, _ = db.get_room_status_if_changed(version)
+                elif step == 1:
+                    db.get_room_by_number(first_room + operation % rooms)
+                else:
+                    db.search_guests(random.choice(LAST_NAMES)[:3], limit=20)
+        except Exception:
+            failed += 1
+        latencies[kind].append(time.perf_counter() - started)
+    results.put((latencies, failed))
+
+
+def _serve(db_path, port, ready):
+    import asyncio
+    from hms_service import HMSService
+
+    async def run():
+        service = HMSService(DBManager(f"sqlite:///{db_path}"))
+        await service.start('127.0.0.1', port)
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def _run_terminals(target, args):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(
+        target=_terminal,
+        args=(target, t, args.rooms_per_terminal, args.seconds, args.write_every, results))
+        for t in range(args.terminals)]
+    for process in processes:
+        process.start()
+    latencies = {'read': [], 'write': []}
+    failed = 0
+    for _ in processes:
+        terminal_latencies, terminal_failed = results.get()
+        for kind in latencies:
+            latencies[kind] += terminal_latencies[kind]
+        failed += terminal_failed
+    for process in processes:
+        process.join()
+    return latencies, failed
+
+
+def bench_service(args):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+    generate(args.db, rooms=50, guests=max(1, args.history // 3), reservations=args.history, charges=0)
+    db = DBManager(f"sqlite:///{args.db}")
+    with db.session_scope(write=True) as session:
+        session.add_all([
+            Room(room_number=1000 + n, room_type='Bench', description='', capacity=2,
+                 price_per_night=100.0, status='Available')
+            for n in range(args.terminals * args.rooms_per_terminal)])
+    db.engine.dispose()
+
+    print(f"{args.terminals} terminal processes, {args.seconds}s, "
+          f"one write per {args.write_every} operations")
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=_serve, args=(args.db, args.port, ready), daemon=True)
+    server.start()
+    try:
+        if not ready.wait(60):
+            raise SystemExit("The HMS service did not start.")
+        for mode, target in (('direct', args.db), ('service', f"http://127.0.0.1:{args.port}")):
+            if mode == 'direct':
+                print("  direct:  every terminal opens the database file")
+            else:
+                print("  service: every terminal calls one HMS service process")
+            latencies, failed = _run_terminals(target, args)
+            for kind in ('read', 'write'):
+                timings = sorted(latencies[kind])
+                if not timings:
+                    continue
+                p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+                print(f"    {kind:<5} {len(timings) / args.seconds:8.1f}/s"
+                      f"   p50 {statistics.median(timings) * 1000:7.2f} ms   p99 {p99 * 1000:8.2f} ms")
+            print(f"    failed {failed}")
+    finally:
+        server.terminate()
+        server.join()
+
+
+def _read_mix(i, rooms, today):
+    """The i-th call of the concurrent read workload, as (method, args)."""
+    return [
+        ('get_revenue_report', (today - timedelta(days=364), today)),
+        ('search_guests', (random.choice(LAST_NAMES)[:3],)),
+        ('get_reservation_history', (random.choice(LAST_NAMES)[:2], 'All', None, None, 50)),
+        ('get_room_by_number', (random.choice(rooms),)),
+    ][i % 4]
+
+
+def _sync_read_throughput(db_path, concurrency, seconds, rooms):
+    import threading
+    db = DBManager(f"sqlite:///{db_path}", pool_size=concurrency)
+    today = date.today()
+    counts = [0] * concurrency
+    deadline = time.perf_counter() + seconds
+
+    def reader(n):
+        while time.perf_counter() < deadline:
+            name, call_args = _read_mix(counts[n] + n, rooms, today)
+            getattr(db, name)(*call_args)
+            counts[n] += 1
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db.engine.dispose()
+    return sum(counts) / seconds
+
+
+async def _loop_lag(deadline, lags, tick_s=0.005):
+    """Measures how late a 5 ms timer fires, i.e. how long the event loop was blocked."""
+    import asyncio
+    while time.perf_counter() < deadline:
+        expected = time.perf_counter() + tick_s
+        await asyncio.sleep(tick_s)
+        lags.append(time.perf_counter() - expected)
+
+
+async def _async_read_throughput(db_path, concurrency, seconds, rooms, inline_sync=False):
+    """
+    Calls/s of `concurrency` tasks reading through AsyncDBManager, or with
+    inline_sync through a DBManager called straight from the tasks, which
+    blocks the loop. Returns (calls/s, 99th percentile loop lag in ms).
+    """
+    import asyncio
+    if inline_sync:
+        db = DBManager(f"sqlite:///{db_path}", pool_size=concurrency)
+    else:
+        from async_db_manager import AsyncDBManager
+        db = await AsyncDBManager.open(f"sqlite+aiosqlite:///{db_path}", pool_size=concurrency)
+    today = date.today()
+    counts = [0] * concurrency
+    lags = []
+    deadline = time.perf_counter() + seconds
+
+    async def reader(n):
+        while time.perf_counter() < deadline:
+            name, call_args = _read_mix(counts[n] + n, rooms, today)
+            if inline_sync:
+                getattr(db, name)(*call_args)
+                await asyncio.sleep(0)
+            else:
+                await getattr(db, name)(*call_args)
+            counts[n] += 1
+
+    await asyncio.gather(_loop_lag(deadline, lags), *(reader(n) for n in range(concurrency)))
+    if inline_sync:
+        db.engine.dispose()
+    else:
+        await db.dispose()
+    lags.sort()
+    return sum(counts) / seconds, lags[int(len(lags) * 0.99)] * 1000
+
+
+def bench_async(args):
+    """
+    Concurrent read throughput of AsyncDBManager against DBManager. That both
+    return the same results is checked by tests/test_manager_parity.py.
+    """
+    import asyncio
+    if not os.path.exists(args.db):
+        print(f"Generating {args.reservations:,} reservations over {args.rooms} rooms...")
+        generate(args.db, rooms=args.rooms, guests=max(1, args.reservations // 3),
+                 reservations=args.reservations, charges=args.reservations // 5)
+
+    rooms = [room['number'] for room in DBManager(f"sqlite:///{args.db}").get_all_rooms()]
+    print(f"Concurrent reads ({args.seconds}s per run; revenue report, guest search, "
+          f"history page, room lookup), calls/s and p99 event loop lag:")
+    for concurrency in (int(c) for c in args.concurrency.split(',')):
+        thread_rate = _sync_read_throughput(args.db, concurrency, args.seconds, rooms)
+        inline_rate, inline_lag = asyncio.run(_async_read_throughput(
+            args.db, concurrency, args.seconds, rooms, inline_sync=True))
+        async_rate, async_lag = asyncio.run(_async_read_throughput(
+            args.db, concurrency, args.seconds, rooms))
+        print(f"  {concurrency:3d} concurrent   DBManager threads {thread_rate:7.1f}/s"
+              f"   DBManager on the loop {inline_rate:7.1f}/s, lag {inline_lag:6.1f} ms"
+              f"   AsyncDBManager {async_rate:7.1f}/s, lag {async_lag:6.1f} ms")
+
+
+def bench_portfolio(args):
+    from multi_property import MultiPropertyManager
+    shards = {}
+    for n in range(args.properties):
+        path = f"{args.db_prefix}_{n}.db"
+        if not os.path.exists(path):
+            print(f"Generating property {n}: {args.reservations:,} reservations over {args.rooms} rooms...")
+            generate(path, rooms=args.rooms, guests=max(1, args.reservations // 3),
+                     reservations=args.reservations, charges=0, seed=n)
+            DBManager(f"sqlite:///{path}").engine.dispose()  # schema migrations
+        shards[f"P{n:02d}"] = f"sqlite:///{path}"
+
+    end = date.today()
+    start = end - timedelta(days=364)
+    print(f"One-year portfolio report, median of {args.repeat} (pool already started), "
+          f"{os.cpu_count()} CPU(s):")
+    for count in sorted({1, 2, args.properties // 2, args.properties} - {0}):
+        properties = dict(list(shards.items())[:count])
+        row = f"  {count:3d} properties"
+        for label, workers in (('one process', 1), ('process pool', count)):
+            group = MultiPropertyManager(properties, max_workers=workers)
+            _expect(group.get_portfolio_revenue_report(start, end))  # warm-up: pool and engines
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                _expect(group.get_portfolio_revenue_report(start, end))
+                timings.append(time.perf_counter() - started)
+            group.close()
+            row += f"   {label} {statistics.median(timings) * 1000:8.1f} ms"
+        print(row)
+
+
+# Run in a fresh interpreter, as at launch: imports one module, or imports
+# db_manager and opens a DBManager, and prints its timings as JSON.
+_STARTUP_IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+__import__(sys.argv[1])
+print(json.dumps({'import': time.perf_counter() - started}))
+"""
+
+_STARTUP_OPEN_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from db_manager import DBManager
+timings = {'import': time.perf_counter() - started}
+for name in ('_ensure_schema', 'load_availability_index'):
+    def timed(self, _method=getattr(DBManager, name), _name=name):
+        began = time.perf_counter()
+        _method(self)
+        timings[_name] = time.perf_counter() - began
+    setattr(DBManager, name, timed)
+started = time.perf_counter()
+DBManager(sys.argv[1])
+timings['open'] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+STARTUP_MODULES = ('db_manager', 'customtkinter', 'tkcalendar', 'login_view', 'room_view',
+                   'admin_panel_view', 'app_controller', 'main')
+
+
+def _startup_run(script, argument):
+    output = subprocess.run([sys.executable, "-c", script, argument], check=True,
+                            capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def _startup_median(script, argument, repeat, before_each=None):
+    runs = []
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        runs.append(_startup_run(script, argument))
+    return {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+
+
+def bench_startup(args):
+    print(f"Import time in a fresh interpreter, median of {args.repeat} (ms):")
+    for module in STARTUP_MODULES:
+        try:
+            timings = _startup_median(_STARTUP_IMPORT_SCRIPT, module, args.repeat)
+        except subprocess.CalledProcessError:
+            print(f"  {module:<18} not importable here")
+            continue
+        print(f"  {module:<18} {timings['import']:8.1f}")
+
+    if not os.path.exists(args.db):
+        print(f"Generating {args.reservations:,} reservations...")
+        generate(args.db, rooms=args.rooms, guests=max(1, args.reservations // 3),
+                 reservations=args.reservations, charges=0)
+    # Absolute, as the interpreters run from this directory
+    new_path = os.path.abspath(args.db + ".new")
+    db_path = os.path.abspath(args.db)
+
+    def remove_new_file():
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(new_path + suffix):
+                os.remove(new_path + suffix)
+
+    def forget_fingerprint():
+        with sqlite3.connect(db_path) as conn:
+            conn.execute("DROP TABLE IF EXISTS schema_info")
+
+    print(f"Opening a DBManager in a fresh interpreter, median of {args.repeat} (ms):")
+    print(f"  {'':<32} {'imports':>8} {'schema':>8} {'avail.':>8} {'open':>8}")
+    cases = (
+        ('new file', new_path, remove_new_file),
+        ('existing, full schema check', db_path, forget_fingerprint),
+        ('existing, fingerprint matches', db_path, None),
+    )
+    for label, path, before_each in cases:
+        if before_each is None:
+            DBManager(f"sqlite:///{path}").engine.dispose()  # records the fingerprint
+        timings = _startup_median(_STARTUP_OPEN_SCRIPT, f"sqlite:///{path}", args.repeat,
+                                  before_each)
+        print(f"  {label:<32} {timings['import']:8.1f} {timings['_ensure_schema']:8.1f} "
+              f"{timings['load_availability_index']:8.1f} {timings['open']:8.1f}")
+    remove_new_file()
+
+
+def _count_commits(engine):
+    """
+    Counts transactions on the engine. A commit of a transaction that wrote
+    is a durable commit: SQLite syncs the journal and database file for each
+    one (unless synchronous=OFF), which is what makes a check-in slow.
+    """
+    counts = {'transactions': 0, 'statements': 0, 'durable_commits': 0}
+
+    @event.listens_for(engine, "begin")
+    def on_begin(conn):
+        counts['transactions'] += 1
+        conn.info['hms_wrote'] = False
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        counts['statements'] += 1
+        if statement.lstrip().upper().startswith(_WRITE_STATEMENTS):
+            conn.info['hms_wrote'] = True
+
+    @event.listens_for(engine, "commit")
+    def on_commit(conn):
+        if conn.info.get('hms_wrote'):
+            counts['durable_commits'] += 1
+
+    return counts
+
+
+def _run_commit_cycles(db_path, profile, cycles):
+    """Checks a guest in and out of one room `cycles` times; returns per-operation figures."""
+    db = DBManager(f"sqlite:///{db_path}", storage_profile=profile)
+    with db.session_scope(write=True) as session:
+        session.merge(Room(room_number=SUITE_BENCH_ROOM, room_type='Bench', description='',
+                           capacity=2, price_per_night=100.0, status='Available'))
+    db.load_availability_index()
+    counts = _count_commits(db.engine)
+
+    results = {}
+    for operation in ('check_in_guest', 'check_out_guest'):
+        results[operation] = {'transactions': 0, 'statements': 0, 'durable_commits': 0, 'elapsed_s': 0.0}
+    booking_id = None
+    for i in range(cycles):
+        for operation in ('check_in_guest', 'check_out_guest'):
+            before = dict(counts)
+            started = time.perf_counter()
+            if operation == 'check_in_guest':
+                _expect(db.check_in_guest(
+                    {'first_name': 'Bench', 'last_name': 'Guest', 'email': f"commits{i}@bench.example",
+                     'phone': '', 'address': ''},
+                    {'room_number': SUITE_BENCH_ROOM, 'check_in_date_str': date.today().isoformat(),
+                     'checkout_date_str': (date.today() + timedelta(days=1)).isoformat(),
+                     'price': 100.0}))
+            else:
+                _expect(db.check_out_guest(SUITE_BENCH_ROOM, booking_id, 100.0))
+            results[operation]['elapsed_s'] += time.perf_counter() - started
+            for key in ('transactions', 'statements', 'durable_commits'):
+                results[operation][key] += counts[key] - before[key]
+            if operation == 'check_in_guest':
+                with db.session_scope() as session:
+                    booking_id = session.query(func.max(Reservation.booking_id)).scalar()
+    db.engine.dispose()
+    return {operation: {
+        'transactions': r['transactions'] / cycles,
+        'statements': r['statements'] / cycles,
+        'durable_commits': r['durable_commits'] / cycles,
+        'ms': r['elapsed_s'] * 1000 / cycles,
+    } for operation, r in results.items()}
+
+
+def bench_commits(args):
+    profiles = list(STORAGE_PROFILES) if args.profile == 'all' else [args.profile]
+    print(f"{args.cycles} check-in/check-out cycles per profile; per operation:")
+    print(f"  {'profile':<15}{'operation':<17}{'transactions':>13}{'statements':>11}{'durable commits':>17}"
+          f"{'ms':>9}{'ms (sync off)':>15}")
+    for profile in profiles:
+        figures = {}
+        # The same run with synchronous=OFF shows how much of the time is fsync.
+        for synchronous in (None, 'OFF'):
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(args.db + suffix):
+                    os.remove(args.db + suffix)
+            generate(args.db, rooms=20, guests=200, reservations=1000, charges=500)
+            storage = dict(STORAGE_PROFILES[profile])
+            if synchronous:
+                storage['synchronous'] = synchronous
+            figures[synchronous] = _run_commit_cycles(args.db, storage, args.cycles)
+        for operation, r in figures[None].items():
+            print(f"  {profile:<15}{operation:<17}{r['transactions']:>13.2f}{r['statements']:>11.2f}{r['durable_commits']:>17.2f}"
+                  f"{r['ms']:>9.2f}{figures['OFF'][operation]['ms']:>15.2f}")
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(args.db + suffix):
+            os.remove(args.db + suffix)
+
+# --- Regression Suite ---
+
+SUITE_SCALES = {
+    'small': {'rooms': 50, 'guests': 2_000, 'reservations': 10_000, 'charges': 5_000},
+    'medium': {'rooms': 300, 'guests': 50_000, 'reservations': 250_000, 'charges': 100_000},
+    'large': {'rooms': 300, 'guests': 500_000, 'reservations': 2_000_000, 'charges': 1_000_000},
+}
+
+# Rooms outside the generated range, booked far in the future by the
+# check-in/check-out cases so they never collide with generated stays.
+SUITE_BENCH_ROOM = 9000
+
+# Differences below this are timer noise, never a regression.
+SUITE_NOISE_FLOOR_MS = 0.5
+
+
+def _suite_database(scale, anchor, regenerate):
+    """Returns a generated database for the scale, reusing a cached one when its parameters match."""
+    params = dict(SUITE_SCALES[scale], anchor=anchor.isoformat(), seed=42)
+    db_path = f"bench_suite_{scale}.db"
+    params_path = db_path + ".json"
+    if not regenerate and os.path.exists(db_path) and os.path.exists(params_path):
+        with open(params_path) as f:
+            if json.load(f) == params:
+                return db_path
+
+    for path in (db_path, params_path):
+        if os.path.exists(path):
+            os.remove(path)
+    print(f"  generating {scale} database...", flush=True)
+    generate(db_path, rooms=params['rooms'], guests=params['guests'],
+             reservations=params['reservations'], charges=params['charges'],
+             seed=params['seed'], anchor=anchor)
+    with open(params_path, 'w') as f:
+        json.dump(params, f)
+    return db_path
+
+
+def _summarise(timings_ms):
+    timings_ms = sorted(timings_ms)
+    return {
+        'runs': len(timings_ms),
+        'min_ms': round(timings_ms[0], 3),
+        'median_ms': round(statistics.median(timings_ms), 3),
+        'p95_ms': round(timings_ms[min(len(timings_ms) - 1, int(len(timings_ms) * 0.95))], 3),
+    }
+
+
+def _measure(fn, repeat):
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        fn(i)
+        timings.append((time.perf_counter() - started) * 1000)
+    return _summarise(timings)
+
+
+def _expect(result):
+    """Fails the run if a method reports an error, so a broken method can't look fast."""
+    if isinstance(result, tuple) and result and result[0] is False:
+        raise RuntimeError(result[1])
+    return result
+
+
+def _suite_cases(db, anchor):
+    """Returns (name, fn(i)) pairs; each fn performs one call."""
+    room_numbers = [room['number'] for room in db.get_room_status()]
+    guest_queries = ['jo', 'smi', 'mar gar', '555-12', 'james.smith1', 'lake view']
+    year_ago = anchor - timedelta(days=364)
+    first_night = anchor + timedelta(days=3 * 365)
+
+    def check_in(i):
+        night = first_night + timedelta(days=i)
+        _expect(db.check_in_guest(
+            {'first_name': 'Bench', 'last_name': 'Guest', 'email': f"bench{i}@suite.example",
+             'phone': '', 'address': ''},
+            {'room_number': SUITE_BENCH_ROOM, 'check_in_date_str': night.isoformat(),
+             'checkout_date_str': (night + timedelta(days=1)).isoformat(), 'price': 100.0}))
+
+    def check_out(i):
+        _expect(db.check_out_guest(SUITE_BENCH_ROOM, booking_ids[i], 100.0))
+
+    booking_ids = []
+
+    def collect_bookings():
+        with db.session_scope() as session:
+            booking_ids.extend(booking_id for (booking_id,) in session.query(Reservation.booking_id).filter(
+                Reservation.room_number_fk == SUITE_BENCH_ROOM).order_by(Reservation.check_in_date))
+
+    return [
+        ('get_room_status', lambda i: db.get_room_status()),
+        ('get_room_by_number', lambda i: db.get_room_by_number(room_numbers[i % len(room_numbers)])),
+        ('get_all_rooms', lambda i: db.get_all_rooms()),
+        ('find_available_rooms', lambda i: db.find_available_rooms(
+            anchor + timedelta(days=i % 30), anchor + timedelta(days=i % 30 + 3))),
+        ('search_guests', lambda i: db.search_guests(guest_queries[i % len(guest_queries)])),
+        ('get_reservation_history', lambda i: _expect(db.get_reservation_history(limit=100))),
+        ('get_reservation_history[filtered]', lambda i: _expect(db.get_reservation_history(
+            search_query='smith', status_filter='Paid', start_date=year_ago, end_date=anchor, limit=100))),
+        ('get_revenue_report', lambda i: _expect(db.get_revenue_report(year_ago, anchor))),
+        ('get_daily_occupancy', lambda i: _expect(db.get_daily_occupancy(year_ago, anchor))),
+        ('check_in_guest', check_in),
+        (None, lambda i: collect_bookings()),
+        ('check_out_guest', check_out),
+    ]
+
+
+def _run_suite_scale(scale, args, anchor):
+    cached_path = _suite_database(scale, anchor, args.regenerate)
+    # The write cases change the data, so each run works on a fresh copy.
+    work_path = f"bench_suite_{scale}.work.db"
+    shutil.copyfile(cached_path, work_path)
+    try:
+        db = DBManager(f"sqlite:///{work_path}")
+        with db.session_scope(write=True) as session:
+            session.add(Room(room_number=SUITE_BENCH_ROOM, room_type='Bench', description='',
+                             capacity=2, price_per_night=100.0, status='Available'))
+        db.load_availability_index()
+
+        results = {}
+        for name, fn in _suite_cases(db, anchor):
+            if name is None:
+                fn(0)
+                continue
+            results[name] = _measure(fn, args.repeat)
+            print(f"  {scale:<7} {name:<36} median {results[name]['median_ms']:9.3f} ms"
+                  f"   p95 {results[name]['p95_ms']:9.3f} ms", flush=True)
+        db.engine.dispose()
+        return results
+    finally:
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(work_path + suffix):
+                os.remove(work_path + suffix)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Returns [(scale, method, baseline_ms, current_ms)] for medians that got slower than allowed."""
+    regressions = []
+    for scale, methods in results['scales'].items():
+        for method, current in methods.items():
+            previous = baseline.get('scales', {}).get(scale, {}).get(method)
+            if previous is None:
+                continue
+            before, after = previous['median_ms'], current['median_ms']
+            if after > before * (1 + tolerance) and after - before > SUITE_NOISE_FLOOR_MS:
+                regressions.append((scale, method, before, after))
+    return regressions
+
+
+def bench_suite(args):
+    scales = args.scales.split(',')
+    unknown = [scale for scale in scales if scale not in SUITE_SCALES]
+    if unknown:
+        raise SystemExit(f"Unknown scale(s): {', '.join(unknown)} (choose from {', '.join(SUITE_SCALES)})")
+
+    anchor = date.today()
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'sqlalchemy': sqlalchemy.__version__,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'scales': {},
+    }
+    for scale in scales:
+        results['scales'][scale] = _run_suite_scale(scale, args, anchor)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        print(f"Compared with {args.baseline} (commit {baseline.get('meta', {}).get('commit')}, "
+              f"tolerance {args.tolerance:.0%}):")
+        for scale, method, before, after in regressions:
+            change = f" ({after / before - 1:+.0%})" if before else ""
+            print(f"  REGRESSION {scale:<7} {method:<36} {before:9.3f} -> {after:9.3f} ms{change}")
+        if regressions:
+            raise SystemExit(1)
+        print("  no regressions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DBManager benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    revenue = subparsers.add_parser(
+        "revenue", help="Legacy Python loop vs room_nights aggregate in get_revenue_report")
+    revenue.add_argument("--reservations", type=int, default=1_000_000)
+    revenue.add_argument("--rooms", type=int, default=300)
+    revenue.add_argument("--db", default="bench_revenue.db")
+    revenue.set_defaults(func=bench_revenue)
+
+    contention = subparsers.add_parser(
+        "contention", help="Check-in throughput with concurrent writer and reporter processes")
+    contention.add_argument("--writers", type=int, default=4)
+    contention.add_argument("--reporters", type=int, default=2)
+    contention.add_argument("--seconds", type=float, default=10)
+    contention.add_argument("--rooms-per-writer", type=int, default=20)
+    contention.add_argument("--history", type=int, default=50_000,
+                            help="Synthetic past reservations, so reports do real work")
+    contention.add_argument("--profile", default="all",
+                            choices=["all"] + list(STORAGE_PROFILES))
+    contention.add_argument("--db", default="bench_contention.db")
+    contention.set_defaults(func=bench_contention)
+
+    guest_search = subparsers.add_parser(
+        "guest-search", help="FTS5 guest search latency over a large guest table")
+    guest_search.add_argument("--guests", type=int, default=2_000_000)
+    guest_search.add_argument("--db", default="bench_guests.db")
+    guest_search.set_defaults(func=bench_guest_search)
+
+    commits = subparsers.add_parser(
+        "commits", help="Transactions, durable commits and time per check-in and check-out")
+    commits.add_argument("--cycles", type=int, default=200)
+    commits.add_argument("--profile", default="all",
+                         choices=["all"] + list(STORAGE_PROFILES))
+    commits.add_argument("--db", default="bench_commits.db")
+    commits.set_defaults(func=bench_commits)
+
+    service = subparsers.add_parser(
+        "service", help="Terminals calling the HMS service vs each opening the database")
+    service.add_argument("--terminals", type=int, default=16)
+    service.add_argument("--seconds", type=float, default=10)
+    service.add_argument("--write-every", type=int, default=5,
+                         help="One check-in per this many operations")
+    service.add_argument("--rooms-per-terminal", type=int, default=20)
+    service.add_argument("--history", type=int, default=50_000,
+                         help="Synthetic past reservations, so reads do real work")
+    service.add_argument("--port", type=int, default=8766)
+    service.add_argument("--db", default="bench_service.db")
+    service.set_defaults(func=bench_service)
+
+    async_bench = subparsers.add_parser(
+        "async", help="AsyncDBManager vs DBManager: concurrent read throughput")
+    async_bench.add_argument("--concurrency", default="1,4,16",
+                             help="Comma-separated numbers of concurrent readers")
+    async_bench.add_argument("--seconds", type=float, default=5)
+    async_bench.add_argument("--reservations", type=int, default=200_000)
+    async_bench.add_argument("--rooms", type=int, default=300)
+    async_bench.add_argument("--db", default="bench_async.db")
+    async_bench.set_defaults(func=bench_async)
+
+    portfolio = subparsers.add_parser(
+        "portfolio", help="Consolidated revenue report over several property databases")
+    portfolio.add_argument("--properties", type=int, default=10)
+    portfolio.add_argument("--reservations", type=int, default=200_000,
+                           help="Reservations per property")
+    portfolio.add_argument("--rooms", type=int, default=300, help="Rooms per property")
+    portfolio.add_argument("--repeat", type=int, default=5)
+    portfolio.add_argument("--db-prefix", default="bench_property")
+    portfolio.set_defaults(func=bench_portfolio)
+
+    startup = subparsers.add_parser(
+        "startup", help="Module import times and DBManager start-up, each in a fresh interpreter")
+    startup.add_argument("--repeat", type=int, default=5)
+    startup.add_argument("--reservations", type=int, default=200_000)
+    startup.add_argument("--rooms", type=int, default=300)
+    startup.add_argument("--db", default="bench_startup.db")
+    startup.set_defaults(func=bench_startup)
+
+    suite = subparsers.add_parser(
+        "suite", help="Time the public DBManager methods at several data scales")
+    suite.add_argument("--scales", default="small,medium",
+                       help=f"Comma-separated, from: {', '.join(SUITE_SCALES)}")
+    suite.add_argument("--repeat", type=int, default=20, help="Calls per method")
+    suite.add_argument("--output", default="bench_results.json")
+    suite.add_argument("--baseline", help="Earlier results to compare against")
+    suite.add_argument("--tolerance", type=float, default=0.25,
+                       help="Allowed slowdown of a median before it counts as a regression")
+    suite.add_argument("--regenerate", action="store_true",
+                       help="Rebuild the cached suite databases")
+    suite.set_defaults(func=bench_suite)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+# bulk_import.py
+
+"""
+Bulk loading of rooms, guests, reservations and charges from CSV or JSONL.
+
+Files are streamed and written in chunks, one transaction per chunk, each
+with a single executemany INSERT. Every chunk also records how many source
+records have been consumed in `import_checkpoints`, in the same transaction,
+so an import that fails half way resumes after the last committed chunk
+without inserting anything twice. Imported reservations get their
+room_nights rows in the same transaction, at the room's rate, so the revenue
+figures never see a stay without its nights and stays booked at the desk
+keep the rate they were booked at.
+
+Expected columns (CSV header or JSON keys):
+    rooms:        room_number, price_per_night, [room_type, description, capacity, status]
+    guests:       [first_name, last_name, email, phone, address, is_blacklisted]
+    reservations: room_number, guest_email or guest_id, check_in_date, check_out_date,
+                  [booking_id, total_bill, is_paid]
+    charges:      booking_id, amount, [room_number, description, charge_date, charge_id]
+Dates are YYYY-MM-DD.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import time
+from datetime import date, datetime
+
+from sqlalchemy import func, insert
+
+from db_manager import (Charge, Guest, ImportCheckpoint, Reservation, Room, RoomNight,
+                        _room_nights_rows)
+
+# Parents before children, so references can be checked as rows arrive.
+IMPORT_ORDER = ['rooms', 'guests', 'reservations', 'charges']
+
+ROOM_STATUSES = {'Available', 'Occupied', 'Booked', 'Needs Cleaning', 'Out of Service'}
+
+MAX_REPORTED_ERRORS = 20
+
+
+# --- Reading ---
+
+def iter_records(path):
+    """Yields one dict per record of a .csv or .jsonl/.ndjson file."""
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == '.csv':
+            yield from csv.DictReader(f)
+        elif extension in ('.jsonl', '.ndjson'):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            raise ValueError(f"Unsupported file type '{extension}' (use .csv or .jsonl).")
+
+
+def _fingerprint(path):
+    """Size plus a hash of the first 64 KB: enough to notice a different file."""
+    with open(path, 'rb') as f:
+        head = hashlib.sha1(f.read(64 * 1024)).hexdigest()
+    return f"{os.path.getsize(path)}:{head}"
+
+
+# --- Field Parsing ---
+
+def _text(record, key):
+    value = record.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _required(record, key):
+    value = _text(record, key)
+    if value is None:
+        raise ValueError(f"missing {key}")
+    return value
+
+
+def _int(record, key, required=False):
+    value = _required(record, key) if required else _text(record, key)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a whole number, got {value!r}")
+
+
+def _float(record, key, required=False):
+    value = _required(record, key) if required else _text(record, key)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValueError(f"{key} must be a number, got {value!r}")
+    if number < 0:
+        raise ValueError(f"{key} cannot be negative")
+    return number
+
+
+def _date(record, key, required=False):
+    value = _required(record, key) if required else _text(record, key)
+    if value is None:
+        return None
+    try:
+        # Several times faster than strptime, which dominates large imports.
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{key} must be YYYY-MM-DD, got {value!r}")
+
+
+def _bool(record, key):
+    value = record.get(key)
+    if isinstance(value, bool):
+        return value
+    value = _text(record, key)
+    if value is None:
+        return False
+    if value.lower() in ('1', 'true', 'yes', 'y'):
+        return True
+    if value.lower() in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError(f"{key} must be true/false, got {value!r}")
+
+
+def _email(record):
+    value = _text(record, 'email') or _text(record, 'contact_email')
+    if value is None:
+        return None
+    value = value.lower()
+    if '@' not in value:
+        raise ValueError(f"invalid email {value!r}")
+    return value
+
+
+class BulkImporter:
+    """
+    Loads source files into the database behind a DBManager.
+
+    import_files() returns one stats dict per entity: records read, rows
+    inserted, duplicates skipped, records rejected (with the first few
+    errors), elapsed seconds and rows per second.
+    """
+
+    def __init__(self, db_manager, chunk_size=5000, on_progress=None):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        self._rooms = None  # room_number -> price_per_night
+
+    # --- Public API ---
+
+    def import_files(self, sources, restart=False):
+        """
+        sources: {'rooms': path, 'guests': path, ...}; any subset of
+        IMPORT_ORDER. restart=True ignores earlier checkpoints.
+        """
+        unknown = set(sources) - set(IMPORT_ORDER)
+        if unknown:
+            raise ValueError(f"Unknown import type(s): {', '.join(sorted(unknown))}")
+
+        results = {}
+        for entity in IMPORT_ORDER:
+            if sources.get(entity):
+                results[entity] = self.import_file(entity, sources[entity], restart)
+
+        # The availability index is reloaded once, rather than chunk by chunk
+        # -- also on a resumed run, in case the failed one never got this far.
+        if 'reservations' in results or 'rooms' in results:
+            self.db_manager.load_availability_index()
+        return results
+
+    def import_file(self, entity, path, restart=False):
+        validate = getattr(self, f"_validate_{entity}")
+        write = getattr(self, f"_write_{entity}")
+        source = f"{entity}:{os.path.abspath(path)}"
+        fingerprint = _fingerprint(path)
+
+        rows_done = self._load_checkpoint(source, fingerprint, restart)
+        stats = {'read': 0, 'inserted': 0, 'skipped': 0, 'rejected': 0,
+                 'resumed_from': rows_done, 'errors': []}
+        started = time.perf_counter()
+
+        chunk = []
+        last = flushed = rows_done
+        for number, record in enumerate(iter_records(path), start=1):
+            if number <= rows_done:
+                continue
+            last = number
+            stats['read'] += 1
+            try:
+                chunk.append((number, validate(record)))
+            except (ValueError, TypeError) as e:
+                self._reject(stats, number, e)
+            if len(chunk) >= self.chunk_size:
+                self._flush(entity, source, fingerprint, write, chunk, last, stats, started)
+                chunk, flushed = [], last
+        # The final flush also checkpoints any trailing rejected records.
+        if last > flushed:
+            self._flush(entity, source, fingerprint, write, chunk, last, stats, started)
+
+        stats['seconds'] = time.perf_counter() - started
+        stats['rows_per_s'] = stats['read'] / stats['seconds'] if stats['seconds'] else 0.0
+        return stats
+
+    # --- Chunk Writing ---
+
+    def _flush(self, entity, source, fingerprint, write, chunk, last_number, stats, started):
+        with self.db_manager.session_scope(write=True) as session:
+            rows = write(session, chunk, stats)
+            if rows:
+                statement = insert(self._table(entity)).prefix_with("OR IGNORE")
+                if entity == 'reservations':
+                    # Only the rows actually inserted come back, not the
+                    # duplicates OR IGNORE skipped.
+                    inserted = session.execute(statement.returning(
+                        Reservation.booking_id, Reservation.room_number_fk,
+                        Reservation.check_in_date, Reservation.check_out_date), rows).all()
+                    self._write_room_nights(session, inserted)
+                    count = len(inserted)
+                else:
+                    count = session.execute(statement, rows).rowcount
+                stats['inserted'] += count
+                stats['skipped'] += len(rows) - count
+            session.merge(ImportCheckpoint(
+                source=source, entity=entity, fingerprint=fingerprint,
+                rows_done=last_number, updated_at=datetime.now().isoformat(timespec='seconds')))
+        if entity == 'rooms':
+            self._rooms = None
+        if self.on_progress:
+            elapsed = time.perf_counter() - started
+            self.on_progress(entity, stats, stats['read'] / elapsed if elapsed else 0.0)
+
+    @staticmethod
+    def _table(entity):
+        return {'rooms': Room, 'guests': Guest, 'reservations': Reservation,
+                'charges': Charge}[entity].__table__
+
+    def _load_checkpoint(self, source, fingerprint, restart):
+        with self.db_manager.session_scope(write=restart) as session:
+            checkpoint = session.get(ImportCheckpoint, source)
+            if checkpoint is None:
+                return 0
+            if restart:
+                session.delete(checkpoint)
+                return 0
+            if checkpoint.fingerprint != fingerprint:
+                raise ValueError(
+                    f"{source.split(':', 1)[1]} has changed since the import was last run "
+                    f"({checkpoint.rows_done:,} records done); use --restart to import it from the top.")
+            return checkpoint.rows_done
+
+    @staticmethod
+    def _reject(stats, number, error):
+        stats['rejected'] += 1
+        if len(stats['errors']) < MAX_REPORTED_ERRORS:
+            stats['errors'].append(f"record {number}: {error}")
+
+    # --- Rooms ---
+
+    def _room_prices(self, session):
+        if self._rooms is None:
+            self._rooms = dict(session.query(Room.room_number, Room.price_per_night).all())
+        return self._rooms
+
+    def _validate_rooms(self, record):
+        status = _text(record, 'status') or 'Available'
+        if status not in ROOM_STATUSES:
+            raise ValueError(f"unknown status {status!r}")
+        return {
+            'room_number': _int(record, 'room_number', required=True),
+            'room_type': _text(record, 'room_type'),
+            'description': _text(record, 'description') or '',
+            'capacity': _int(record, 'capacity'),
+            'price_per_night': _float(record, 'price_per_night', required=True),
+            'status': status,
+        }
+
+    def _write_rooms(self, session, chunk, stats):
+        return [row for _, row in chunk]
+
+    # --- Guests ---
+
+    def _validate_guests(self, record):
+        first_name = _text(record, 'first_name')
+        last_name = _text(record, 'last_name')
+        if not first_name and not last_name:
+            raise ValueError("missing first_name and last_name")
+        return {
+            'first_name': first_name,
+            'last_name': last_name,
+            'contact_email': _email(record),
+            'contact_phone': _text(record, 'phone') or _text(record, 'contact_phone'),
+            'address': _text(record, 'address'),
+            'is_blacklisted': _bool(record, 'is_blacklisted'),
+        }
+
+    def _write_guests(self, session, chunk, stats):
+        """Drops guests whose email is already on file or earlier in the chunk."""
+        emails = {row['contact_email'] for _, row in chunk if row['contact_email']}
+        # Source emails are lower-cased; guests added at the desk keep the
+        # case they were typed in.
+        known = {email for (email,) in session.query(func.lower(Guest.contact_email)).filter(
+            func.lower(Guest.contact_email).in_(emails))} if emails else set()
+
+        rows = []
+        for _, row in chunk:
+            email = row['contact_email']
+            if email:
+                if email in known:
+                    stats['skipped'] += 1
+                    continue
+                known.add(email)
+            rows.append(row)
+        return rows
+
+    # --- Reservations ---
+
+    def _validate_reservations(self, record):
+        check_in = _date(record, 'check_in_date', required=True)
+        check_out = _date(record, 'check_out_date', required=True)
+        if check_out <= check_in:
+            raise ValueError("check_out_date must be after check_in_date")
+        guest_email = _email({'email': record.get('guest_email')})
+        guest_id = _int(record, 'guest_id')
+        if guest_email is None and guest_id is None:
+            raise ValueError("missing guest_email or guest_id")
+        return {
+            'booking_id': _int(record, 'booking_id'),
+            'room_number_fk': _int(record, 'room_number', required=True),
+            'guest_email': guest_email,
+            'guest_id_fk': guest_id,
+            'check_in_date': check_in,
+            'check_out_date': check_out,
+            'total_bill': _float(record, 'total_bill') or 0.0,
+            'is_paid': _bool(record, 'is_paid'),
+        }
+
+    def _write_reservations(self, session, chunk, stats):
+        """Resolves guests by email and rejects rows pointing at unknown rooms or guests."""
+        rooms = self._room_prices(session)
+        emails = {row['guest_email'] for _, row in chunk if row['guest_email']}
+        guest_ids = {row['guest_id_fk'] for _, row in chunk if not row['guest_email']}
+        by_email = {}
+        if emails:
+            # Matched case-insensitively, as in _write_guests; the oldest
+            # guest wins if several differ only in case.
+            for email, guest_id in session.query(func.lower(Guest.contact_email), Guest.guest_id).filter(
+                    func.lower(Guest.contact_email).in_(emails)).order_by(Guest.guest_id):
+                by_email.setdefault(email, guest_id)
+        known_ids = {guest_id for (guest_id,) in session.query(Guest.guest_id).filter(
+            Guest.guest_id.in_(guest_ids))} if guest_ids else set()
+
+        rows = []
+        for number, row in chunk:
+            row = dict(row)
+            email = row.pop('guest_email')
+            if row['room_number_fk'] not in rooms:
+                self._reject(stats, number, f"unknown room {row['room_number_fk']}")
+                continue
+            if email:
+                if email not in by_email:
+                    self._reject(stats, number, f"unknown guest {email}")
+                    continue
+                row['guest_id_fk'] = by_email[email]
+            elif row['guest_id_fk'] not in known_ids:
+                self._reject(stats, number, f"unknown guest id {row['guest_id_fk']}")
+                continue
+            if row['booking_id'] is None:
+                del row['booking_id']
+            rows.append(row)
+        return self._uniform(rows, 'booking_id')
+
+    def _write_room_nights(self, session, stays):
+        """room_nights of the stays just inserted, at their room's rate."""
+        rooms = self._room_prices(session)
+        nights = [night for booking_id, room_number, check_in, check_out in stays
+                  for night in _room_nights_rows(
+                      room_number, booking_id, check_in, check_out, rooms[room_number])]
+        if nights:
+            session.execute(insert(RoomNight), nights)
+
+    # --- Charges ---
+
+    def _validate_charges(self, record):
+        return {
+            'charge_id': _int(record, 'charge_id'),
+            'reservation_id_fk': _int(record, 'booking_id', required=True),
+            'room_number_fk': _int(record, 'room_number'),
+            'description': _text(record, 'description') or '',
+            'amount': _float(record, 'amount', required=True),
+            'charge_date': _date(record, 'charge_date') or date.today(),
+        }
+
+    def _write_charges(self, session, chunk, stats):
+        """Rejects charges for unknown reservations and fills in their room."""
+        booking_ids = {row['reservation_id_fk'] for _, row in chunk}
+        booking_rooms = dict(session.query(Reservation.booking_id, Reservation.room_number_fk).filter(
+            Reservation.booking_id.in_(booking_ids))) if booking_ids else {}
+
+        rows = []
+        for number, row in chunk:
+            room_number = booking_rooms.get(row['reservation_id_fk'])
+            if room_number is None:
+                self._reject(stats, number, f"unknown reservation {row['reservation_id_fk']}")
+                continue
+            row = dict(row)
+            if row['room_number_fk'] is None:
+                row['room_number_fk'] = room_number
+            if row['charge_id'] is None:
+                del row['charge_id']
+            rows.append(row)
+        return self._uniform(rows, 'charge_id')
+
+    @staticmethod
+    def _uniform(rows, *optional_keys):
+        """
+        executemany needs every row to bind the same columns. If only some
+        rows carry an optional column, the others get an explicit value
+        (None lets SQLite assign a primary key).
+        """
+        for key in optional_keys:
+            if any(key in row for row in rows) and not all(key in row for row in rows):
+                for row in rows:
+                    row.setdefault(key, None)
+        return rows
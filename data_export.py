@@ -0,0 +1,99 @@
+# data_export.py
+
+"""
+Streaming export of the reservation history, with charges, to CSV or Parquet.
+
+Rows come from DBManager.iter_reservation_export and are written as they
+arrive -- CSV line by line, Parquet one row group per batch -- so memory use
+does not grow with the size of the export. Parquet needs the optional
+`pyarrow` package.
+"""
+
+import csv
+import os
+
+EXPORT_COLUMNS = [
+    'booking_id', 'room_number', 'room_type', 'guest_first_name', 'guest_last_name',
+    'check_in', 'check_out', 'nights', 'price_per_night', 'total_bill', 'is_paid',
+    'charge_id', 'charge_date', 'charge_description', 'charge_amount',
+]
+
+EXPORT_FORMATS = ['csv', 'parquet']
+
+
+def export_reservations(db_manager, path, fmt=None, batch_size=10000, search_query="",
+                        status_filter="All", start_date=None, end_date=None):
+    """
+    Writes the filtered reservation history to `path` and returns the number
+    of rows written. fmt is 'csv' or 'parquet'; by default it follows the
+    file extension.
+    """
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}' (use csv or parquet).")
+
+    rows = db_manager.iter_reservation_export(
+        search_query=search_query, status_filter=status_filter,
+        start_date=start_date, end_date=end_date, batch_size=batch_size)
+    if fmt == 'csv':
+        return _write_csv(rows, path)
+    return _write_parquet(rows, path, batch_size)
+
+
+def _write_csv(rows, path):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ('booking_id', pa.int64()),
+        ('room_number', pa.int64()),
+        ('room_type', pa.string()),
+        ('guest_first_name', pa.string()),
+        ('guest_last_name', pa.string()),
+        ('check_in', pa.date32()),
+        ('check_out', pa.date32()),
+        ('nights', pa.int32()),
+        ('price_per_night', pa.float64()),
+        ('total_bill', pa.float64()),
+        ('is_paid', pa.bool_()),
+        ('charge_id', pa.int64()),
+        ('charge_date', pa.date32()),
+        ('charge_description', pa.string()),
+        ('charge_amount', pa.float64()),
+    ])
+
+
+def _write_parquet(rows, path, batch_size):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from e
+
+    schema = _parquet_schema(pa)
+    count = 0
+    batch = {column: [] for column in EXPORT_COLUMNS}
+
+    with pq.ParquetWriter(path, schema, compression='snappy') as writer:
+        def flush():
+            writer.write_table(pa.table(batch, schema=schema))
+            for values in batch.values():
+                values.clear()
+
+        for row in rows:
+            for column in EXPORT_COLUMNS:
+                batch[column].append(row[column])
+            count += 1
+            if count % batch_size == 0:
+                flush()
+        if count % batch_size:
+            flush()
+    return count
@@ -0,0 +1,184 @@
+# data_generator.py
+
+"""
+Deterministic synthetic hotel data for benchmarks and load tests.
+
+Usage:
+    python data_generator.py hotel_test.db [--rooms 300] [--guests 50000]
+        [--reservations 250000] [--charges 100000] [--days 1825] [--future-days 90]
+        [--seed 42] [--anchor YYYY-MM-DD]
+
+The same arguments, seed and anchor date included, always produce the same
+database. Stays are spread over [anchor - days, anchor + future_days) and
+never overlap within a room as long as the span leaves room for them.
+Finished stays are paid and billed, stays running on the anchor date leave
+their room 'Occupied', and future stays are open bookings.
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+
+from db_manager import DBManager
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda',
+               'William', 'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica',
+               'Thomas', 'Sarah', 'Charles', 'Karen', 'Aisha', 'Wei', 'Carlos', 'Fatima', 'Olga']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson',
+              'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee', 'Khan', 'Chen', 'Ivanova']
+STREETS = ['Main St', 'Oak Ave', 'Pine Rd', 'Maple Dr', 'Cedar Ln', 'Elm St', 'Lake View']
+
+# (room_type, capacity, price_per_night)
+ROOM_TYPES = [('Single', 1, 100.0), ('Double', 2, 150.0), ('Suite', 4, 250.0)]
+CHARGE_ITEMS = [('Minibar', 12.5), ('Room service', 35.0), ('Laundry', 18.0),
+                ('Spa treatment', 80.0), ('Parking', 15.0)]
+
+
+class _ChunkedInsert:
+    """Buffers rows and writes them with executemany every chunk_size rows."""
+
+    def __init__(self, conn, sql, chunk_size):
+        self.conn = conn
+        self.sql = sql
+        self.chunk_size = chunk_size
+        self.rows = []
+        self.count = 0
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.conn.executemany(self.sql, self.rows)
+            self.count += len(self.rows)
+            self.rows = []
+
+
+def generate(db_path, rooms=300, guests=10_000, reservations=100_000, charges=50_000,
+             days=5 * 365, future_days=90, seed=42, anchor=None, chunk_size=50_000):
+    """
+    Fills a new or empty SQLite database at db_path and returns the number of
+    rows written per table. anchor defaults to today.
+    """
+    if reservations and not (rooms and guests):
+        raise ValueError("Reservations need at least one room and one guest.")
+    if charges and not reservations:
+        raise ValueError("Charges need at least one reservation.")
+
+    rng = random.Random(seed)
+    anchor = anchor or date.today()
+
+    # Creates the schema, indexes and FTS triggers.
+    DBManager(f"sqlite:///{db_path}").engine.dispose()
+
+    conn = sqlite3.connect(db_path)
+    # A throwaway file being filled from scratch: durability is not needed.
+    conn.execute("PRAGMA synchronous = OFF")
+    if conn.execute("SELECT EXISTS (SELECT 1 FROM rooms UNION ALL SELECT 1 FROM guests)").fetchone()[0]:
+        conn.close()
+        raise ValueError(f"{db_path} already contains data.")
+
+    room_prices = []
+    for n in range(rooms):
+        room_type, capacity, price = rng.choice(ROOM_TYPES)
+        room_prices.append((100 + n, room_type, capacity, price))
+
+    guest_rows = _ChunkedInsert(conn, (
+        "INSERT INTO guests (guest_id, first_name, last_name, contact_email, contact_phone, "
+        "address, is_blacklisted) VALUES (?, ?, ?, ?, ?, ?, ?)"), chunk_size)
+    for g in range(1, guests + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        guest_rows.add((g, first, last, f"{first.lower()}.{last.lower()}{g}@example.com",
+                        f"555-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}",
+                        f"{rng.randint(1, 999)} {rng.choice(STREETS)}", rng.random() < 0.01))
+    guest_rows.flush()
+
+    reservation_rows = _ChunkedInsert(conn, (
+        "INSERT INTO reservations (booking_id, room_number_fk, guest_id_fk, check_in_date, "
+        "check_out_date, total_bill, is_paid) VALUES (?, ?, ?, ?, ?, ?, ?)"), chunk_size)
+    charge_rows = _ChunkedInsert(conn, (
+        "INSERT INTO charges (reservation_id_fk, room_number_fk, description, amount, charge_date) "
+        "VALUES (?, ?, ?, ?, ?)"), chunk_size)
+
+    first_day = anchor - timedelta(days=days)
+    span = days + future_days
+    statuses = {}
+    booking_id = 0
+    charges_left = charges
+    for index, (room_number, _, _, price) in enumerate(room_prices):
+        stays = reservations // rooms + (1 if index < reservations % rooms else 0)
+        status = 'Available'
+        for i in range(stays):
+            # Stay i falls inside its own slot of the timeline.
+            slot_start = i * span // stays
+            slot_len = max(1, (i + 1) * span // stays - slot_start)
+            nights = rng.randint(1, max(1, min(7, slot_len)))
+            check_in = first_day + timedelta(days=slot_start + rng.randrange(max(1, slot_len - nights + 1)))
+            check_out = check_in + timedelta(days=nights)
+            booking_id += 1
+
+            # Spread the remaining charges evenly over the remaining stays.
+            stays_left = reservations - booking_id + 1
+            share = charges_left / stays_left
+            count = charges_left if stays_left == 1 else int(share) + (rng.random() < share - int(share))
+            charges_left -= count
+            extras = 0.0
+            for _ in range(count):
+                description, amount = rng.choice(CHARGE_ITEMS)
+                extras += amount
+                charge_rows.add((booking_id, room_number, description, amount,
+                                 (check_in + timedelta(days=rng.randrange(nights))).isoformat()))
+
+            is_paid = check_out <= anchor
+            if check_in <= anchor < check_out:
+                status = 'Occupied'
+            reservation_rows.add((booking_id, room_number, rng.randint(1, guests),
+                                  check_in.isoformat(), check_out.isoformat(),
+                                  nights * price + extras if is_paid else 0.0, is_paid))
+        statuses[room_number] = status
+
+    reservation_rows.flush()
+    charge_rows.flush()
+    conn.executemany(
+        "INSERT INTO rooms (room_number, room_type, description, capacity, price_per_night, status) "
+        "VALUES (?, ?, '', ?, ?, ?)",
+        [(number, room_type, capacity, price, statuses.get(number, 'Available'))
+         for number, room_type, capacity, price in room_prices])
+    conn.commit()
+    conn.close()
+
+    db = DBManager(f"sqlite:///{db_path}")
+    room_nights = db.rebuild_room_nights()
+    db.engine.dispose()
+    return {'rooms': rooms, 'guests': guest_rows.count, 'reservations': reservation_rows.count,
+            'charges': charge_rows.count, 'room_nights': room_nights}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic hotel database")
+    parser.add_argument("db", help="SQLite file to create")
+    parser.add_argument("--rooms", type=int, default=300)
+    parser.add_argument("--guests", type=int, default=10_000)
+    parser.add_argument("--reservations", type=int, default=100_000)
+    parser.add_argument("--charges", type=int, default=50_000)
+    parser.add_argument("--days", type=int, default=5 * 365, help="Days of history before the anchor")
+    parser.add_argument("--future-days", type=int, default=90, help="Days of bookings after the anchor")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=date.fromisoformat, help="'Today' for the data (default: today)")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        raise SystemExit(f"{args.db} already exists; choose a new file.")
+    counts = generate(args.db, rooms=args.rooms, guests=args.guests, reservations=args.reservations,
+                      charges=args.charges, days=args.days, future_days=args.future_days,
+                      seed=args.seed, anchor=args.anchor)
+    print(", ".join(f"{count:,} {table}" for table, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,18 @@
 # db_manager.py
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, Boolean, ForeignKey
-from sqlalchemy.orm import sessionmaker, relationship, declarative_base
-from datetime import date, datetime
-from sqlalchemy import func, or_
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Date, Boolean, ForeignKey
+from sqlalchemy.orm import sessionmaker, scoped_session, relationship, declarative_base
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, exc, func, or_, insert, select, update, tuple_, text
+import functools
 import hashlib  # NEW IMPORT
+import threading
+import re
+import time
+from availability import RoomAvailabilityIndex
+from room_cache import RoomCache
+from folio_cache import FolioCache
 
 
 Base = declarative_base()
@@ -75,15 +83,990 @@ class Charge(Base):
     room = relationship("Room", back_populates="charges")
 
 
+class RoomNight(Base):
+    """Fact table: one row per room per occupied night, for reporting."""
+    __tablename__ = 'room_nights'
+    night_id = Column(Integer, primary_key=True)
+    room_number_fk = Column(Integer, ForeignKey('rooms.room_number'))
+    booking_id_fk = Column(Integer, ForeignKey('reservations.booking_id'))
+    night_date = Column(Date)
+    rate = Column(Float)
+
+
+class ImportCheckpoint(Base):
+    """How far a bulk import of one source file has got (see bulk_import.py)."""
+    __tablename__ = 'import_checkpoints'
+    source = Column(String, primary_key=True)
+    entity = Column(String)
+    fingerprint = Column(String)
+    rows_done = Column(Integer, default=0)
+    updated_at = Column(String)
+
+
+class DailyKPI(Base):
+    """Snapshot of one business day, written by the night audit."""
+    __tablename__ = 'daily_kpis'
+    business_date = Column(Date, primary_key=True)
+    total_rooms = Column(Integer)
+    occupied_rooms = Column(Integer)
+    out_of_service_rooms = Column(Integer)
+    arrivals = Column(Integer)
+    departures = Column(Integer)
+    in_house = Column(Integer)
+    no_shows = Column(Integer)
+    overstays = Column(Integer)
+    room_nights_sold = Column(Integer)
+    room_revenue = Column(Float)
+    occupancy_rate = Column(Float)
+    adr = Column(Float)
+    revpar = Column(Float)
+    audited_at = Column(String)
+
+
+class AuditException(Base):
+    """A reservation the night audit flagged for the front desk to look at."""
+    __tablename__ = 'audit_exceptions'
+    business_date = Column(Date, primary_key=True)
+    booking_id_fk = Column(Integer, ForeignKey('reservations.booking_id'), primary_key=True)
+    kind = Column(String, primary_key=True)  # no_show, overstay, room_not_ready
+    room_number_fk = Column(Integer, ForeignKey('rooms.room_number'))
+
+
+class GuestArrival(Base):
+    """
+    A guest who has actually arrived for a reservation: checked in at the
+    desk, or confirmed on arrival. The night audit flags the stays that
+    began without one as no-shows.
+    """
+    __tablename__ = 'guest_arrivals'
+    booking_id_fk = Column(Integer, ForeignKey('reservations.booking_id'), primary_key=True)
+    arrived_on = Column(Date)
+
+
+class SchemaInfo(Base):
+    """Facts about the database file itself, e.g. the schema fingerprint."""
+    __tablename__ = 'schema_info'
+    name = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+
+
+# FTS5 index over the searchable guest columns. It is an external-content
+# table (the text lives in `guests`) kept in sync by triggers, created by the
+# migrations rather than create_all().
+GUEST_FTS_COLUMNS = "first_name, last_name, contact_email, contact_phone, address"
+
+# Expands every reservation into its nights [check_in, check_out) at the room's
+# current rate. Used to backfill room_nights and by rebuild_room_nights().
+ROOM_NIGHTS_REBUILD_SQL = [
+    "DELETE FROM room_nights",
+    """
+    INSERT INTO room_nights (room_number_fk, booking_id_fk, night_date, rate)
+    WITH RECURSIVE nights (booking_id, room_number, night_date, check_out_date) AS (
+        SELECT booking_id, room_number_fk, check_in_date, check_out_date
+        FROM reservations
+        WHERE check_out_date > check_in_date
+        UNION ALL
+        SELECT booking_id, room_number, date(night_date, '+1 day'), check_out_date
+        FROM nights
+        WHERE date(night_date, '+1 day') < check_out_date
+    )
+    SELECT n.room_number, n.booking_id, n.night_date, r.price_per_night
+    FROM nights n JOIN rooms r ON r.room_number = n.room_number
+    """,
+]
+
+# The night audit for business date :d (ISO string), as set-based statements
+# run in one transaction. An open stay is an unpaid reservation. Every
+# statement only moves rooms whose status is not yet what it should be and
+# the snapshot replaces that of an earlier run, so re-running an audit for
+# the same day changes nothing.
+NIGHT_AUDIT_SQL = {
+    # Arrival day (or a catch-up after missed audits): booked rooms whose
+    # stay has begun are occupied, unless the arrival day has passed with
+    # nobody arriving. A room marked Available on its guest's arrival day is
+    # taken to be ready for them too.
+    'promoted': """
+        UPDATE rooms SET status = 'Occupied'
+        WHERE (status = 'Booked' AND EXISTS (
+                  SELECT 1 FROM reservations r
+                  WHERE r.room_number_fk = rooms.room_number AND r.is_paid = 0
+                    AND r.check_in_date <= :d AND r.check_out_date > :d
+                    AND (r.check_in_date = :d OR EXISTS (
+                        SELECT 1 FROM guest_arrivals a WHERE a.booking_id_fk = r.booking_id))))
+           OR (status = 'Available' AND EXISTS (
+                  SELECT 1 FROM reservations r
+                  WHERE r.room_number_fk = rooms.room_number AND r.is_paid = 0
+                    AND r.check_in_date = :d))
+    """,
+    # Booked rooms with no open stay from today on (moved or cancelled)
+    'released_booked': """
+        UPDATE rooms SET status = 'Available'
+        WHERE status = 'Booked' AND NOT EXISTS (
+            SELECT 1 FROM reservations r
+            WHERE r.room_number_fk = rooms.room_number AND r.is_paid = 0
+              AND r.check_out_date > :d)
+    """,
+    # Occupied rooms with no stay begun and still open: nobody is in them.
+    'released_occupied': """
+        UPDATE rooms SET status = 'Needs Cleaning'
+        WHERE status = 'Occupied' AND NOT EXISTS (
+            SELECT 1 FROM reservations r
+            WHERE r.room_number_fk = rooms.room_number AND r.is_paid = 0
+              AND r.check_in_date <= :d)
+    """,
+    'clear_exceptions': "DELETE FROM audit_exceptions WHERE business_date = :d",
+    # no_show: the arrival day has passed and no arrival was recorded
+    #          (see GuestArrival), whatever the room's status says
+    # overstay: arrived, and still open on or after its check-out date
+    # room_not_ready: arriving today, but the room needs cleaning or is out of service
+    'exceptions': """
+        INSERT INTO audit_exceptions (business_date, booking_id_fk, kind, room_number_fk)
+        SELECT :d, r.booking_id,
+               CASE WHEN r.check_in_date < :d AND a.booking_id_fk IS NULL THEN 'no_show'
+                    WHEN r.check_out_date <= :d THEN 'overstay'
+                    ELSE 'room_not_ready' END,
+               r.room_number_fk
+        FROM reservations r
+        JOIN rooms ON rooms.room_number = r.room_number_fk
+        LEFT JOIN guest_arrivals a ON a.booking_id_fk = r.booking_id
+        WHERE r.is_paid = 0 AND r.check_in_date <= :d
+          AND ((r.check_in_date < :d AND a.booking_id_fk IS NULL)
+               OR r.check_out_date <= :d
+               OR (r.check_in_date = :d AND rooms.status != 'Occupied'))
+    """,
+    'snapshot': """
+        INSERT OR REPLACE INTO daily_kpis (
+            business_date, total_rooms, occupied_rooms, out_of_service_rooms, arrivals,
+            departures, in_house, no_shows, overstays, room_nights_sold, room_revenue,
+            occupancy_rate, adr, revpar, audited_at)
+        WITH
+            room_counts AS (
+                SELECT COUNT(*) AS total,
+                       COALESCE(SUM(status = 'Occupied'), 0) AS occupied,
+                       COALESCE(SUM(status = 'Out of Service'), 0) AS out_of_service
+                FROM rooms),
+            sold AS (
+                SELECT COUNT(*) AS nights, COALESCE(SUM(rate), 0.0) AS revenue
+                FROM room_nights WHERE night_date = :d),
+            flagged AS (
+                SELECT COALESCE(SUM(kind = 'no_show'), 0) AS no_shows,
+                       COALESCE(SUM(kind = 'overstay'), 0) AS overstays
+                FROM audit_exceptions WHERE business_date = :d)
+        SELECT :d, room_counts.total, room_counts.occupied, room_counts.out_of_service,
+               (SELECT COUNT(*) FROM reservations WHERE check_in_date = :d),
+               (SELECT COUNT(*) FROM reservations WHERE check_out_date = :d),
+               (SELECT COUNT(*) FROM reservations
+                WHERE is_paid = 0 AND check_in_date <= :d AND check_out_date > :d),
+               flagged.no_shows, flagged.overstays, sold.nights, sold.revenue,
+               CASE WHEN room_counts.total THEN 100.0 * sold.nights / room_counts.total ELSE 0.0 END,
+               CASE WHEN sold.nights THEN sold.revenue / sold.nights ELSE 0.0 END,
+               CASE WHEN room_counts.total THEN sold.revenue / room_counts.total ELSE 0.0 END,
+               :audited_at
+        FROM room_counts, sold, flagged
+    """,
+}
+
+
+# --- Schema Migrations ---
+# Each entry is (version, description, statements). The applied version is kept
+# in SQLite's PRAGMA user_version, so existing hotel_management.db files are
+# upgraded in place the next time DBManager opens them. Statements must be safe
+# to re-run (IF NOT EXISTS) in case a previous upgrade was interrupted.
+SCHEMA_MIGRATIONS = [
+    (1, "Composite indexes for the reservation, charge and room hot paths", [
+        # get_room_by_number / availability checks: room + date window
+        "CREATE INDEX IF NOT EXISTS ix_reservations_room_dates "
+        "ON reservations (room_number_fk, check_in_date, check_out_date)",
+        # get_revenue_report / history date-range overlap
+        "CREATE INDEX IF NOT EXISTS ix_reservations_dates "
+        "ON reservations (check_in_date, check_out_date)",
+        "CREATE INDEX IF NOT EXISTS ix_reservations_guest "
+        "ON reservations (guest_id_fk)",
+        # check_out_guest: SUM(amount) per reservation
+        "CREATE INDEX IF NOT EXISTS ix_charges_reservation "
+        "ON charges (reservation_id_fk, amount)",
+        # get_rooms_needing_cleaning
+        "CREATE INDEX IF NOT EXISTS ix_rooms_status ON rooms (status)",
+        "CREATE INDEX IF NOT EXISTS ix_guests_name "
+        "ON guests (last_name, first_name)",
+    ]),
+    (2, "room_nights fact table indexes and backfill", [
+        "CREATE INDEX IF NOT EXISTS ix_room_nights_date_room "
+        "ON room_nights (night_date, room_number_fk, rate)",
+        "CREATE INDEX IF NOT EXISTS ix_room_nights_booking "
+        "ON room_nights (booking_id_fk)",
+    ] + ROOM_NIGHTS_REBUILD_SQL),
+    (3, "Keyset index for newest-first reservation history", [
+        # The implicit rowid (booking_id) suffix makes this (check_in_date, booking_id).
+        "CREATE INDEX IF NOT EXISTS ix_reservations_check_in "
+        "ON reservations (check_in_date)",
+    ]),
+    (4, "FTS5 guest search index and sync triggers", [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS guests_fts USING fts5("
+        f"{GUEST_FTS_COLUMNS}, content='guests', content_rowid='guest_id', "
+        # Prefix indexes keep short as-you-type prefixes fast; without them
+        # "smi"* expands to every smith<N> token in the e-mail addresses.
+        f"prefix='1 2 3 4 5 6')",
+        f"""
+        CREATE TRIGGER IF NOT EXISTS guests_fts_insert AFTER INSERT ON guests BEGIN
+            INSERT INTO guests_fts (rowid, {GUEST_FTS_COLUMNS})
+            VALUES (new.guest_id, new.first_name, new.last_name, new.contact_email,
+                    new.contact_phone, new.address);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS guests_fts_delete AFTER DELETE ON guests BEGIN
+            INSERT INTO guests_fts (guests_fts, rowid, {GUEST_FTS_COLUMNS})
+            VALUES ('delete', old.guest_id, old.first_name, old.last_name, old.contact_email,
+                    old.contact_phone, old.address);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS guests_fts_update AFTER UPDATE ON guests BEGIN
+            INSERT INTO guests_fts (guests_fts, rowid, {GUEST_FTS_COLUMNS})
+            VALUES ('delete', old.guest_id, old.first_name, old.last_name, old.contact_email,
+                    old.contact_phone, old.address);
+            INSERT INTO guests_fts (rowid, {GUEST_FTS_COLUMNS})
+            VALUES (new.guest_id, new.first_name, new.last_name, new.contact_email,
+                    new.contact_phone, new.address);
+        END
+        """,
+        # Index the guests that already exist.
+        "INSERT INTO guests_fts (guests_fts) VALUES ('rebuild')",
+        "INSERT INTO guests_fts (guests_fts) VALUES ('optimize')",
+    ]),
+    (5, "Change counter for the rooms table (room cache invalidation)", [
+        "CREATE TABLE IF NOT EXISTS change_counters ("
+        "name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0)",
+        "INSERT OR IGNORE INTO change_counters (name, version) VALUES ('rooms', 0)",
+    ] + [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS rooms_changed_{operation.lower()} AFTER {operation} ON rooms BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'rooms';
+        END
+        """
+        for operation in ('INSERT', 'UPDATE', 'DELETE')
+    ]),
+    (6, "Change counter for folios: charges and reservations (folio cache invalidation)", [
+        "INSERT OR IGNORE INTO change_counters (name, version) VALUES ('folios', 0)",
+    ] + [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_changed_{operation.lower()} AFTER {operation} ON {table} BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'folios';
+        END
+        """
+        for table, operation in (('charges', 'INSERT'), ('charges', 'UPDATE'), ('charges', 'DELETE'),
+                                 ('reservations', 'UPDATE'), ('reservations', 'DELETE'))
+    ]),
+    (7, "Indexes for the night audit", [
+        # The partial ones hold only the few unpaid rows, however long the
+        # history gets: per room for the rollover, by date for the exceptions
+        # and the in-house count. Departures are counted paid or not.
+        "CREATE INDEX IF NOT EXISTS ix_reservations_open "
+        "ON reservations (room_number_fk, check_in_date, check_out_date) WHERE is_paid = 0",
+        "CREATE INDEX IF NOT EXISTS ix_reservations_open_dates "
+        "ON reservations (check_in_date, check_out_date) WHERE is_paid = 0",
+        "CREATE INDEX IF NOT EXISTS ix_reservations_check_out ON reservations (check_out_date)",
+    ]),
+    (8, "Change counter for bookings and the room list (availability index refresh)", [
+        "INSERT OR IGNORE INTO change_counters (name, version) VALUES ('availability', 0)",
+    ] + [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'availability';
+        END
+        """
+        for name, event in (
+            ('reservations_availability_insert', 'INSERT ON reservations'),
+            ('reservations_availability_update', 'UPDATE ON reservations'),
+            ('reservations_availability_delete', 'DELETE ON reservations'),
+            ('rooms_availability_insert', 'INSERT ON rooms'),
+            ('rooms_availability_delete', 'DELETE ON rooms'),
+            ('rooms_availability_type', 'UPDATE OF room_type ON rooms'),
+        )
+    ]),
+    (9, "Guest arrivals for the night audit's no-show check", [
+        # Guests already in their rooms have arrived; the rest of the stays
+        # that have begun are no-shows from the next audit on.
+        """
+        INSERT OR IGNORE INTO guest_arrivals (booking_id_fk, arrived_on)
+        SELECT r.booking_id, r.check_in_date
+        FROM reservations r JOIN rooms ON rooms.room_number = r.room_number_fk
+        WHERE r.is_paid = 0 AND r.check_in_date <= date('now', 'localtime')
+          AND rooms.status = 'Occupied'
+        """,
+    ]),
+    (10, "Case-insensitive guest email index for the bulk importer", [
+        "CREATE INDEX IF NOT EXISTS ix_guests_email_lower ON guests (lower(contact_email))",
+    ]),
+    (11, "Folio counter follows room rates (cached folios carry the rate)", [
+        """
+        CREATE TRIGGER IF NOT EXISTS rooms_rate_changed AFTER UPDATE OF price_per_night ON rooms BEGIN
+            UPDATE change_counters SET version = version + 1 WHERE name = 'folios';
+        END
+        """,
+    ]),
+]
+
+
+@functools.lru_cache(maxsize=None)
+def schema_fingerprint():
+    """
+    Hash of the declared tables and indexes and of the latest migration
+    version. It is stored in schema_info once create_all and the migrations
+    have run, so a start whose models and migrations have not changed since
+    can skip both (see DBManager._ensure_schema). Computed once per process.
+    """
+    parts = []
+    for name in sorted(Base.metadata.tables):
+        table = Base.metadata.tables[name]
+        parts.append(f"table {name}")
+        # Only what reaches the DDL: Python-side defaults such as
+        # date.today() would change the hash every day.
+        for column in table.columns:
+            parts.append(" ".join(map(str, (
+                column.name, repr(column.type), column.nullable, column.primary_key,
+                column.unique, column.server_default,
+                sorted(fk.target_fullname for fk in column.foreign_keys)))))
+        parts.extend(sorted(repr(index) for index in table.indexes))
+    parts.append(f"migration {SCHEMA_MIGRATIONS[-1][0]}")
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def _schema_is_current(conn):
+    """True if the database was brought up to this exact schema_fingerprint()."""
+    if conn.exec_driver_sql("PRAGMA user_version").scalar() < SCHEMA_MIGRATIONS[-1][0]:
+        return False
+    try:
+        stored = conn.execute(
+            select(SchemaInfo.value).where(SchemaInfo.name == 'fingerprint')).scalar()
+    except exc.OperationalError:
+        # No schema_info table yet: a new file, or one from before fingerprints.
+        return False
+    return stored == schema_fingerprint()
+
+
+def _record_schema_fingerprint(conn):
+    conn.execute(delete(SchemaInfo).where(SchemaInfo.name == 'fingerprint'))
+    conn.execute(insert(SchemaInfo).values(name='fingerprint', value=schema_fingerprint()))
+
+# Bumped by the rooms_changed_* triggers on every write to rooms, by any
+# process, so a cached copy can tell cheaply whether it is still current.
+ROOMS_VERSION_SQL = "SELECT version FROM change_counters WHERE name = 'rooms'"
+# Likewise for charges and reservations, i.e. anything on a guest's bill.
+FOLIOS_VERSION_SQL = "SELECT version FROM change_counters WHERE name = 'folios'"
+# And for the availability index: reservations, and which rooms exist of which type.
+AVAILABILITY_VERSION_SQL = "SELECT version FROM change_counters WHERE name = 'availability'"
+
+
+# --- Storage Profiles ---
+# SQLite settings applied to every pooled connection.
+#   journal_mode / synchronous / mmap_size / cache_size: PRAGMAs (None = SQLite default)
+#   busy_timeout_ms: how long SQLite itself waits for a lock before giving up
+#   lock_retries / retry_backoff_s: extra attempts, with exponential backoff,
+#       at starting a write transaction and at COMMIT once the busy timeout
+#       has run out
+#
+# 'multi_terminal' is for several front-desk terminals sharing one database:
+# in WAL mode reports no longer block check-ins (readers and the single
+# writer work side by side). WAL relies on shared memory, so every terminal
+# must open the file through the same host -- not over NFS/SMB.
+STORAGE_PROFILES = {
+    'default': {
+        'journal_mode': None,
+        'synchronous': None,
+        'mmap_size': None,
+        'cache_size': None,
+        'busy_timeout_ms': 5000,
+        'lock_retries': 0,
+        'retry_backoff_s': 0.05,
+    },
+    'multi_terminal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative = KiB, i.e. 64 MB
+        'busy_timeout_ms': 10000,
+        'lock_retries': 5,
+        'retry_backoff_s': 0.05,
+    },
+}
+
+
+def _room_dict(room):
+    return {
+        'number': room.room_number,
+        'type': room.room_type,
+        'price': room.price_per_night,
+        'capacity': room.capacity,
+        'description': room.description,
+        'status': room.status
+    }
+
+
+def _folio(rows, rate=None, as_of=None):
+    """
+    Builds a bill from DBManager._query_folio rows: the nights stayed up to
+    as_of (default today, counting the check-in day) at the room's rate or
+    `rate`, plus the itemized extra charges.
+    """
+    stay = rows[0]
+    as_of = as_of or date.today()
+    rate = stay.price_per_night if rate is None else rate
+    nights = (as_of - stay.check_in_date).days + 1
+    charges = [{
+        'charge_id': r.charge_id,
+        'date': r.charge_date,
+        'description': r.description,
+        'amount': r.amount
+    } for r in rows if r.charge_id is not None]
+    room_charge = nights * rate
+    extras = sum(c['amount'] for c in charges)
+    return {
+        'booking_id': stay.booking_id,
+        'room_number': stay.room_number_fk,
+        'check_in': stay.check_in_date,
+        'check_out': stay.check_out_date,
+        'is_paid': stay.is_paid,
+        'rate': rate,
+        'nights': nights,
+        'room_charge': room_charge,
+        'charges': charges,
+        'extras': extras,
+        'total': room_charge + extras
+    }
+
+
+# --- Statements and Result Shapes ---
+# Built once here and executed by both DBManager and AsyncDBManager
+# (async_db_manager.py), so the two return the same results.
+
+GUEST_SEARCH_SQL = ("SELECT rowid FROM guests_fts WHERE guests_fts MATCH :match_expr "
+                    "ORDER BY rowid DESC LIMIT :limit")
+
+
+def _guest_search_tiers(terms):
+    """
+    FTS5 match expressions for search_guests, best tier first. Every term must
+    prefix-match some column; guests whose names match every term rank first.
+    Numbers never match a name, so the name tier is skipped rather than
+    scanning e.g. every "555".
+    """
+    # Quote each term so FTS5 operators typed by a user are literal.
+    phrases = " ".join(f'"{term}"*' for term in terms)
+    tiers = [phrases]
+    if not any(term.isdigit() for term in terms):
+        tiers.insert(0, f"{{first_name last_name}} : ({phrases})")
+    return tiers
+
+
+def _guest_summary(guest):
+    return {
+        'id': guest.guest_id,
+        'name': f"{guest.first_name} {guest.last_name}",
+        'email': guest.contact_email,
+        'phone': guest.contact_phone,
+        'address': guest.address,
+        'blacklisted': guest.is_blacklisted
+    }
+
+
+def _active_stay_select(room_number, today):
+    """The reservation in progress in a room today, with its guest and arrival date (None if not arrived)."""
+    return select(Reservation, Guest, GuestArrival.arrived_on).outerjoin(
+        Guest, Guest.guest_id == Reservation.guest_id_fk
+    ).outerjoin(
+        GuestArrival, GuestArrival.booking_id_fk == Reservation.booking_id
+    ).where(
+        Reservation.room_number_fk == room_number,
+        Reservation.check_out_date >= today,
+        Reservation.check_in_date <= today
+    ).limit(1)
+
+
+def _unarrived_stays_select(room_numbers, day):
+    """booking_id of the rooms' open stays in progress on `day` with no arrival recorded."""
+    return select(Reservation.booking_id).where(
+        Reservation.room_number_fk.in_(room_numbers),
+        Reservation.is_paid == False,
+        Reservation.check_in_date <= day,
+        Reservation.check_out_date > day,
+        Reservation.booking_id.not_in(select(GuestArrival.booking_id_fk))
+    )
+
+
+def _conflicts_select(room_numbers, check_in_date, check_out_date):
+    """
+    (room, booking_id) of the open stays overlapping [check_in_date,
+    check_out_date) in any of the rooms. Served by ix_reservations_open, so
+    it reads only unpaid rows however long the history is.
+    """
+    return select(Reservation.room_number_fk, Reservation.booking_id).where(
+        Reservation.room_number_fk.in_(room_numbers),
+        Reservation.is_paid == False,
+        Reservation.check_in_date < check_out_date,
+        Reservation.check_out_date > check_in_date
+    )
+
+
+def _availability_stays_select(today):
+    """
+    The stays the availability index holds. Paid reservations are finished
+    stays; anything ending by today cannot conflict with a new booking
+    (check-in can't be in the past).
+    """
+    return select(
+        Reservation.room_number_fk,
+        Reservation.check_in_date,
+        Reservation.check_out_date,
+        Reservation.booking_id
+    ).where(
+        Reservation.is_paid == False,
+        Reservation.check_out_date > today
+    )
+
+
+def _folio_select(reservation_id):
+    """The reservation, its room's rate and its charges: one query, one row per charge."""
+    return select(
+        Reservation.booking_id,
+        Reservation.room_number_fk,
+        Reservation.check_in_date,
+        Reservation.check_out_date,
+        Reservation.is_paid,
+        Room.price_per_night,
+        Charge.charge_id,
+        Charge.charge_date,
+        Charge.description,
+        Charge.amount
+    ).join(
+        Room, Room.room_number == Reservation.room_number_fk
+    ).outerjoin(
+        Charge, Charge.reservation_id_fk == Reservation.booking_id
+    ).where(
+        Reservation.booking_id == reservation_id
+    ).order_by(Charge.charge_id)
+
+
+def _history_select(search_query="", status_filter="All", start_date=None, end_date=None):
+    """Builds the filtered (unordered) reservation history query."""
+    query = select(
+        Reservation.booking_id,
+        Reservation.check_in_date,
+        Reservation.check_out_date,
+        Reservation.total_bill,
+        Reservation.is_paid,
+        Guest.first_name,
+        Guest.last_name,
+        Room.room_number,
+        Room.price_per_night,
+        Room.room_type
+    ).join(Guest).join(Room)
+
+    # 1. Status Filter
+    if status_filter == 'Paid':
+        query = query.where(Reservation.is_paid == True)
+    elif status_filter == 'Unpaid':
+        query = query.where(Reservation.is_paid == False)
+
+    # 2. Search Query (Guest Name or Room Number)
+    if search_query:
+        search_term = f"%{search_query}%"
+        query = query.where(or_(
+            func.lower(Guest.first_name).like(func.lower(search_term)),
+            func.lower(Guest.last_name).like(func.lower(search_term)),
+            Room.room_number.like(search_term)
+        ))
+
+    # 3. Date Range Filter
+    if start_date:
+        query = query.where(Reservation.check_out_date >= start_date)
+    if end_date:
+        query = query.where(Reservation.check_in_date <= end_date)
+
+    return query
+
+
+def _history_page_select(search_query="", status_filter="All", start_date=None, end_date=None,
+                         limit=None, after=None):
+    """One page of the history, newest check-in first (see get_reservation_history)."""
+    query = _history_select(search_query, status_filter, start_date, end_date)
+    if after is not None:
+        query = query.where(
+            tuple_(Reservation.check_in_date, Reservation.booking_id) < tuple_(*after))
+
+    # Order by check-in date (newest first)
+    query = query.order_by(
+        Reservation.check_in_date.desc(), Reservation.booking_id.desc())
+
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def _history_entry(row):
+    booking_id, ci_date, co_date, total_bill, is_paid, f_name, l_name, r_num, price, r_type = row
+    return {
+        'booking_id': booking_id,
+        'room_number': r_num,
+        'room_type': r_type,
+        'guest_name': f"{f_name} {l_name}",
+        'check_in': ci_date.strftime('%Y-%m-%d'),
+        'check_out': co_date.strftime('%Y-%m-%d'),
+        'bill': total_bill,
+        'is_paid': is_paid,
+        'cursor': (ci_date, booking_id)
+    }
+
+
+def _revenue_select(start_date, end_date):
+    """Paid revenue, occupied room nights and the room count, as one row of scalars."""
+    # Occupied nights come from the room_nights fact table. The old
+    # clipping of min(check_out, end) - max(check_in, start) counts the
+    # nights in [start, end), so the same window is used here.
+    occupied_nights_subq = select(func.count(RoomNight.night_id)).where(
+        RoomNight.night_date >= start_date,
+        RoomNight.night_date < end_date
+    ).scalar_subquery()
+
+    return select(
+        func.sum(Reservation.total_bill),
+        occupied_nights_subq,
+        select(func.count(Room.room_number)).scalar_subquery()
+    ).where(
+        Reservation.is_paid == True,
+        Reservation.check_in_date <= end_date,
+        Reservation.check_out_date >= start_date
+    )
+
+
+def _revenue_kpis(start_date, end_date, delta, row):
+    """The get_revenue_report dict, from one _revenue_select row."""
+    total_revenue, occupied_nights, total_rooms = row
+    total_revenue = total_revenue if total_revenue is not None else 0.0
+    occupied_nights = int(occupied_nights or 0)
+    total_rooms = total_rooms or 0
+
+    # Total Available Room Nights
+    total_available_nights = total_rooms * delta
+
+    # KPIs
+    occupancy_rate = (occupied_nights / total_available_nights) * \
+        100 if total_available_nights > 0 else 0.0
+
+    # Average Daily Rate (ADR)
+    adr = total_revenue / occupied_nights if occupied_nights > 0 else 0.0
+
+    # Revenue Per Available Room (RevPAR)
+    revpar = total_revenue / total_available_nights if total_available_nights > 0 else 0.0
+
+    return {
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d'),
+        'period_days': delta,
+        'total_rooms': total_rooms,
+        'total_revenue': total_revenue,
+        'occupied_nights': occupied_nights,
+        'available_nights': total_available_nights,
+        'occupancy_rate': occupancy_rate,
+        'adr': adr,
+        'revpar': revpar
+    }
+
+
+def _room_nights_rows(room_number, booking_id, check_in_date, check_out_date, rate):
+    """room_nights rows of one stay: one per night in [check_in_date, check_out_date)."""
+    return [{
+        'room_number_fk': room_number,
+        'booking_id_fk': booking_id,
+        'night_date': check_in_date + timedelta(days=offset),
+        'rate': rate
+    } for offset in range((check_out_date - check_in_date).days)]
+
+
+def _is_lock_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
 class DBManager:
     # Adding User model to the DBManager so we can reference it easily
     User = User
 
-    def __init__(self, db_url='sqlite:///hotel_management.db'):
-        self.engine = create_engine(db_url)
+    def __init__(self, db_url='sqlite:///hotel_management.db', pool_size=5, max_overflow=10,
+                 storage_profile='default'):
+        if isinstance(storage_profile, str):
+            storage_profile = STORAGE_PROFILES[storage_profile]
+        self.storage_profile = dict(STORAGE_PROFILES['default'], **storage_profile)
+        self._scope = threading.local()
+
+        # A bounded pool: the UI thread plus DBWorker threads each hold at most
+        # one connection, and only for the length of one unit of work.
+        self.engine = create_engine(
+            db_url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=30,
+            pool_pre_ping=True,
+            pool_recycle=3600
+        )
+        if self.engine.dialect.name == 'sqlite':
+            self._configure_sqlite()
+        self._ensure_schema()
+        # Each thread (the Tk loop, DBWorker threads) gets its own session.
+        # expire_on_commit=False: objects handed back to the views are plain
+        # snapshots that stay readable after their session is discarded.
+        self.session = scoped_session(sessionmaker(
+            bind=self.engine, expire_on_commit=False))
+        self.availability = RoomAvailabilityIndex()
+        self.load_availability_index()
+        self.room_cache = RoomCache()
+        self.folios = FolioCache()
+        self.instrumentation = None
+
+    def enable_instrumentation(self):
+        """Starts recording per-statement and per-method query timings (see instrumentation.py)."""
+        if self.instrumentation is None:
+            from instrumentation import QueryInstrumentation
+            self.instrumentation = QueryInstrumentation(self, Base.metadata)
+        return self.instrumentation
+
+    # --- SQLite Connection Setup ---
+
+    def _configure_sqlite(self):
+        """
+        Applies the storage profile to each new connection and takes over
+        transaction control from pysqlite, so that write units of work start
+        with BEGIN IMMEDIATE. Taking the write lock up front means a waiting
+        writer queues on busy_timeout instead of failing with "database is
+        locked" when it later tries to upgrade a read transaction.
+        """
+        profile = self.storage_profile
+
+        @event.listens_for(self.engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            # Let SQLAlchemy's "begin" event below emit BEGIN itself.
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout_ms'])}")
+            if profile['journal_mode']:
+                cursor.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+            if profile['synchronous']:
+                cursor.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+            if profile['mmap_size'] is not None:
+                cursor.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+            if profile['cache_size'] is not None:
+                cursor.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+            cursor.close()
+
+        @event.listens_for(self.engine, "begin")
+        def on_begin(conn):
+            mode = "IMMEDIATE" if getattr(self._scope, 'write', False) else "DEFERRED"
+            self._retry_locked(lambda: conn.exec_driver_sql(f"BEGIN {mode}"))
+
+        # A COMMIT refused with SQLITE_BUSY leaves the transaction open, so it
+        # is safe to simply try again.
+        dialect_commit = self.engine.dialect.do_commit
+        self.engine.dialect.do_commit = lambda dbapi_connection: self._retry_locked(
+            lambda: dialect_commit(dbapi_connection))
+
+    def _retry_locked(self, operation):
+        """Runs operation(), retrying with exponential backoff on lock errors."""
+        retries = self.storage_profile['lock_retries']
+        delay = self.storage_profile['retry_backoff_s']
+        for attempt in range(retries + 1):
+            try:
+                return operation()
+            except Exception as e:
+                if attempt == retries or not _is_lock_error(e):
+                    raise
+                time.sleep(delay * (2 ** attempt))
+
+    # --- Sessions / Unit of Work ---
+
+    @contextmanager
+    def session_scope(self, write=False):
+        """
+        One unit of work on the calling thread's session.
+
+        The outermost scope commits on success, rolls back on error and then
+        discards the session, so no identity map outlives a single public call
+        (memory stays flat however long the app runs). Nested scopes join the
+        outer one: methods end their work with self._commit(session), which
+        only the outermost scope carries out, so one business operation is
+        one transaction and one commit however many helpers it goes through.
+
+        write=True makes the outermost scope start its transactions with
+        BEGIN IMMEDIATE (see _configure_sqlite).
+        """
+        depth = getattr(self._scope, 'depth', 0)
+        self._scope.depth = depth + 1
+        if depth == 0:
+            self._scope.write = write
+            self._reset_unit_of_work()
+        session = self.session()
+        try:
+            yield session
+            if depth == 0:
+                self._commit(session)
+        except Exception:
+            if depth == 0:
+                self._rollback(session)
+                self._reset_unit_of_work()
+            raise
+        finally:
+            self._scope.depth = depth
+            if depth == 0:
+                self._scope.write = False
+                self.session.remove()
+
+    def _reset_unit_of_work(self):
+        self._scope.room_changes = {}     # room_number -> changed columns
+        self._scope.after_commit = []     # in-memory updates to apply once committed
+        self._scope.rollback_only = False
+
+    def _commit(self, session):
+        """
+        Commits the unit of work, unless called inside a nested scope, where
+        it leaves the commit to the outermost one. Room changes staged with
+        _stage_room_change and callbacks registered with _after_commit are
+        applied to the room cache and in-memory indexes only once the commit
+        has succeeded.
+        """
+        if self._scope.depth > 1:
+            return
+        if self._scope.rollback_only:
+            raise RuntimeError("Part of the operation failed; nothing was saved.")
+
+        room_changes = self._scope.room_changes
+        if room_changes:
+            # The counter read in the same transaction tells the room cache
+            # whether anyone else wrote to rooms in the meantime.
+            session.flush()
+            db_version = self._rooms_db_version(session)
+        session.commit()
+
+        callbacks = self._scope.after_commit
+        self._reset_unit_of_work()
+        if room_changes:
+            self.room_cache.patch(room_changes, db_version)
+        for callback in callbacks:
+            callback()
+
+    def _rollback(self, session):
+        """
+        Rolls the unit of work back. Inside a nested scope the outer work is
+        not ours to undo, so it is marked to be rolled back instead of
+        committed.
+        """
+        if self._scope.depth > 1:
+            self._scope.rollback_only = True
+            return
+        session.rollback()
+        self._reset_unit_of_work()
+
+    def _after_commit(self, callback):
+        """Runs callback() once the current unit of work has committed."""
+        self._scope.after_commit.append(callback)
+
+    def clear_session(self):
+        """Discards the calling thread's session and everything it has loaded."""
+        self.session.remove()
+
+    # --- Schema Migrations ---
+
+    def _ensure_schema(self):
+        """
+        Creates missing tables and applies pending migrations, unless the
+        database records that it already has this exact schema (see
+        schema_fingerprint): then a start costs one small read, not a
+        table-by-table inspection.
+        """
+        with self.engine.connect() as conn:
+            if _schema_is_current(conn):
+                return
         Base.metadata.create_all(self.engine)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        self._run_migrations()
+        with self.engine.begin() as conn:
+            _record_schema_fingerprint(conn)
+
+    def get_schema_version(self):
+        """Returns the last migration version applied to the database."""
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+    def _run_migrations(self):
+        """Applies any SCHEMA_MIGRATIONS newer than the stored version."""
+        current_version = self.get_schema_version()
+        for version, description, statements in SCHEMA_MIGRATIONS:
+            if version <= current_version:
+                continue
+            with self.engine.begin() as conn:
+                for statement in statements:
+                    conn.exec_driver_sql(statement)
+                # PRAGMA does not accept bound parameters
+                conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+
+    # --- Availability Index ---
+
+    def _availability_db_version(self, session):
+        return session.execute(text(AVAILABILITY_VERSION_SQL)).scalar()
+
+    def load_availability_index(self):
+        """(Re)builds the in-memory availability index from the database."""
+        with self.session_scope() as session:
+            # Counter and rows from one transaction, so they match.
+            db_version = self._availability_db_version(session)
+            rooms = session.execute(select(Room.room_number, Room.room_type)).all()
+            stays = session.execute(_availability_stays_select(date.today())).all()
+            self.availability.load(rooms, stays, db_version)
+
+    def _fresh_availability(self):
+        """Returns the availability index, first reloading it if any process changed bookings or rooms."""
+        if getattr(self._scope, 'depth', 0) == 0:
+            with self.session_scope() as session:
+                current = self.availability.is_current(self._availability_db_version(session))
+            if not current:
+                self.load_availability_index()
+        return self.availability
+
+    def _conflicting_stays(self, session, room_numbers, check_in_date, check_out_date):
+        """
+        (room, booking_id) of the open stays overlapping the dates in any of
+        the rooms, read from the database. Inside a write unit of work this
+        runs under SQLite's write lock (BEGIN IMMEDIATE), so nothing can be
+        booked in between the check and the commit, by this process or any
+        other.
+        """
+        return session.execute(
+            _conflicts_select(room_numbers, check_in_date, check_out_date)).all()
+
+    def _stage_availability_change(self, session, db_version_before, *changes):
+        """
+        Applies changes (callables updating the availability index) once the
+        unit of work has committed. db_version_before is the availability
+        counter as read at the start of this write transaction; the value after
+        the write is read here, still under the write lock (see
+        RoomAvailabilityIndex.advance).
+        """
+        session.flush()
+        db_version = self._availability_db_version(session)
+
+        def apply():
+            with self.availability.lock:
+                for change in changes:
+                    change()
+                self.availability.advance(db_version_before, db_version)
+        self._after_commit(apply)
+
+    def is_room_available(self, room_number, check_in_date, check_out_date):
+        """True if the room has no open reservation overlapping the stay."""
+        with self.session_scope() as session:
+            return not self._conflicting_stays(session, [room_number], check_in_date, check_out_date)
+
+    def find_available_rooms(self, check_in_date, check_out_date, room_type=None):
+        """Returns the room numbers (optionally of one type) free for the whole stay."""
+        return self._fresh_availability().free_rooms(check_in_date, check_out_date, room_type)
 
     # --- NEW: User Authentication Methods ---
 
@@ -93,396 +1076,729 @@ class DBManager:
 
     def add_initial_user(self, username, password, role='Admin'):
         """Adds a new user, checking for duplicates first."""
-        try:
-            if self.session.query(User).filter_by(username=username).first():
-                return False, "Username already exists."
-
-            hashed_password = self.hash_password(password)
-            new_user = User(
-                username=username,
-                password_hash=hashed_password,
-                role=role
-            )
-            self.session.add(new_user)
-            self.session.commit()
-            return True, "User created successfully."
-        except Exception as e:
-            self.session.rollback()
-            return False, f"Error creating user: {e}"
+        with self.session_scope(write=True) as session:
+            try:
+                if session.query(User).filter_by(username=username).first():
+                    return False, "Username already exists."
+
+                hashed_password = self.hash_password(password)
+                new_user = User(
+                    username=username,
+                    password_hash=hashed_password,
+                    role=role
+                )
+                session.add(new_user)
+                self._commit(session)
+                return True, "User created successfully."
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Error creating user: {e}"
+
+    def count_users(self):
+        with self.session_scope() as session:
+            return session.query(User).count()
 
     def check_credentials(self, username, password):
         """Authenticates a user by checking the hashed password."""
-        user = self.session.query(User).filter_by(username=username).first()
-
-        if user:
-            # Hash the input password and compare it to the stored hash
-            if user.password_hash == self.hash_password(password):
-                return True, user.role
-
-        return False, None
+        with self.session_scope() as session:
+            user = session.query(User).filter_by(username=username).first()
+
+            if user:
+                # Hash the input password and compare it to the stored hash
+                if user.password_hash == self.hash_password(password):
+                    return True, user.role
+
+            return False, None
+
+    # --- Room Cache ---
+
+    def _rooms_db_version(self, session):
+        return session.execute(text(ROOMS_VERSION_SQL)).scalar()
+
+    def _fresh_room_cache(self):
+        """Returns the room cache, first reloading it if any process changed the rooms."""
+        nested = getattr(self._scope, 'depth', 0) > 0
+        with self.session_scope() as session:
+            db_version = self._rooms_db_version(session)
+            if nested:
+                # Inside another unit of work, whose changes may yet be rolled
+                # back: read through its transaction and leave the cache alone.
+                throwaway = RoomCache()
+                throwaway.load([_room_dict(r) for r in session.query(Room)], db_version)
+                return throwaway
+            if not self.room_cache.is_current(db_version):
+                # Counter and rows from one transaction, so they match.
+                self.room_cache.load([_room_dict(r) for r in session.query(Room)], db_version)
+        return self.room_cache
+
+    def _stage_room_change(self, room_number, changes):
+        """Records a write to a room row, for the room cache to apply on commit."""
+        self._scope.room_changes.setdefault(room_number, {}).update(changes)
+
+    def _stage_room_status(self, session, room_numbers, new_status):
+        """Sets the status of the rooms (not committed); returns how many exist."""
+        updated = session.execute(update(Room).where(
+            Room.room_number.in_(room_numbers)).values(status=new_status)).rowcount
+        if updated == len(room_numbers):
+            for room_number in room_numbers:
+                self._stage_room_change(room_number, {'status': new_status})
+        elif updated:
+            # Some rooms don't exist, and there is no telling which rows the
+            # counter was bumped for: have the cache reload instead.
+            self._after_commit(self.room_cache.invalidate)
+        return updated
+
+    def _stage_arrivals(self, session, room_numbers, day):
+        """Records the guests of the rooms' stays in progress on `day` as arrived (not committed)."""
+        booking_ids = session.execute(_unarrived_stays_select(room_numbers, day)).scalars().all()
+        if booking_ids:
+            session.execute(insert(GuestArrival), [
+                {'booking_id_fk': booking_id, 'arrived_on': day} for booking_id in booking_ids])
 
     # --- Room Status & Basic Room Methods --- (All previous methods remain the same)
 
     def get_room_status(self):
-        rooms = self.session.query(Room).all()
-        return [{'number': r.room_number, 'type': r.room_type, 'status': r.status} for r in rooms]
+        _, rooms = self._fresh_room_cache().snapshot()
+        return [{'number': r['number'], 'type': r['type'], 'status': r['status']} for r in rooms]
+
+    def get_room_status_if_changed(self, known_version):
+        """
+        Like get_room_status, but returns (version, rooms) and leaves rooms as
+        None when the room cache is still at known_version -- nothing to redraw.
+        """
+        version, rooms = self._fresh_room_cache().snapshot()
+        if version == known_version:
+            return version, None
+        return version, [{'number': r['number'], 'type': r['type'], 'status': r['status']} for r in rooms]
 
     def get_room_by_number(self, room_number):
-        room = self.session.query(Room).filter_by(
-            room_number=room_number).first()
-        if room:
-            # Check for active reservations based on today's date
-            active_reservation = self.session.query(Reservation).filter(
-                Reservation.room_number_fk == room_number,
-                Reservation.check_out_date >= date.today(),
-                Reservation.check_in_date <= date.today()
-            ).first()
-
-            if active_reservation:
-                guest = self.session.query(Guest).filter_by(
-                    guest_id=active_reservation.guest_id_fk).first()
-            else:
-                guest = None
-
-            return {
-                'number': room.room_number,
-                'type': room.room_type,
-                'status': room.status,
-                'price': room.price_per_night,
-                'capacity': room.capacity,
-                'description': room.description,
-                'reservation': active_reservation,
-                'guest': guest
-            }
-        return None
+        room = self._fresh_room_cache().get(room_number)
+        if room is None:
+            return None
+
+        with self.session_scope() as session:
+            # Active reservation (based on today's date), its guest and arrival in one query
+            active = session.execute(_active_stay_select(room_number, date.today())).first()
+        active_reservation, guest, arrived_on = active if active else (None, None, None)
+
+        return dict(room, reservation=active_reservation, guest=guest, arrived_on=arrived_on)
 
     def get_all_rooms(self):
-        rooms = self.session.query(Room).all()
-        return [{
-            'number': r.room_number,
-            'type': r.room_type,
-            'price': r.price_per_night,
-            'capacity': r.capacity,
-            'description': r.description,
-            'status': r.status
-        } for r in rooms]
+        _, rooms = self._fresh_room_cache().snapshot()
+        return rooms
 
     def update_room_status(self, room_number, new_status):
-        room = self.session.query(Room).filter_by(
-            room_number=room_number).first()
-        if room:
-            room.status = new_status
-            self.session.commit()
-            return True
-        return False
+        with self.session_scope(write=True) as session:
+            if self._stage_room_status(session, [room_number], new_status):
+                if new_status == 'Occupied':
+                    self._stage_arrivals(session, [room_number], date.today())
+                self._commit(session)
+                return True
+            return False
 
     def get_rooms_needing_cleaning(self):
         """Returns a list of rooms currently in 'Needs Cleaning' status."""
-        rooms = self.session.query(Room).filter_by(
-            status='Needs Cleaning').all()
-        return [{
-            'number': r.room_number,
-            'type': r.room_type,
-            'price': r.price_per_night,
-            'description': r.description,
-            'status': r.status
-        } for r in rooms]
+        _, rooms = self._fresh_room_cache().snapshot()
+        return [r for r in rooms if r['status'] == 'Needs Cleaning']
 
     def update_room_details(self, room_number, data):
-        try:
-            room = self.session.query(Room).filter_by(
-                room_number=room_number).first()
-            if room:
-                if 'room_type' in data:
-                    room.room_type = data['room_type']
-                if 'price_per_night' in data:
-                    room.price_per_night = data['price_per_night']
-                if 'capacity' in data:
-                    room.capacity = data['capacity']
-                if 'description' in data:
-                    room.description = data['description']
-
-                self.session.commit()
-                return True, f"Room {room_number} details updated."
-            return False, "Room not found."
-        except Exception as e:
-            self.session.rollback()
-            return False, f"Database Error: {e}"
+        with self.session_scope(write=True) as session:
+            try:
+                room = session.query(Room).filter_by(
+                    room_number=room_number).first()
+                if room:
+                    if 'room_type' in data:
+                        availability_version = self._availability_db_version(session)
+                        room.room_type = data['room_type']
+                        self._stage_availability_change(
+                            session, availability_version, lambda: self.availability.set_room_type(
+                                room_number, data['room_type']))
+                    if 'price_per_night' in data:
+                        room.price_per_night = data['price_per_night']
+                    if 'capacity' in data:
+                        room.capacity = data['capacity']
+                    if 'description' in data:
+                        room.description = data['description']
+                    if 'status' in data:
+                        room.status = data['status']
+                        if data['status'] == 'Occupied':
+                            self._stage_arrivals(session, [room_number], date.today())
+
+                    self._stage_room_change(room_number, _room_dict(room))
+                    self._commit(session)
+                    return True, f"Room {room_number} details updated."
+                return False, "Room not found."
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Database Error: {e}"
 
     # --- Guest Management Methods ---
 
-    def search_guests(self, query):
-        search_term = f"%{query}%"
-
-        guests = self.session.query(Guest).filter(
-            or_(
-                func.lower(Guest.first_name).like(func.lower(search_term)),
-                func.lower(Guest.last_name).like(func.lower(search_term)),
-                func.lower(Guest.contact_email).like(func.lower(search_term)),
-                Guest.contact_phone.like(search_term)
-            )
-        ).all()
-
-        results = [{
-            'id': g.guest_id,
-            'name': f"{g.first_name} {g.last_name}",
-            'email': g.contact_email,
-            'phone': g.contact_phone,
-            'address': g.address,
-            'blacklisted': g.is_blacklisted
-        } for g in guests]
-
-        return results
+    def search_guests(self, query, limit=100):
+        """
+        Ranked prefix search over name, email, phone and address via FTS5.
+        Every word typed must prefix-match some column ("jo smi" finds John
+        Smith). An empty query lists guests alphabetically. At most `limit`
+        results are returned, best matches first.
+        """
+        with self.session_scope() as session:
+            terms = re.findall(r"\w+", query or "")
+
+            if not query or not query.strip():
+                guests = session.query(Guest).order_by(
+                    Guest.last_name, Guest.first_name).limit(limit).all()
+            elif not terms:
+                guests = []
+            else:
+                # bm25 ranking has to score every match, which takes hundreds
+                # of ms for a one-letter prefix over millions of guests.
+                # Instead guests whose names match every term rank first, then
+                # any other match, newest first within each tier. Both lookups
+                # stop after `limit` rows.
+                candidates = text(GUEST_SEARCH_SQL)
+                ranked_ids = {}
+                for match_expr in _guest_search_tiers(terms):
+                    for (guest_id,) in session.execute(
+                            candidates, {'match_expr': match_expr, 'limit': limit}):
+                        ranked_ids.setdefault(guest_id, len(ranked_ids))
+                    if len(ranked_ids) >= limit:
+                        break
+
+                guests = session.query(Guest).filter(
+                    Guest.guest_id.in_(list(ranked_ids)[:limit])).all()
+                guests.sort(key=lambda g: ranked_ids[g.guest_id])
+
+            return [_guest_summary(g) for g in guests]
 
     def get_guest_by_id(self, guest_id):
-        return self.session.query(Guest).filter_by(guest_id=guest_id).first()
+        with self.session_scope() as session:
+            return session.query(Guest).filter_by(guest_id=guest_id).first()
 
     def update_guest_profile(self, guest_id, data):
-        try:
-            guest = self.session.query(Guest).filter_by(
-                guest_id=guest_id).first()
-            if guest:
-                for key, value in data.items():
-                    if hasattr(guest, key):
-                        setattr(guest, key, value)
-                self.session.commit()
-                return True, "Profile updated."
-            return False, "Guest not found."
-        except Exception as e:
-            self.session.rollback()
-            return False, f"Database Error: {e}"
+        with self.session_scope(write=True) as session:
+            try:
+                guest = session.query(Guest).filter_by(
+                    guest_id=guest_id).first()
+                if guest:
+                    for key, value in data.items():
+                        if hasattr(guest, key):
+                            setattr(guest, key, value)
+                    self._commit(session)
+                    return True, "Profile updated."
+                return False, "Guest not found."
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Database Error: {e}"
 
     # --- Transaction & Billing Methods ---
 
     def check_in_guest(self, guest_data, reservation_data):
-        try:
-            # Convert date strings to date objects
-            check_in_date = datetime.strptime(
-                reservation_data['check_in_date_str'], '%Y-%m-%d').date()
-            checkout_date = datetime.strptime(
-                reservation_data['checkout_date_str'], '%Y-%m-%d').date()
-
-            # Validation
-            if check_in_date < date.today():
-                return False, "Check-in date cannot be in the past."
-            if checkout_date <= check_in_date:
-                return False, "Check-out date must be after the check-in date."
-
-            # Find or Create Guest
-            guest = self.session.query(Guest).filter_by(
-                contact_email=guest_data['email']).first()
-            if not guest:
-                guest = Guest(
-                    first_name=guest_data['first_name'],
-                    last_name=guest_data['last_name'],
-                    contact_email=guest_data['email'],
-                    contact_phone=guest_data['phone'],
-                    address=guest_data['address']
+        with self.session_scope(write=True) as session:
+            try:
+                # Convert date strings to date objects
+                check_in_date = datetime.strptime(
+                    reservation_data['check_in_date_str'], '%Y-%m-%d').date()
+                checkout_date = datetime.strptime(
+                    reservation_data['checkout_date_str'], '%Y-%m-%d').date()
+
+                # Validation
+                if check_in_date < date.today():
+                    return False, "Check-in date cannot be in the past."
+                if checkout_date <= check_in_date:
+                    return False, "Check-out date must be after the check-in date."
+
+                room_number = reservation_data['room_number']
+                # Before anything is written: a reservation for a room that
+                # doesn't exist would have no rate and no status to update.
+                if session.get(Room, room_number) is None:
+                    return False, "Room not found."
+
+                # Checked in the database, under the write lock this unit of
+                # work holds from its first statement (BEGIN IMMEDIATE): no
+                # terminal can book the room in between the check and the commit.
+                if self._conflicting_stays(session, [room_number], check_in_date, checkout_date):
+                    return False, f"Room {room_number} is already booked for part of {check_in_date} to {checkout_date}."
+                availability_version = self._availability_db_version(session)
+
+                # Find or Create Guest
+                guest = session.query(Guest).filter_by(
+                    contact_email=guest_data['email']).first()
+                if not guest:
+                    guest = Guest(
+                        first_name=guest_data['first_name'],
+                        last_name=guest_data['last_name'],
+                        contact_email=guest_data['email'],
+                        contact_phone=guest_data['phone'],
+                        address=guest_data['address']
+                    )
+                    session.add(guest)
+                    session.flush()
+
+                # Create Reservation
+                res = Reservation(
+                    room_number_fk=room_number,
+                    guest_id_fk=guest.guest_id,
+                    check_in_date=check_in_date,
+                    check_out_date=checkout_date,
+                    total_bill=0.0
                 )
-                self.session.add(guest)
-                self.session.flush()
-
-            # Create Reservation
-            res = Reservation(
-                room_number_fk=reservation_data['room_number'],
-                guest_id_fk=guest.guest_id,
-                check_in_date=check_in_date,
-                check_out_date=checkout_date,
-                total_bill=0.0
-            )
-            self.session.add(res)
-
-            # Update Room Status only if check-in is today
-            if check_in_date == date.today():
-                self.update_room_status(
-                    reservation_data['room_number'], 'Occupied')
-            else:
-                self.update_room_status(
-                    reservation_data['room_number'], 'Booked')
-
-            self.session.commit()
-            return True, "Check-in/Booking successful."
+                session.add(res)
+                session.flush()
+                self._sync_room_nights(
+                    session, res, reservation_data.get('price'), replace=False)
+
+                # Update Room Status only if check-in is today
+                if check_in_date == date.today():
+                    self._stage_room_status(session, [room_number], 'Occupied')
+                    session.add(GuestArrival(booking_id_fk=res.booking_id, arrived_on=check_in_date))
+                else:
+                    self._stage_room_status(session, [room_number], 'Booked')
+
+                self._stage_availability_change(
+                    session, availability_version, lambda: self.availability.add_stay(
+                        room_number, check_in_date, checkout_date, res.booking_id))
+                self._commit(session)
+                return True, "Check-in/Booking successful."
+
+            except ValueError:
+                self._rollback(session)
+                return False, "Invalid date format. Use YYYY-MM-DD."
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Database Error: {e}"
+
+    def book_group(self, bookings, check_in_date_str, checkout_date_str):
+        """
+        Books (or, arriving today, checks in) several rooms for the same dates
+        in one transaction: either every room is booked or none is.
 
-        except ValueError:
-            self.session.rollback()
-            return False, "Invalid date format. Use YYYY-MM-DD."
-        except Exception as e:
-            self.session.rollback()
-            return False, f"Database Error: {e}"
+        bookings is a list of {'room_number', 'guest', 'price'}, where 'guest'
+        is the guest_data dict check_in_guest takes and 'price' (optional)
+        overrides the room's nightly rate. Guests are matched by email, so one
+        lead guest may hold every room.
+        """
+        with self.session_scope(write=True) as session:
+            try:
+                check_in_date = datetime.strptime(check_in_date_str, '%Y-%m-%d').date()
+                checkout_date = datetime.strptime(checkout_date_str, '%Y-%m-%d').date()
+
+                if check_in_date < date.today():
+                    return False, "Check-in date cannot be in the past."
+                if checkout_date <= check_in_date:
+                    return False, "Check-out date must be after the check-in date."
+                if not bookings:
+                    return False, "No rooms selected."
+
+                room_numbers = [b['room_number'] for b in bookings]
+                if len(set(room_numbers)) != len(room_numbers):
+                    return False, "A room appears more than once in the group."
+
+                rates = dict(session.query(Room.room_number, Room.price_per_night).filter(
+                    Room.room_number.in_(room_numbers)).all())
+                unknown = [str(n) for n in room_numbers if n not in rates]
+                if unknown:
+                    return False, f"Unknown room(s): {', '.join(unknown)}."
+
+                # As in check_in_guest, checked in the database under the write lock.
+                taken = [str(n) for n in sorted({n for n, _ in self._conflicting_stays(
+                    session, room_numbers, check_in_date, checkout_date)})]
+                if taken:
+                    return False, f"Room(s) {', '.join(taken)} already booked for part of {check_in_date} to {checkout_date}."
+                availability_version = self._availability_db_version(session)
+
+                # Find or create all the guests at once
+                guest_data_by_email = {}
+                for b in bookings:
+                    guest_data_by_email.setdefault(b['guest']['email'], b['guest'])
+                guest_ids = dict(session.query(Guest.contact_email, Guest.guest_id).filter(
+                    Guest.contact_email.in_(list(guest_data_by_email))).all())
+                new_guests = [{
+                    'first_name': guest_data['first_name'],
+                    'last_name': guest_data['last_name'],
+                    'contact_email': email,
+                    'contact_phone': guest_data['phone'],
+                    'address': guest_data['address'],
+                    'is_blacklisted': False
+                } for email, guest_data in guest_data_by_email.items() if email not in guest_ids]
+                # Multi-row INSERTs; emails and rooms are unique within the
+                # group, so they tie the returned ids back to the rows.
+                if new_guests:
+                    guest_ids.update(session.execute(insert(Guest).returning(
+                        Guest.contact_email, Guest.guest_id), new_guests).all())
+
+                booking_ids = dict(session.execute(insert(Reservation).returning(
+                    Reservation.room_number_fk, Reservation.booking_id), [{
+                        'room_number_fk': b['room_number'],
+                        'guest_id_fk': guest_ids[b['guest']['email']],
+                        'check_in_date': check_in_date,
+                        'check_out_date': checkout_date,
+                        'total_bill': 0.0,
+                        'is_paid': False
+                    } for b in bookings]).all())
+
+                session.execute(insert(RoomNight), [
+                    night for b in bookings for night in _room_nights_rows(
+                        b['room_number'], booking_ids[b['room_number']], check_in_date, checkout_date,
+                        b['price'] if b.get('price') is not None else rates[b['room_number']])])
+
+                self._stage_room_status(
+                    session, room_numbers,
+                    'Occupied' if check_in_date == date.today() else 'Booked')
+                if check_in_date == date.today():
+                    session.execute(insert(GuestArrival), [
+                        {'booking_id_fk': booking_id, 'arrived_on': check_in_date}
+                        for booking_id in booking_ids.values()])
+
+                self._stage_availability_change(session, availability_version, *[
+                    functools.partial(self.availability.add_stay,
+                                      room_number, check_in_date, checkout_date, booking_id)
+                    for room_number, booking_id in booking_ids.items()])
+                self._commit(session)
+                return True, f"Group booking successful: {len(booking_ids)} rooms."
+
+            except ValueError:
+                self._rollback(session)
+                return False, "Invalid date format. Use YYYY-MM-DD."
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Database Error: {e}"
+
+    def record_arrival(self, reservation_id):
+        """
+        Confirms that the guest of a stay in progress has arrived, so the
+        night audit does not flag it as a no-show, and marks the room Occupied.
+        """
+        with self.session_scope(write=True) as session:
+            try:
+                res = session.get(Reservation, reservation_id)
+                if res is None:
+                    return False, "Reservation not found."
+                if res.is_paid:
+                    return False, "This reservation is already settled."
+                if res.check_in_date > date.today():
+                    return False, f"The stay only begins on {res.check_in_date}."
+
+                if session.get(GuestArrival, reservation_id) is None:
+                    session.add(GuestArrival(booking_id_fk=reservation_id, arrived_on=date.today()))
+                self._stage_room_status(session, [res.room_number_fk], 'Occupied')
+                self._commit(session)
+                return True, "Arrival recorded."
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Database Error: {e}"
 
     def check_out_guest(self, room_number, reservation_id, price_per_night):
-        try:
-            res = self.session.query(Reservation).filter_by(
-                booking_id=reservation_id).first()
-            if not res:
-                return False, "Reservation not found."
-
-            # Calculate days stayed based on check-in date vs today
-            days_stayed = (date.today() - res.check_in_date).days + 1
-            room_charge = days_stayed * price_per_night
-
-            extra_charges = self.session.query(func.sum(Charge.amount)).filter_by(
-                reservation_id_fk=reservation_id).scalar()
-            extra_charges = extra_charges if extra_charges is not None else 0.0
-
-            total_bill = room_charge + extra_charges
-
-            res.total_bill = total_bill
-            res.is_paid = True
-
-            self.update_room_status(room_number, 'Needs Cleaning')
-
-            self.session.commit()
-            return True, f"Check-out successful. Final Bill: ${total_bill:.2f} ({days_stayed} nights + ${extra_charges:.2f} extras)"
-
-        except Exception as e:
-            self.session.rollback()
-            return False, f"Check-out Error: {e}"
+        with self.session_scope(write=True) as session:
+            try:
+                # The same folio the check-out window shows, read afresh
+                # inside this transaction.
+                availability_version = self._availability_db_version(session)
+                rows = self._query_folio(session, reservation_id)
+                if not rows:
+                    return False, "Reservation not found."
+                folio = _folio(rows, price_per_night)
+                stay = rows[0]
+
+                session.execute(update(Reservation).where(
+                    Reservation.booking_id == reservation_id
+                ).values(total_bill=folio['total'], is_paid=True))
+
+                # Early departure: the remaining booked nights were never used.
+                departure_date = max(date.today(), stay.check_in_date + timedelta(days=1))
+                if departure_date < stay.check_out_date:
+                    res = session.get(Reservation, reservation_id)
+                    res.check_out_date = departure_date
+                    self._sync_room_nights(session, res)
+
+                self._stage_room_status(session, [room_number], 'Needs Cleaning')
+
+                # The stay is settled, so the room is free for new bookings.
+                self._stage_availability_change(
+                    session, availability_version, lambda: self.availability.remove_stay(reservation_id))
+                self._commit(session)
+                return True, f"Check-out successful. Final Bill: ${folio['total']:.2f} ({folio['nights']} nights + ${folio['extras']:.2f} extras)"
+
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Check-out Error: {e}"
+
+    def update_reservation_dates(self, reservation_id, check_in_date, check_out_date):
+        """Moves an open reservation to new dates, keeping room_nights in step."""
+        with self.session_scope(write=True) as session:
+            try:
+                if check_out_date <= check_in_date:
+                    return False, "Check-out date must be after the check-in date."
+
+                res = session.query(Reservation).filter_by(
+                    booking_id=reservation_id).first()
+                if not res:
+                    return False, "Reservation not found."
+                if res.is_paid:
+                    return False, "Cannot change the dates of a settled reservation."
+
+                # As in check_in_guest, checked in the database under the write lock.
+                clashes = [b for _, b in self._conflicting_stays(
+                    session, [res.room_number_fk], check_in_date, check_out_date) if b != reservation_id]
+                if clashes:
+                    return False, f"Room {res.room_number_fk} is already booked for part of {check_in_date} to {check_out_date}."
+                availability_version = self._availability_db_version(session)
+
+                res.check_in_date = check_in_date
+                res.check_out_date = check_out_date
+                self._sync_room_nights(session, res)
+                self._stage_availability_change(
+                    session, availability_version, lambda: self.availability.add_stay(
+                        res.room_number_fk, check_in_date, check_out_date, reservation_id))
+                self._commit(session)
+                return True, "Reservation dates updated."
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Database Error: {e}"
+
+    def _sync_room_nights(self, session, res, rate=None, replace=True):
+        """
+        Replaces the room_nights rows of one reservation (not committed).
+        replace=False skips deleting old rows, for a reservation just created.
+        """
+        if rate is None:
+            existing_rate = session.query(RoomNight.rate).filter_by(
+                booking_id_fk=res.booking_id).limit(1).scalar()
+            rate = existing_rate if existing_rate is not None else session.query(
+                Room.price_per_night).filter_by(room_number=res.room_number_fk).scalar()
+
+        if replace:
+            session.query(RoomNight).filter_by(
+                booking_id_fk=res.booking_id).delete(synchronize_session=False)
+
+        nights = _room_nights_rows(
+            res.room_number_fk, res.booking_id, res.check_in_date, res.check_out_date, rate)
+        if nights:
+            session.execute(insert(RoomNight), nights)
+
+    def rebuild_room_nights(self):
+        """Regenerates the whole room_nights fact table from reservations."""
+        with self.engine.begin() as conn:
+            for statement in ROOM_NIGHTS_REBUILD_SQL:
+                conn.exec_driver_sql(statement)
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql("SELECT COUNT(*) FROM room_nights").scalar()
+
+    # --- Folios ---
+
+    def _query_folio(self, session, reservation_id):
+        """The reservation, its room's rate and its charges: one query, one row per charge."""
+        return session.execute(_folio_select(reservation_id)).all()
+
+    def get_folio(self, reservation_id, rate=None):
+        """
+        The bill of a reservation as of today: nights, rate (the room's unless
+        `rate` is given), itemized charges and total -- see _folio. None if
+        there is no such reservation. The check-out window shows this and
+        check_out_guest bills it, so the preview and the final bill agree.
+        Cached per reservation until charges, reservations or room rates change.
+        """
+        nested = getattr(self._scope, 'depth', 0) > 0
+        with self.session_scope() as session:
+            if nested:
+                # Possibly uncommitted changes: don't cache them.
+                rows = self._query_folio(session, reservation_id)
+            else:
+                db_version = session.execute(text(FOLIOS_VERSION_SQL)).scalar()
+                rows = self.folios.get(reservation_id, db_version)
+                if rows is None:
+                    rows = self._query_folio(session, reservation_id)
+                    self.folios.put(reservation_id, rows, db_version)
+        return _folio(rows, rate) if rows else None
 
     def add_extra_charge(self, room_number, reservation_id, description, amount):
-        try:
-            charge = Charge(
-                reservation_id_fk=reservation_id,
-                room_number_fk=room_number,
-                description=description,
-                amount=amount,
-                charge_date=date.today()
-            )
-            self.session.add(charge)
-            self.session.commit()
-            return True, "Charge added successfully."
-        except Exception as e:
-            self.session.rollback()
-            return False, f"Error adding charge: {e}"
+        with self.session_scope(write=True) as session:
+            try:
+                charge = Charge(
+                    reservation_id_fk=reservation_id,
+                    room_number_fk=room_number,
+                    description=description,
+                    amount=amount,
+                    charge_date=date.today()
+                )
+                # The insert bumps the folios counter, so cached folios
+                # (this reservation's included) are dropped.
+                session.add(charge)
+                self._commit(session)
+                return True, "Charge added successfully."
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Error adding charge: {e}"
+
+    # --- Night Audit ---
+
+    def run_night_audit(self, business_date=None):
+        """
+        Rolls every room over to business_date (default today) and snapshots
+        the day, all in one transaction (see NIGHT_AUDIT_SQL):
+
+        - booked rooms whose stay begins today, or whose guest has arrived,
+          become Occupied
+        - booked rooms with no open stay left become Available, occupied rooms
+          with no stay in progress become Needs Cleaning
+        - open stays are flagged as no-shows (arrival day passed, no arrival
+          recorded), overstays or arrivals whose room is not ready, in
+          audit_exceptions
+        - the day's KPIs are written to daily_kpis
+
+        Safe to re-run for the same day. Returns (success, summary).
+        """
+        business_date = business_date or date.today()
+        params = {'d': business_date.isoformat(),
+                  'audited_at': datetime.now().isoformat(timespec='seconds')}
+        with self.session_scope(write=True) as session:
+            try:
+                started = time.perf_counter()
+                changed = {}
+                for name, statement in NIGHT_AUDIT_SQL.items():
+                    changed[name] = session.execute(text(statement), params).rowcount
+
+                kpis = session.query(DailyKPI).filter_by(business_date=business_date).one()
+                exceptions = session.query(
+                    AuditException.kind,
+                    AuditException.booking_id_fk,
+                    AuditException.room_number_fk,
+                    Guest.first_name,
+                    Guest.last_name,
+                    Reservation.check_in_date,
+                    Reservation.check_out_date
+                ).join(
+                    Reservation, Reservation.booking_id == AuditException.booking_id_fk
+                ).outerjoin(
+                    Guest, Guest.guest_id == Reservation.guest_id_fk
+                ).filter(
+                    AuditException.business_date == business_date
+                ).order_by(AuditException.kind, AuditException.room_number_fk).all()
+                self._commit(session)
+
+                # The room counter moved, so the room cache reloads by itself.
+                return True, {
+                    'business_date': business_date,
+                    'promoted': changed['promoted'],
+                    'released_booked': changed['released_booked'],
+                    'released_occupied': changed['released_occupied'],
+                    'kpis': {column.name: getattr(kpis, column.name)
+                             for column in DailyKPI.__table__.columns},
+                    'exceptions': [{
+                        'kind': e.kind,
+                        'booking_id': e.booking_id_fk,
+                        'room_number': e.room_number_fk,
+                        'guest': f"{e.first_name or ''} {e.last_name or ''}".strip(),
+                        'check_in': e.check_in_date,
+                        'check_out': e.check_out_date
+                    } for e in exceptions],
+                    'seconds': time.perf_counter() - started
+                }
+            except Exception as e:
+                self._rollback(session)
+                return False, f"Night audit error: {e}"
 
     # --- Reservation History & Reporting Methods ---
 
-    def get_reservation_history(self, search_query="", status_filter="All", start_date=None, end_date=None):
+    def get_reservation_history(self, search_query="", status_filter="All", start_date=None, end_date=None,
+                                limit=None, after=None):
         """
         Retrieves detailed reservation history based on various filters.
+
+        Results are ordered newest first by (check_in_date, booking_id). Pass
+        `limit` to fetch one page, and `after` = (check_in_date, booking_id) of
+        the last row already shown to fetch the page that follows it (keyset
+        pagination, so deep pages cost the same as the first one).
         """
-        try:
-            query = self.session.query(
-                Reservation.booking_id,
-                Reservation.check_in_date,
-                Reservation.check_out_date,
-                Reservation.total_bill,
-                Reservation.is_paid,
-                Guest.first_name,
-                Guest.last_name,
-                Room.room_number,
-                Room.price_per_night,
-                Room.room_type
-            ).join(Guest).join(Room)
-
-            # 1. Status Filter
-            if status_filter == 'Paid':
-                query = query.filter(Reservation.is_paid == True)
-            elif status_filter == 'Unpaid':
-                query = query.filter(Reservation.is_paid == False)
-
-            # 2. Search Query (Guest Name or Room Number)
-            if search_query:
-                search_term = f"%{search_query}%"
-                query = query.filter(or_(
-                    func.lower(Guest.first_name).like(func.lower(search_term)),
-                    func.lower(Guest.last_name).like(func.lower(search_term)),
-                    Room.room_number.like(search_term)
-                ))
-
-            # 3. Date Range Filter
-            if start_date:
-                query = query.filter(Reservation.check_out_date >= start_date)
-            if end_date:
-                query = query.filter(Reservation.check_in_date <= end_date)
-
-            # Order by check-in date (newest first)
-            query = query.order_by(Reservation.check_in_date.desc())
-
-            results = []
-            for (booking_id, ci_date, co_date, total_bill, is_paid, f_name, l_name, r_num, price, r_type) in query.all():
-                results.append({
+        with self.session_scope() as session:
+            try:
+                rows = session.execute(_history_page_select(
+                    search_query, status_filter, start_date, end_date, limit, after)).all()
+                return True, [_history_entry(row) for row in rows]
+
+            except Exception as e:
+                return False, f"Database query failed: {e}"
+
+    def iter_reservation_export(self, search_query="", status_filter="All", start_date=None, end_date=None,
+                                batch_size=1000):
+        """
+        Yields the reservation history (same filters as get_reservation_history)
+        with each reservation's charges joined in: one dict per charge, or a
+        single dict with empty charge fields for a stay without extras.
+
+        Rows are streamed with yield_per, so memory stays flat however many
+        there are. The export reads one consistent snapshot; outside WAL mode
+        (see STORAGE_PROFILES) writers wait until it has been consumed.
+        """
+        with self.session_scope() as session:
+            query = _history_select(
+                search_query, status_filter, start_date, end_date
+            ).outerjoin(
+                Charge, Charge.reservation_id_fk == Reservation.booking_id
+            ).add_columns(
+                Charge.charge_id, Charge.charge_date, Charge.description, Charge.amount
+            ).order_by(
+                Reservation.booking_id, Charge.charge_id
+            ).execution_options(yield_per=batch_size)
+
+            for (booking_id, ci_date, co_date, total_bill, is_paid, f_name, l_name, r_num, price, r_type,
+                 charge_id, charge_date, description, amount) in session.execute(query):
+                yield {
                     'booking_id': booking_id,
                     'room_number': r_num,
                     'room_type': r_type,
-                    'guest_name': f"{f_name} {l_name}",
-                    'check_in': ci_date.strftime('%Y-%m-%d'),
-                    'check_out': co_date.strftime('%Y-%m-%d'),
-                    'bill': total_bill,
-                    'is_paid': is_paid
-                })
-
-            return True, results
-
-        except Exception as e:
-            return False, f"Database query failed: {e}"
+                    'guest_first_name': f_name,
+                    'guest_last_name': l_name,
+                    'check_in': ci_date,
+                    'check_out': co_date,
+                    'nights': (co_date - ci_date).days,
+                    'price_per_night': price,
+                    'total_bill': total_bill,
+                    'is_paid': is_paid,
+                    'charge_id': charge_id,
+                    'charge_date': charge_date,
+                    'charge_description': description,
+                    'charge_amount': amount,
+                }
 
     def get_revenue_report(self, start_date, end_date):
         """
         Calculates key revenue and occupancy metrics for a given date range.
         """
-        try:
-            # Calculate total days in the period
-            delta = (end_date - start_date).days + 1
-            if delta <= 0:
-                return False, "End date must be after or equal to the start date."
-
-            # 1. Total Revenue (Sum of total_bill for paid reservations within the period)
-            total_revenue_query = self.session.query(
-                func.sum(Reservation.total_bill)
-            ).filter(
-                Reservation.is_paid == True,
-                Reservation.check_in_date <= end_date,
-                Reservation.check_out_date >= start_date
-            ).scalar()
-
-            total_revenue = total_revenue_query if total_revenue_query is not None else 0.0
-
-            # 2. Total Available Room Nights
-            total_rooms = self.session.query(
-                func.count(Room.room_number)).scalar()
-            total_available_nights = total_rooms * delta
-
-            # 3. Total Occupied Room Nights (Calculating Actual Stay within the reporting period)
-            occupied_nights = 0
-
-            # Get all relevant reservations (those overlapping the date range)
-            reservations = self.session.query(Reservation).filter(
-                Reservation.check_in_date <= end_date,
-                Reservation.check_out_date >= start_date
-            ).all()
-
-            for res in reservations:
-                stay_start = max(res.check_in_date, start_date)
-                stay_end = min(res.check_out_date, end_date)
-
-                nights = (stay_end - stay_start).days
-
-                if nights > 0:
-                    occupied_nights += nights
-
-            # 4. Calculate KPIs
-            occupancy_rate = (occupied_nights / total_available_nights) * \
-                100 if total_available_nights > 0 else 0.0
-
-            # Average Daily Rate (ADR)
-            adr = total_revenue / occupied_nights if occupied_nights > 0 else 0.0
-
-            # Revenue Per Available Room (RevPAR)
-            revpar = total_revenue / total_available_nights if total_available_nights > 0 else 0.0
-
-            return True, {
-                'start_date': start_date.strftime('%Y-%m-%d'),
-                'end_date': end_date.strftime('%Y-%m-%d'),
-                'period_days': delta,
-                'total_rooms': total_rooms,
-                'total_revenue': total_revenue,
-                'occupied_nights': occupied_nights,
-                'available_nights': total_available_nights,
-                'occupancy_rate': occupancy_rate,
-                'adr': adr,
-                'revpar': revpar
-            }
-
-        except Exception as e:
-            return False, f"Reporting error: {e}"
+        with self.session_scope() as session:
+            try:
+                # Calculate total days in the period
+                delta = (end_date - start_date).days + 1
+                if delta <= 0:
+                    return False, "End date must be after or equal to the start date."
+
+                # Total revenue (paid reservations), occupied room nights and
+                # the room count come back as scalars from one aggregate query.
+                row = session.execute(_revenue_select(start_date, end_date)).one()
+                return True, _revenue_kpis(start_date, end_date, delta, row)
+
+            except Exception as e:
+                return False, f"Reporting error: {e}"
+
+    def get_daily_occupancy(self, start_date, end_date):
+        """
+        Returns occupied rooms and room revenue per night in [start_date, end_date],
+        aggregated over the room_nights fact table.
+        """
+        with self.session_scope() as session:
+            try:
+                rows = session.query(
+                    RoomNight.night_date,
+                    func.count(RoomNight.night_id),
+                    func.sum(RoomNight.rate)
+                ).filter(
+                    RoomNight.night_date >= start_date,
+                    RoomNight.night_date <= end_date
+                ).group_by(RoomNight.night_date).order_by(RoomNight.night_date).all()
+
+                return True, [{
+                    'date': night_date.strftime('%Y-%m-%d'),
+                    'occupied_rooms': occupied,
+                    'room_revenue': room_revenue or 0.0
+                } for night_date, occupied, room_revenue in rows]
+            except Exception as e:
+                return False, f"Reporting error: {e}"
@@ -0,0 +1,121 @@
+# db_worker.py
+
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DBWorker:
+    """
+    Runs DBManager calls on a small thread pool so the Tk main loop never
+    waits on SQL.
+
+    Every request is submitted under a key (e.g. 'revenue_report'). Submitting
+    again under the same key supersedes the earlier request: it is cancelled if
+    it has not started, and its result is dropped if it has. Results are handed
+    back on the Tk thread by polling a queue with after(), since Tk widgets must
+    only be touched from the thread that created them.
+    """
+
+    def __init__(self, tk_root, db_manager, max_workers=4, poll_ms=20):
+        self.tk_root = tk_root
+        self.db_manager = db_manager
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hms-db")
+
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._generations = {}   # key -> id of the newest request
+        self._futures = {}       # key -> future of the newest request
+        self._next_id = 0
+        self._closed = False
+
+        self.tk_root.after(self.poll_ms, self._poll)
+
+    # --- Public API ---
+
+    def submit(self, key, fn, *args, on_done=None, on_error=None, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on a worker thread. on_done(result) or
+        on_error(exception) is later called on the Tk thread, unless the
+        request was superseded or cancelled in the meantime. Use key=None for
+        writes, which must never be superseded.
+        """
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            if key is None:
+                key = ('write', request_id)
+            previous = self._futures.get(key)
+            if previous is not None:
+                previous.cancel()
+            self._generations[key] = request_id
+            self._futures[key] = self.executor.submit(
+                self._run, key, request_id, fn, args, kwargs, on_done, on_error)
+        return request_id
+
+    def cancel(self, key):
+        """Drops the pending request for key, if any."""
+        with self._lock:
+            future = self._futures.pop(key, None)
+            self._generations.pop(key, None)
+        if future is not None:
+            future.cancel()
+
+    def is_pending(self, key):
+        with self._lock:
+            return key in self._futures
+
+    def shutdown(self):
+        self._closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- Worker side ---
+
+    def _run(self, key, request_id, fn, args, kwargs, on_done, on_error):
+        try:
+            outcome = (True, fn(*args, **kwargs))
+        except Exception as e:
+            outcome = (False, e)
+        finally:
+            # Each worker thread has its own scoped session; release it so its
+            # connection goes back to the pool and no identity map lingers.
+            self.db_manager.session.remove()
+        self._results.put((key, request_id, outcome, on_done, on_error))
+
+    # --- Tk side ---
+
+    def _is_current(self, key, request_id):
+        with self._lock:
+            if self._generations.get(key) != request_id:
+                return False
+            del self._generations[key]
+            del self._futures[key]
+            return True
+
+    def _poll(self):
+        if self._closed:
+            return
+        while True:
+            try:
+                key, request_id, (ok, value), on_done, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            if not self._is_current(key, request_id):
+                continue  # superseded by a newer request under the same key
+
+            try:
+                if ok:
+                    if on_done:
+                        on_done(value)
+                elif on_error:
+                    on_error(value)
+                else:
+                    traceback.print_exception(type(value), value, value.__traceback__)
+            except Exception:
+                traceback.print_exc()
+
+        self.tk_root.after(self.poll_ms, self._poll)
@@ -0,0 +1,42 @@
+# folio_cache.py
+
+import threading
+
+
+class FolioCache:
+    """
+    Folio rows per reservation (see DBManager.get_folio), so reopening a
+    room's check-out window does not query them again.
+
+    `db_version` is the value of the folios change counter (bumped by
+    triggers on every write to charges or reservations, from any process)
+    the entries were read at. When the counter moves, say because
+    add_extra_charge added a charge here or on another terminal, every entry
+    is dropped: a folio is one query to rebuild, a wrong bill is not worth
+    risking.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._folios = {}       # booking_id -> rows of DBManager._query_folio
+        self.db_version = None
+
+    def get(self, booking_id, db_version):
+        """Returns the cached rows, or None if there are none at db_version."""
+        with self.lock:
+            if db_version != self.db_version:
+                self._folios = {}
+                self.db_version = db_version
+                return None
+            return self._folios.get(booking_id)
+
+    def put(self, booking_id, rows, db_version):
+        """Stores rows read together with db_version (ignored if already outdated)."""
+        with self.lock:
+            if db_version == self.db_version:
+                self._folios[booking_id] = rows
+
+    def clear(self):
+        with self.lock:
+            self._folios = {}
+            self.db_version = None
@@ -0,0 +1,446 @@
+# hms_service.py
+
+"""
+HMS service: one process owns the database and serves DBManager to any
+number of terminals over a local HTTP/JSON API.
+
+Without it every terminal opens the SQLite file itself, and terminals
+coordinate only through file locks: writers queue on busy_timeout, and each
+process keeps its own room and folio caches and has to reload them after any
+other terminal writes. Here a single DBManager serves everybody:
+- writes run one at a time on the writer thread, so they never wait on a lock
+  held by another terminal;
+- reads run in parallel on a small pool;
+- the caches are shared by all terminals.
+
+Usage:
+    python hms_service.py [--db sqlite:///hotel_management.db] [--host 127.0.0.1] [--port 8765]
+    python hms_service.py --unix /tmp/hms.sock
+
+Terminals connect with HMSClient, a drop-in for DBManager in the views, e.g.
+    HMS_SERVICE_URL=http://127.0.0.1:8765 python main.py
+
+Protocol: POST /call/<method> with a JSON body {"args": [...], "kwargs": {...}}
+returns {"result": ...} or, with a 4xx/5xx status, {"error": "..."}.
+GET /health returns {"status": "ok"}. Dates and ORM rows are tagged (see
+_to_json), so the client gets back the same shapes a local DBManager returns.
+There is no authentication, so the service only listens on a loopback
+address or a Unix socket (start() refuses any other host), and it exposes no
+maintenance calls: rebuilding room_nights and the availability index stay
+with manage.py. add_initial_user only works while there are no users at all.
+"""
+
+import argparse
+import asyncio
+import http.client
+import ipaddress
+import json
+import socket
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from sqlalchemy import inspect
+
+from db_manager import Base, DBManager
+
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 16 * 1024 * 1024
+STREAM_BATCH_ROWS = 500
+
+# DBManager methods the service exposes, by how they run: 'read' on the reader
+# pool, 'write' on the single writer thread, 'stream' (generators) on the
+# reader pool, sent back row by row.
+EXPOSED_METHODS = {
+    'check_credentials': 'read',
+    'count_users': 'read',
+    'get_schema_version': 'read',
+    'is_room_available': 'read',
+    'find_available_rooms': 'read',
+    'get_room_status': 'read',
+    'get_room_status_if_changed': 'read',
+    'get_room_by_number': 'read',
+    'get_all_rooms': 'read',
+    'get_rooms_needing_cleaning': 'read',
+    'search_guests': 'read',
+    'get_guest_by_id': 'read',
+    'get_folio': 'read',
+    'get_reservation_history': 'read',
+    'get_revenue_report': 'read',
+    'get_daily_occupancy': 'read',
+    'add_initial_user': 'write',
+    'update_room_status': 'write',
+    'update_room_details': 'write',
+    'update_guest_profile': 'write',
+    'check_in_guest': 'write',
+    'book_group': 'write',
+    'record_arrival': 'write',
+    'check_out_guest': 'write',
+    'update_reservation_dates': 'write',
+    'add_extra_charge': 'write',
+    'run_night_audit': 'write',
+    'iter_reservation_export': 'stream',
+}
+
+
+class HMSServiceError(RuntimeError):
+    """A call the service refused or that failed on the service side."""
+
+
+def is_loopback(host):
+    """True for 'localhost' and loopback addresses (127.0.0.0/8, ::1)."""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+# --- Wire format ---
+
+def _to_json(value):
+    """json.dumps default: tags the types JSON has no notation for."""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, Base):
+        # Detached snapshot (expire_on_commit=False): plain column values.
+        return {'__row__': {attr.key: getattr(value, attr.key)
+                            for attr in inspect(value).mapper.column_attrs}}
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _from_json(obj):
+    """json.loads object_hook: undoes _to_json. Rows come back as attribute objects."""
+    if len(obj) == 1:
+        if '__date__' in obj:
+            return date.fromisoformat(obj['__date__'])
+        if '__datetime__' in obj:
+            return datetime.fromisoformat(obj['__datetime__'])
+        if '__row__' in obj:
+            return SimpleNamespace(**obj['__row__'])
+    return obj
+
+
+def dumps(value):
+    return json.dumps(value, default=_to_json, separators=(',', ':')).encode()
+
+
+def loads(data):
+    return json.loads(data, object_hook=_from_json)
+
+
+# --- Service ---
+
+class HMSService:
+    """
+    Serves one DBManager over HTTP/1.1 (keep-alive) on asyncio.
+
+    The event loop only parses requests and writes responses. DBManager calls,
+    and the JSON encoding of their results, run on executor threads: writes on
+    a single writer thread, reads on `readers` threads.
+    """
+
+    def __init__(self, db_manager, readers=4):
+        self.db_manager = db_manager
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hms-writer")
+        self.readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="hms-reader")
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+        if not unix_path and not is_loopback(host):
+            raise HMSServiceError(
+                f"Refusing to listen on {host}: the service has no authentication, "
+                "use a loopback address or --unix.")
+        if unix_path:
+            self.server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server
+
+    async def serve_forever(self, host='127.0.0.1', port=DEFAULT_PORT, unix_path=None):
+        server = await self.start(host, port, unix_path)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.writer.shutdown(wait=True)
+        self.readers.shutdown(wait=True)
+
+    # --- Calls (executor threads) ---
+
+    def _call(self, name, args, kwargs):
+        """Runs one DBManager method; returns (status, encoded JSON body)."""
+        try:
+            # First-run setup only. On the writer thread, so no other write
+            # through the service can slip in between the count and the insert.
+            if name == 'add_initial_user' and self.db_manager.count_users() > 0:
+                return 200, dumps({'result': (False, "Users already exist.")})
+            result = getattr(self.db_manager, name)(*args, **kwargs)
+            return 200, dumps({'result': result})
+        except Exception as e:
+            return 500, dumps({'error': f"{type(e).__name__}: {e}"})
+        finally:
+            # As in DBWorker: no session outlives the call on this thread.
+            self.db_manager.session.remove()
+
+    def _stream(self, name, args, kwargs, loop, batches, cancelled):
+        """Runs a generator method, handing its rows to the loop in NDJSON batches."""
+        def hand_over(batch):
+            asyncio.run_coroutine_threadsafe(batches.put(batch), loop).result()
+
+        rows = None
+        try:
+            lines = []
+            rows = getattr(self.db_manager, name)(*args, **kwargs)
+            for row in rows:
+                lines.append(dumps(row) + b'\n')
+                if len(lines) >= STREAM_BATCH_ROWS:
+                    hand_over(b''.join(lines))
+                    lines = []
+                    if cancelled.is_set():
+                        return
+            if lines:
+                hand_over(b''.join(lines))
+        except Exception as e:
+            hand_over(dumps({'__error__': f"{type(e).__name__}: {e}"}) + b'\n')
+        finally:
+            if rows is not None:
+                rows.close()  # ends its unit of work if the client left early
+            self.db_manager.session.remove()
+            hand_over(None)
+
+    # --- HTTP (event loop) ---
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    header, _, value = line.decode('latin-1').partition(':')
+                    headers[header.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, dumps({'error': "Request body too large."}))
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                await self._dispatch(method, target, body, writer)
+                if version != 'HTTP/1.1' or headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass  # client went away or sent garbage; drop the connection
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body, writer):
+        path = urllib.parse.urlsplit(target).path
+        if method == 'GET' and path == '/health':
+            await self._respond(writer, 200, dumps({'status': 'ok'}))
+            return
+
+        name = path[len('/call/'):] if path.startswith('/call/') else None
+        kind = EXPOSED_METHODS.get(name)
+        if method != 'POST' or kind is None:
+            await self._respond(writer, 404, dumps({'error': f"No such call: {method} {path}"}))
+            return
+        try:
+            payload = loads(body) if body else {}
+            args, kwargs = payload.get('args', []), payload.get('kwargs', {})
+        except (ValueError, AttributeError):
+            await self._respond(writer, 400, dumps({'error': "Body must be a JSON object."}))
+            return
+
+        loop = asyncio.get_running_loop()
+        if kind == 'stream':
+            await self._respond_stream(writer, loop, name, args, kwargs)
+            return
+        executor = self.writer if kind == 'write' else self.readers
+        status, response = await loop.run_in_executor(executor, self._call, name, args, kwargs)
+        await self._respond(writer, status, response)
+
+    async def _respond(self, writer, status, body):
+        writer.write(
+            f"HTTP/1.1 {status} {http.client.responses[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _respond_stream(self, writer, loop, name, args, kwargs):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        batches = asyncio.Queue(maxsize=4)
+        cancelled = threading.Event()
+        producer = loop.run_in_executor(
+            self.readers, self._stream, name, args, kwargs, loop, batches, cancelled)
+        finished = False
+        try:
+            while (batch := await batches.get()) is not None:
+                writer.write(b"%x\r\n%s\r\n" % (len(batch), batch))
+                await writer.drain()
+            finished = True
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            if not finished:
+                # The client went away mid-stream: stop the generator, and keep
+                # draining so it is never stuck handing over a batch.
+                cancelled.set()
+                while await batches.get() is not None:
+                    pass
+            await producer
+
+
+# --- Client ---
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class _ThreadConnections(threading.local):
+    """
+    One keep-alive connection per calling thread (the Tk loop and each DBWorker
+    thread). Stands in for DBManager.session, which DBWorker releases after
+    every call; the connections are worth keeping, so remove() does nothing.
+    """
+    connection = None
+
+    def remove(self):
+        pass
+
+
+class HMSClient:
+    """
+    Calls an HMS service in place of a local DBManager. Has the same methods
+    as DBManager (those in EXPOSED_METHODS) and returns the same values, with
+    ORM rows as read-only attribute objects. Failures on the service side
+    raise HMSServiceError.
+
+    url is http://host:port or unix:///path/to/socket.
+    """
+
+    instrumentation = None  # query timings live in the service process
+
+    def __init__(self, url, timeout=60):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme == 'unix':
+            self._connect = lambda: _UnixHTTPConnection(parts.path, timeout)
+        elif parts.scheme == 'http':
+            self._connect = lambda: http.client.HTTPConnection(
+                parts.hostname, parts.port or DEFAULT_PORT, timeout=timeout)
+        else:
+            raise ValueError(f"Unsupported service URL '{url}' (use http:// or unix://).")
+        self.url = url
+        self.session = _ThreadConnections()
+
+    def _request(self, method, path, body=None, retry=False):
+        local = self.session
+        for attempt in range(2):
+            if local.connection is None:
+                local.connection = self._connect()
+            try:
+                local.connection.request(
+                    method, path, body=body, headers={'Content-Type': 'application/json'})
+                return local.connection.getresponse()
+            except (ConnectionError, http.client.HTTPException, OSError):
+                local.connection.close()
+                local.connection = None
+                # A write may have gone through before the connection dropped;
+                # only reads are safe to send again.
+                if not retry or attempt:
+                    raise
+
+    def _call(self, name, args, kwargs):
+        retry = EXPOSED_METHODS[name] == 'read'
+        response = self._request('POST', f"/call/{name}", dumps({'args': args, 'kwargs': kwargs}), retry)
+        payload = loads(response.read())
+        if response.status != 200:
+            raise HMSServiceError(payload.get('error', f"HTTP {response.status}"))
+        return payload['result']
+
+    def _stream(self, name, args, kwargs):
+        response = self._request('POST', f"/call/{name}", dumps({'args': args, 'kwargs': kwargs}), True)
+        if response.status != 200:
+            raise HMSServiceError(loads(response.read()).get('error', f"HTTP {response.status}"))
+        try:
+            for line in response:
+                row = loads(line)
+                if isinstance(row, dict) and '__error__' in row:
+                    raise HMSServiceError(row['__error__'])
+                yield row
+        finally:
+            if not response.isclosed():
+                # Abandoned mid-stream: the connection cannot be reused.
+                self.session.connection.close()
+                self.session.connection = None
+
+    def health(self):
+        response = self._request('GET', '/health', retry=True)
+        return loads(response.read())
+
+
+def _remote_method(name):
+    if EXPOSED_METHODS[name] == 'stream':
+        def method(self, *args, **kwargs):
+            return self._stream(name, args, kwargs)
+    else:
+        def method(self, *args, **kwargs):
+            return self._call(name, args, kwargs)
+    method.__name__ = name
+    method.__doc__ = getattr(DBManager, name).__doc__
+    return method
+
+
+for _name in EXPOSED_METHODS:
+    setattr(HMSClient, _name, _remote_method(_name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hotel Management System service")
+    parser.add_argument("--db", default="sqlite:///hotel_management.db",
+                        help="SQLAlchemy database URL")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--readers", type=int, default=4, help="Threads serving reads")
+    args = parser.parse_args()
+    if not args.unix and not is_loopback(args.host):
+        parser.error(f"--host {args.host} is not a loopback address; the service "
+                     "has no authentication")
+
+    service = HMSService(DBManager(args.db, pool_size=args.readers + 1), readers=args.readers)
+    where = f"unix://{args.unix}" if args.unix else f"http://{args.host}:{args.port}"
+    print(f"HMS service on {where} ({args.db})")
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+# instrumentation.py
+
+"""
+Opt-in query instrumentation for DBManager.
+
+Enabled with DBManager.enable_instrumentation() (the app does this when the
+HMS_DIAGNOSTICS environment variable is set). SQLAlchemy cursor-execute
+events time every statement, and the public DBManager methods are wrapped so
+each statement is attributed to the method that issued it. For both, counts,
+total time and a latency histogram are kept.
+
+Two N+1 patterns are flagged per method call:
+    repeated   the same SELECT ran several times in one call -- a query in
+               a loop that one IN (...) or join would replace
+    follow-up  a lookup by primary key issued after an earlier query in the
+               same call -- e.g. fetching a reservation's guest separately
+               instead of joining it in
+"""
+
+import functools
+import inspect
+import json
+import re
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+# Upper bounds (ms) of the histogram buckets; the last one catches the rest.
+HISTOGRAM_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, float('inf')]
+
+OUTSIDE_METHODS = '(outside DBManager)'
+
+# Public methods that are not a unit of work worth timing.
+NOT_INSTRUMENTED = {'session_scope', 'clear_session', 'hash_password', 'enable_instrumentation'}
+
+_TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA')
+
+_POINT_LOOKUP = re.compile(r"\bWHERE\s+(\w+)\.(\w+)\s*=\s*\?")
+
+
+class LatencyStats:
+    """Count, total, max and a fixed-bucket histogram of durations in ms."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(HISTOGRAM_BOUNDS_MS)
+
+    def add(self, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.buckets):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'max_ms': round(self.max_ms, 3),
+            'histogram': {('inf' if bound == float('inf') else f"<={bound}"): count
+                          for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.buckets) if count},
+        }
+
+
+class QueryInstrumentation:
+    def __init__(self, db_manager, metadata, repeat_threshold=3):
+        self.db_manager = db_manager
+        self.engine = db_manager.engine
+        self.repeat_threshold = repeat_threshold
+        # (table, column) pairs that make a WHERE clause a point lookup.
+        self.primary_keys = {
+            (table.name, column.name)
+            for table in metadata.tables.values()
+            for column in table.primary_key.columns
+        }
+        self._closed = False
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.started_at = datetime.now()
+        self.statements = {}   # statement -> LatencyStats
+        self.methods = {}      # method -> LatencyStats
+        self.method_queries = {}  # method -> statements issued, over all calls
+        self.flags = {}        # (method, kind, statement) -> {'calls': n, 'detail': ...}
+
+        event.listen(self.engine, "before_cursor_execute", self._before_execute)
+        event.listen(self.engine, "after_cursor_execute", self._after_execute)
+        self._wrap_methods()
+
+    def close(self):
+        """Stops recording (the method wrappers stay, but become pass-through)."""
+        event.remove(self.engine, "before_cursor_execute", self._before_execute)
+        event.remove(self.engine, "after_cursor_execute", self._after_execute)
+        self._closed = True
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.now()
+            self.statements.clear()
+            self.methods.clear()
+            self.method_queries.clear()
+            self.flags.clear()
+
+    # --- Method Attribution ---
+
+    def _wrap_methods(self):
+        for name, function in inspect.getmembers(type(self.db_manager), inspect.isfunction):
+            if name.startswith('_') or name in NOT_INSTRUMENTED or inspect.isgeneratorfunction(function):
+                continue
+            setattr(self.db_manager, name, self._wrap(name, getattr(self.db_manager, name)))
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if self._closed:
+                return method(*args, **kwargs)
+            stack = self._stack()
+            call = {'method': name, 'statements': []}
+            stack.append(call)
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                stack.pop()
+                self._finish_call(call, elapsed_ms)
+        return wrapper
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish_call(self, call, elapsed_ms):
+        method, statements = call['method'], call['statements']
+        flags = []
+
+        counts = {}
+        for statement in statements:
+            counts[statement] = counts.get(statement, 0) + 1
+        for statement, count in counts.items():
+            if count >= self.repeat_threshold and statement.lstrip().upper().startswith('SELECT'):
+                flags.append(('repeated', statement, f"ran {count} times in one call"))
+
+        for position, statement in enumerate(statements):
+            match = _POINT_LOOKUP.search(statement)
+            if position and match and (match.group(1), match.group(2)) in self.primary_keys \
+                    and statement.lstrip().upper().startswith('SELECT'):
+                flags.append(('follow-up', statement,
+                              f"{match.group(1)} fetched by {match.group(2)} after "
+                              f"{position} earlier quer{'y' if position == 1 else 'ies'}; consider a join"))
+
+        with self._lock:
+            self.methods.setdefault(method, LatencyStats()).add(elapsed_ms)
+            self.method_queries[method] = self.method_queries.get(method, 0) + len(statements)
+            for kind, statement, detail in flags:
+                flag = self.flags.setdefault((method, kind, statement), {'calls': 0, 'detail': detail})
+                flag['calls'] += 1
+
+    # --- Statement Timing ---
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._hms_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - context._hms_started) * 1000
+        statement = " ".join(statement.split())
+        stack = self._stack()
+        # Transaction control is not a query of the method's own.
+        if stack and not statement.upper().startswith(_TRANSACTION_CONTROL):
+            stack[-1]['statements'].append(statement)
+        with self._lock:
+            self.statements.setdefault(statement, LatencyStats()).add(elapsed_ms)
+            if not stack:
+                self.method_queries[OUTSIDE_METHODS] = self.method_queries.get(OUTSIDE_METHODS, 0) + 1
+
+    # --- Reporting ---
+
+    def report(self):
+        """A JSON-serialisable snapshot, slowest (by total time) first."""
+        with self._lock:
+            methods = [dict(stats.as_dict(), method=name,
+                            queries_per_call=round(self.method_queries.get(name, 0) / stats.count, 2))
+                       for name, stats in self.methods.items()]
+            statements = [dict(stats.as_dict(), statement=statement)
+                          for statement, stats in self.statements.items()]
+            flags = [dict(flag, method=method, kind=kind, statement=statement)
+                     for (method, kind, statement), flag in self.flags.items()]
+            outside = self.method_queries.get(OUTSIDE_METHODS, 0)
+
+        methods.sort(key=lambda m: m['total_ms'], reverse=True)
+        statements.sort(key=lambda s: s['total_ms'], reverse=True)
+        flags.sort(key=lambda f: f['calls'], reverse=True)
+        return {
+            'since': self.started_at.isoformat(timespec='seconds'),
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'methods': methods,
+            'statements': statements,
+            'n_plus_one': flags,
+            'queries_outside_methods': outside,
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
+
+    def format_report(self, top=15):
+        """Plain-text summary for the diagnostics tab."""
+        report = self.report()
+        lines = [f"Recording since {report['since']}", "",
+                 f"{'Method':<34}{'calls':>7}{'q/call':>8}{'mean ms':>10}{'p95 ms':>9}{'max ms':>9}"]
+        for m in report['methods'][:top]:
+            lines.append(f"{m['method']:<34}{m['count']:>7}{m['queries_per_call']:>8}"
+                         f"{m['mean_ms']:>10.2f}{m['p95_ms']:>9.2f}{m['max_ms']:>9.2f}")
+
+        lines += ["", "Possible N+1 patterns:"]
+        if not report['n_plus_one']:
+            lines.append("  none seen")
+        for flag in report['n_plus_one'][:top]:
+            lines.append(f"  [{flag['kind']}] {flag['method']} ({flag['calls']} calls): {flag['detail']}")
+            lines.append(f"      {flag['statement'][:140]}")
+
+        lines += ["", f"{'Slowest statements (total ms)':<60}{'count':>7}{'total':>10}{'p95':>8}"]
+        for s in report['statements'][:top]:
+            lines.append(f"{s['statement'][:58]:<60}{s['count']:>7}{s['total_ms']:>10.1f}{s['p95_ms']:>8.2f}")
+        lines.append(f"\n{report['queries_outside_methods']} queries ran outside DBManager methods.")
+        return "\n".join(lines)
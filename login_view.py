@@ -47,8 +47,7 @@ class LoginView(customtkinter.CTkFrame):
 
     def _check_initial_setup(self):
         # Check if any users exist in the database
-        users_count = self.db_manager.session.query(
-            self.db_manager.User).count()
+        users_count = self.db_manager.count_users()
         if users_count == 0:
             messagebox.showinfo(
                 "First Run Setup", "No users found. Creating a default 'admin' user now.")
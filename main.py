@@ -1,13 +1,13 @@
 # main.py
 
+import os
 import customtkinter
 from db_manager import DBManager, Room
-from room_view import RoomStatusView
-from admin_panel_view import AdminPanelView
+from db_worker import DBWorker
 
 
 class HotelManagerApp(customtkinter.CTk):
-    def __init__(self):
+    def __init__(self, db_manager):
         super().__init__()
         self.title("Modern Hotel Management System (HMS)")
         customtkinter.set_appearance_mode("System")
@@ -31,7 +31,12 @@ class HotelManagerApp(customtkinter.CTk):
 
         # --- END WINDOW FIX ---
 
-        self.db_manager = DBManager()
+        # The DBManager (or HMSClient) opened by open_database: one engine,
+        # one schema check and one availability index load per process.
+        self.db_manager = db_manager
+        self.db_worker = DBWorker(self, self.db_manager)
+        self.room_view = None
+        self.admin_view = None
 
         self.grid_columnconfigure(0, weight=0)
         self.grid_columnconfigure(1, weight=1)
@@ -80,43 +85,66 @@ class HotelManagerApp(customtkinter.CTk):
         self.content_frame.grid_columnconfigure(0, weight=1)
         self.content_frame.grid_rowconfigure(0, weight=1)
 
-    def show_room_status_view(self):
+    def _show_content(self, view):
         for widget in self.content_frame.winfo_children():
-            widget.destroy()
+            widget.grid_forget()
+        view.grid(row=0, column=0, sticky="nsew")
 
-        self.room_view = RoomStatusView(
-            self.content_frame, self.db_manager, self)
-        self.room_view.grid(row=0, column=0, sticky="nsew")
+    def show_room_status_view(self):
+        # The dashboard is kept alive between visits so a refresh only
+        # repaints the room cards that changed.
+        if self.room_view is None:
+            from room_view import RoomStatusView
+            self.room_view = RoomStatusView(
+                self.content_frame, self.db_manager, self)
+        else:
+            self.room_view.load_room_cards()
+        self._show_content(self.room_view)
 
     def show_admin_panel_view(self):
-        for widget in self.content_frame.winfo_children():
-            widget.destroy()
+        # Kept alive too: each tab is built on its first visit and keeps the
+        # clerk's filters after that (see AdminPanelView.show_selected_tab).
+        if self.admin_view is None:
+            from admin_panel_view import AdminPanelView
+            self.admin_view = AdminPanelView(
+                self.content_frame, self.db_manager, self)
+        self._show_content(self.admin_view)
+        self.admin_view.show_selected_tab()
+
+
+def open_database():
+    """
+    The data layer for this terminal: the HMS service when HMS_SERVICE_URL
+    is set (see hms_service.py), otherwise the local database, seeded with
+    the sample rooms the first time.
+    """
+    service_url = os.environ.get('HMS_SERVICE_URL')
+    if service_url:
+        # The HMS service owns its own database.
+        from hms_service import HMSClient
+        return HMSClient(service_url)
 
-        self.admin_view = AdminPanelView(
-            self.content_frame, self.db_manager, self)
-        self.admin_view.grid(row=0, column=0, sticky="nsew")
+    db = DBManager()
+    with db.session_scope(write=True) as session:
+        if not session.query(Room).count():
+            session.add_all([
+                Room(room_number=101, room_type='Single', description='Basic room with 1 double bed',
+                     capacity=2, price_per_night=100.0, status='Available'),
+                Room(room_number=102, room_type='Double', description='Standard room with 2 double beds',
+                     capacity=4, price_per_night=150.0, status='Available'),
+                Room(room_number=201, room_type='Suite', description='Luxury suite with separate living area',
+                     capacity=3, price_per_night=250.0, status='Available'),
+                Room(room_number=202, room_type='Double', description='Standard room with 2 double beds',
+                     capacity=4, price_per_night=150.0, status='Available'),
+                Room(room_number=301, room_type='Single', description='Basic room with 1 double bed',
+                     capacity=2, price_per_night=100.0, status='Available'),
+            ])
+    # Hidden diagnostics: query timings and a Diagnostics tab in the admin panel.
+    if os.environ.get('HMS_DIAGNOSTICS'):
+        db.enable_instrumentation()
+    return db
 
 
 if __name__ == "__main__":
-
-    db = DBManager()
-
-    # Check and populate initial data
-    if not db.session.query(Room).count():
-        db.session.add_all([
-            Room(room_number=101, room_type='Single', description='Basic room with 1 double bed',
-                 capacity=2, price_per_night=100.0, status='Available'),
-            Room(room_number=102, room_type='Double', description='Standard room with 2 double beds',
-                 capacity=4, price_per_night=150.0, status='Available'),
-            Room(room_number=201, room_type='Suite', description='Luxury suite with separate living area',
-                 capacity=3, price_per_night=250.0, status='Available'),
-            Room(room_number=202, room_type='Double', description='Standard room with 2 double beds',
-                 capacity=4, price_per_night=150.0, status='Available'),
-            Room(room_number=301, room_type='Single', description='Basic room with 1 double bed',
-                 capacity=2, price_per_night=100.0, status='Available'),
-        ])
-        db.session.commit()
-    db.session.close()
-
-    app = HotelManagerApp()
+    app = HotelManagerApp(open_database())
     app.mainloop()
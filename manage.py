@@ -0,0 +1,172 @@
+# manage.py
+
+"""
+Headless maintenance commands for the hotel database.
+
+Usage:
+    python manage.py [--db sqlite:///hotel_management.db] rebuild-room-nights
+    python manage.py import [--rooms rooms.csv] [--guests guests.jsonl]
+                            [--reservations reservations.csv] [--charges charges.csv]
+                            [--chunk-size 5000] [--restart]
+    python manage.py export OUTPUT.csv|OUTPUT.parquet [--search TEXT] [--status All|Paid|Unpaid]
+                            [--start YYYY-MM-DD] [--end YYYY-MM-DD]
+    python manage.py night-audit [--date YYYY-MM-DD]
+    python manage.py portfolio-report PROPERTIES.json --start YYYY-MM-DD --end YYYY-MM-DD
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from bulk_import import BulkImporter, IMPORT_ORDER
+from data_export import EXPORT_FORMATS, export_reservations
+from db_manager import DBManager
+from multi_property import MultiPropertyManager
+
+
+def rebuild_room_nights(db, args):
+    count = db.rebuild_room_nights()
+    print(f"room_nights rebuilt: {count:,} rows.")
+
+
+def import_data(db, args):
+    sources = {entity: getattr(args, entity) for entity in IMPORT_ORDER if getattr(args, entity)}
+    if not sources:
+        raise SystemExit("Nothing to import: pass at least one of --rooms, --guests, "
+                         "--reservations, --charges.")
+
+    def progress(entity, stats, rows_per_s):
+        print(f"  {entity:<13} {stats['read']:>10,} read  {stats['inserted']:>10,} inserted"
+              f"  {rows_per_s:>9,.0f} rows/s", end="\r", flush=True)
+
+    importer = BulkImporter(db, chunk_size=args.chunk_size, on_progress=progress)
+    try:
+        results = importer.import_files(sources, restart=args.restart)
+    except ValueError as e:
+        raise SystemExit(f"\nImport stopped: {e}")
+
+    print()
+    for entity, stats in results.items():
+        resumed = f", resumed after record {stats['resumed_from']:,}" if stats['resumed_from'] else ""
+        print(f"{entity}: {stats['read']:,} read, {stats['inserted']:,} inserted, "
+              f"{stats['skipped']:,} duplicates skipped, {stats['rejected']:,} rejected "
+              f"in {stats['seconds']:.1f}s ({stats['rows_per_s']:,.0f} rows/s{resumed})")
+        for error in stats['errors']:
+            print(f"    {error}")
+        if stats['rejected'] > len(stats['errors']):
+            print(f"    ... and {stats['rejected'] - len(stats['errors']):,} more")
+
+
+def _iso_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a YYYY-MM-DD date")
+
+
+def export_data(db, args):
+    started = time.perf_counter()
+    try:
+        count = export_reservations(
+            db, args.output, fmt=args.format, search_query=args.search,
+            status_filter=args.status, start_date=args.start, end_date=args.end)
+    except (ValueError, ImportError) as e:
+        raise SystemExit(f"Export failed: {e}")
+    elapsed = time.perf_counter() - started
+    print(f"Exported {count:,} rows to {args.output} in {elapsed:.1f}s "
+          f"({count / elapsed if elapsed else 0:,.0f} rows/s).")
+
+
+def night_audit(db, args):
+    success, result = db.run_night_audit(args.date)
+    if not success:
+        raise SystemExit(result)
+
+    kpis = result['kpis']
+    print(f"Night audit for {result['business_date']} ({result['seconds']:.2f}s)")
+    print(f"  rooms: {result['promoted']} now occupied, {result['released_booked']} booked -> available, "
+          f"{result['released_occupied']} occupied -> needs cleaning")
+    print(f"  {kpis['occupied_rooms']}/{kpis['total_rooms']} rooms occupied "
+          f"({kpis['out_of_service_rooms']} out of service), {kpis['arrivals']} arrivals, "
+          f"{kpis['departures']} departures, {kpis['in_house']} stays in house")
+    print(f"  {kpis['room_nights_sold']} room nights sold, revenue ${kpis['room_revenue']:,.2f}, "
+          f"occupancy {kpis['occupancy_rate']:.1f}%, ADR ${kpis['adr']:,.2f}, RevPAR ${kpis['revpar']:,.2f}")
+    print(f"  {len(result['exceptions'])} exception(s)")
+    for e in result['exceptions']:
+        print(f"    {e['kind']:<15} room {e['room_number']:<6} booking {e['booking_id']:<8} "
+              f"{e['guest']:<30} {e['check_in']} to {e['check_out']}")
+
+
+def portfolio_report(db, args):
+    group = MultiPropertyManager.from_file(args.properties)
+    try:
+        started = time.perf_counter()
+        success, report = group.get_portfolio_revenue_report(args.start, args.end)
+        elapsed = time.perf_counter() - started
+    finally:
+        group.close()
+    if not success:
+        raise SystemExit(report)
+
+    print(f"Portfolio {report['start_date']} to {report['end_date']}: "
+          f"{len(report['properties'])} properties ({elapsed:.2f}s)")
+    print(f"  {'property':<12} {'rooms':>6} {'revenue':>14} {'occupancy':>10} {'ADR':>9} {'RevPAR':>9}")
+    for code, kpis in list(report['properties'].items()) + [('TOTAL', report)]:
+        print(f"  {code:<12} {kpis['total_rooms']:>6} ${kpis['total_revenue']:>13,.2f} "
+              f"{kpis['occupancy_rate']:>9.1f}% ${kpis['adr']:>8.2f} ${kpis['revpar']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hotel Management System maintenance")
+    parser.add_argument("--db", default="sqlite:///hotel_management.db",
+                        help="SQLAlchemy database URL")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser(
+        "rebuild-room-nights", help="Regenerate the room_nights fact table from reservations"
+    ).set_defaults(func=rebuild_room_nights)
+
+    import_parser = subparsers.add_parser(
+        "import", help="Bulk load rooms, guests, reservations and charges from CSV/JSONL")
+    for entity in IMPORT_ORDER:
+        import_parser.add_argument(f"--{entity}", metavar="FILE",
+                                   help=f"{entity.capitalize()} file (.csv or .jsonl)")
+    import_parser.add_argument("--chunk-size", type=int, default=5000,
+                               help="Rows per transaction")
+    import_parser.add_argument("--restart", action="store_true",
+                               help="Ignore checkpoints and import the files from the top")
+    import_parser.set_defaults(func=import_data)
+
+    export_parser = subparsers.add_parser(
+        "export", help="Stream reservation history with charges to CSV or Parquet")
+    export_parser.add_argument("output", help="Output file (.csv or .parquet)")
+    export_parser.add_argument("--format", choices=EXPORT_FORMATS,
+                               help="Defaults to the output file extension")
+    export_parser.add_argument("--search", default="", help="Guest name or room number")
+    export_parser.add_argument("--status", default="All", choices=["All", "Paid", "Unpaid"])
+    export_parser.add_argument("--start", type=_iso_date, help="Stays ending on/after this date")
+    export_parser.add_argument("--end", type=_iso_date, help="Stays starting on/before this date")
+    export_parser.set_defaults(func=export_data)
+
+    audit_parser = subparsers.add_parser(
+        "night-audit", help="Roll room statuses over to the business date and snapshot its KPIs")
+    audit_parser.add_argument("--date", type=_iso_date,
+                              help="Business date to audit (default: today)")
+    audit_parser.set_defaults(func=night_audit)
+
+    portfolio_parser = subparsers.add_parser(
+        "portfolio-report", help="Revenue KPIs across every property, and per property")
+    portfolio_parser.add_argument("properties",
+                                  help="JSON file mapping property code to database URL")
+    portfolio_parser.add_argument("--start", type=_iso_date, required=True)
+    portfolio_parser.add_argument("--end", type=_iso_date, required=True)
+    portfolio_parser.set_defaults(func=portfolio_report, uses_db=False)
+
+    args = parser.parse_args()
+    # Commands over several properties open their own databases instead.
+    db = DBManager(args.db) if getattr(args, 'uses_db', True) else None
+    args.func(db, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# multi_property.py
+
+"""
+Several hotels, one database (shard) each.
+
+MultiPropertyManager maps property codes to database URLs and routes each
+operation to that property's DBManager. Consolidated KPIs run the revenue
+report query on every shard at once, in a process pool, and add up the raw
+totals into portfolio occupancy, ADR and RevPAR.
+
+Properties come from a dict or a JSON file mapping code to database URL:
+    {"LIS": "sqlite:///lisbon.db", "OPO": "sqlite:///porto.db"}
+
+    group = MultiPropertyManager.from_file('properties.json')
+    group.manager('LIS').check_in_guest(guest_data, reservation_data)
+    success, report = group.get_portfolio_revenue_report(start_date, end_date)
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import create_engine
+
+from db_manager import DBManager, _revenue_kpis, _revenue_select
+
+
+# --- Shard workers (run in the pool's processes) ---
+
+# One engine per shard URL for the life of the worker, so a report only
+# pays for its query, not for connecting and starting up.
+_worker_engines = {}
+
+
+def _shard_totals(db_url, start_date, end_date):
+    """(paid revenue, occupied room nights, rooms) of one shard, as _revenue_select."""
+    engine = _worker_engines.get(db_url)
+    if engine is None:
+        engine = _worker_engines[db_url] = create_engine(db_url)
+    with engine.connect() as conn:
+        return tuple(conn.execute(_revenue_select(start_date, end_date)).one())
+
+
+class MultiPropertyManager:
+    """
+    `properties` maps property code to database URL. DBManagers are opened
+    on first use, so a single property's work never opens the others; a
+    consolidated report opens them all, to migrate any shard that is
+    behind. The report pool is started on the first consolidated report
+    and kept for later ones (see close).
+    """
+
+    def __init__(self, properties, max_workers=None, **db_options):
+        if not properties:
+            raise ValueError("At least one property is needed.")
+        self.properties = dict(properties)
+        self.db_options = db_options
+        self.max_workers = max_workers or min(len(self.properties), os.cpu_count() or 1)
+        self._managers = {}
+        self._pool = None
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def manager(self, property_code):
+        """The DBManager of one property, to run any DBManager operation on it."""
+        if property_code not in self.properties:
+            raise KeyError(f"Unknown property '{property_code}'.")
+        db = self._managers.get(property_code)
+        if db is None:
+            db = self._managers[property_code] = DBManager(
+                self.properties[property_code], **self.db_options)
+        return db
+
+    __getitem__ = manager
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for db in self._managers.values():
+            db.engine.dispose()
+        self._managers = {}
+
+    # --- Consolidated Reporting ---
+
+    def _shard_totals(self, start_date, end_date):
+        """Runs _shard_totals on every shard, in parallel when there is more than one CPU to use."""
+        # The workers query with a bare engine, so each shard's schema is
+        # brought up to date here first: opening its DBManager migrates it
+        # (room_nights included) once, and is a fingerprint check after that.
+        for code in self.properties:
+            self.manager(code)
+        urls = list(self.properties.values())
+        if self.max_workers <= 1 or len(urls) == 1:
+            return [_shard_totals(url, start_date, end_date) for url in urls]
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        futures = [self._pool.submit(_shard_totals, url, start_date, end_date) for url in urls]
+        return [future.result() for future in futures]
+
+    def get_portfolio_revenue_report(self, start_date, end_date):
+        """
+        get_revenue_report over every property: (True, report) with the
+        portfolio KPIs, and each property's own under report['properties'].
+
+        Portfolio figures are computed from the summed revenue, room nights
+        and rooms, not by averaging the properties' rates, so a 20-room inn
+        weighs what it should next to a 400-room resort.
+        """
+        delta = (end_date - start_date).days + 1
+        if delta <= 0:
+            return False, "End date must be after or equal to the start date."
+
+        try:
+            totals = self._shard_totals(start_date, end_date)
+        except Exception as e:
+            return False, f"Reporting error: {e}"
+
+        by_property = {code: _revenue_kpis(start_date, end_date, delta, row)
+                       for code, row in zip(self.properties, totals)}
+        portfolio = _revenue_kpis(start_date, end_date, delta, (
+            sum(p['total_revenue'] for p in by_property.values()),
+            sum(p['occupied_nights'] for p in by_property.values()),
+            sum(p['total_rooms'] for p in by_property.values())))
+        return True, dict(portfolio, properties=by_property)
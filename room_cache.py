@@ -0,0 +1,66 @@
+# room_cache.py
+
+import threading
+
+
+class RoomCache:
+    """
+    In-memory copy of the rooms table, so dashboard, admin and housekeeping
+    refreshes do not query it each time.
+
+    `db_version` is the value of the rooms change counter (bumped by triggers
+    on every write to rooms, from any process) that the copy corresponds to.
+    `version` is bumped on every change to the copy, so views can skip a
+    redraw when it has not moved.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._rooms = {}        # room_number -> dict of the room's columns
+        self.db_version = None  # None = not loaded, or known to be stale
+        self.version = 0
+
+    def load(self, rooms, db_version):
+        """Replaces the copy; rooms must have been read together with db_version."""
+        with self.lock:
+            if self.db_version is not None and db_version < self.db_version:
+                return  # a concurrent reload already installed newer data
+            self._rooms = {room['number']: room for room in rooms}
+            self.db_version = db_version
+            self.version += 1
+
+    def patch(self, changes, db_version):
+        """
+        Applies a committed local write: changes maps room_number to the
+        changed columns, one room row written per entry. db_version is the
+        counter as read inside the writing transaction: if anything else
+        changed the rooms since the copy was taken, the numbers don't line up
+        and the copy is dropped instead, so the next read reloads it.
+        """
+        with self.lock:
+            if self.db_version is None or any(n not in self._rooms for n in changes) or \
+                    db_version not in (self.db_version, self.db_version + len(changes)):
+                self.db_version = None
+                return
+            for room_number, room_changes in changes.items():
+                self._rooms[room_number] = dict(self._rooms[room_number], **room_changes)
+            self.db_version = db_version
+            self.version += 1
+
+    def invalidate(self):
+        with self.lock:
+            self.db_version = None
+
+    def is_current(self, db_version):
+        with self.lock:
+            return self.db_version is not None and self.db_version == db_version
+
+    def get(self, room_number):
+        with self.lock:
+            room = self._rooms.get(room_number)
+            return dict(room) if room else None
+
+    def snapshot(self):
+        """Returns (version, copies of all rooms ordered by room number)."""
+        with self.lock:
+            return self.version, [dict(self._rooms[number]) for number in sorted(self._rooms)]
@@ -1,11 +1,23 @@
 # room_view.py
 
 import customtkinter
-from db_manager import DBManager, Charge, Reservation, Guest
-from tkcalendar import Calendar
+from db_manager import DBManager, Reservation, Guest
 from tkinter import Frame, Toplevel
 from datetime import date, datetime
 from tkinter import messagebox
+import time
+
+
+STATUS_COLORS = {
+    'Available': 'green',
+    'Occupied': 'red',
+    'Needs Cleaning': 'orange',
+    'Out of Service': 'gray',
+    'Booked': 'blue'
+}
+
+# How often the dashboard checks for room changes made by other terminals.
+ROOM_POLL_MS = 5000
 
 
 class RoomStatusView(customtkinter.CTkFrame):
@@ -17,10 +29,30 @@ class RoomStatusView(customtkinter.CTkFrame):
         # Store a reference to the entry widget that needs the calendar date
         self.date_entry_target = None
 
+        # room number -> (card widget, (type, status)) so a refresh only
+        # touches the cards whose data actually changed.
+        self.room_cards = {}
+        self.room_order = []
+        # Room cache version the cards were drawn from; None = nothing drawn.
+        self.rooms_version = None
+        self._poll_job = None
+        # Optional callback(stats) called after every refresh, e.g.
+        # {'elapsed_ms': 1.8, 'rooms': 512, 'created': 0, 'updated': 1, 'removed': 0}
+        self.render_timing_hook = None
+        self.last_render_stats = None
+
         self.grid_columnconfigure(0, weight=1)
 
         customtkinter.CTkLabel(self, text="Room Status Dashboard", font=customtkinter.CTkFont(
             size=20, weight="bold")).grid(row=0, column=0, padx=20, pady=20, sticky="w")
+        header_actions = customtkinter.CTkFrame(self, fg_color="transparent")
+        header_actions.grid(row=0, column=0, padx=20, pady=20, sticky="e")
+        self.loading_label = customtkinter.CTkLabel(
+            header_actions, text="", text_color="gray")
+        self.loading_label.pack(side="left", padx=(0, 10))
+        customtkinter.CTkButton(header_actions, text="Group Booking",
+                                command=self.open_group_booking).pack(side="left")
+        self.group_window = None
 
         self.room_grid_frame = customtkinter.CTkScrollableFrame(
             self, label_text="Hotel Rooms")
@@ -31,37 +63,102 @@ class RoomStatusView(customtkinter.CTkFrame):
         self.load_room_cards()
 
     def load_room_cards(self):
-        for widget in self.room_grid_frame.winfo_children():
-            widget.destroy()
-
-        rooms = self.db_manager.get_room_status()
-        cols = 4
-
-        STATUS_COLORS = {
-            'Available': 'green',
-            'Occupied': 'red',
-            'Needs Cleaning': 'orange',
-            'Out of Service': 'gray',
-            'Booked': 'blue'
-        }
+        """Fetches room status off the UI thread, then repaints changed cards."""
+        if self.rooms_version is None:
+            self.loading_label.configure(text="Loading rooms...")
+        self.app_controller.db_worker.submit(
+            'room_status', self.db_manager.get_room_status_if_changed, self.rooms_version,
+            on_done=self._on_rooms_loaded, on_error=self._on_rooms_error)
+
+    def _on_rooms_loaded(self, result):
+        version, rooms = result
+        self._schedule_poll()
+        if rooms is None:
+            return  # nothing changed since the last draw
+        self.rooms_version = version
+        self._render_room_cards(rooms)
+
+    def _on_rooms_error(self, error):
+        self.loading_label.configure(text="Could not load rooms.")
+        self._schedule_poll()
+
+    def _schedule_poll(self):
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+        self._poll_job = self.after(ROOM_POLL_MS, self._poll_rooms)
+
+    def _poll_rooms(self):
+        # Cheap when nothing changed: one counter read, no redraw.
+        self._poll_job = None
+        if not self.app_controller.db_worker.is_pending('room_status'):
+            self.load_room_cards()
 
-        for i, room in enumerate(rooms):
-            row = i // cols
-            col = i % cols
+    def destroy(self):
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+            self._poll_job = None
+        super().destroy()
 
-            room_card = customtkinter.CTkButton(
-                self.room_grid_frame,
-                text=f"Room {room['number']}\n({room['type']})\nStatus: {room['status']}",
-                fg_color=STATUS_COLORS.get(room['status'], 'blue'),
-                command=lambda r_num=room['number']: self.open_room_detail(
-                    r_num)
-            )
-            room_card.grid(row=row, column=col, padx=10,
-                           pady=10, sticky="nsew")
+    def _render_room_cards(self, rooms):
+        self.loading_label.configure(text="")
+        started = time.perf_counter()
+        cols = 4
+        created = updated = 0
+
+        seen = set()
+        for room in rooms:
+            number = room['number']
+            seen.add(number)
+            state = (room['type'], room['status'])
+            text = f"Room {number}\n({room['type']})\nStatus: {room['status']}"
+            color = STATUS_COLORS.get(room['status'], 'blue')
+
+            if number not in self.room_cards:
+                card = customtkinter.CTkButton(
+                    self.room_grid_frame,
+                    text=text,
+                    fg_color=color,
+                    command=lambda r_num=number: self.open_room_detail(
+                        r_num)
+                )
+                self.room_cards[number] = (card, state)
+                created += 1
+            else:
+                card, old_state = self.room_cards[number]
+                if old_state != state:
+                    card.configure(text=text, fg_color=color)
+                    self.room_cards[number] = (card, state)
+                    updated += 1
+
+        removed = [number for number in self.room_cards if number not in seen]
+        for number in removed:
+            self.room_cards.pop(number)[0].destroy()
+
+        # Only re-grid when the set or order of rooms changed.
+        order = [room['number'] for room in rooms]
+        if order != self.room_order:
+            for i, number in enumerate(order):
+                self.room_cards[number][0].grid(row=i // cols, column=i % cols, padx=10,
+                                                pady=10, sticky="nsew")
+            self.room_order = order
 
         for c in range(cols):
             self.room_grid_frame.grid_columnconfigure(c, weight=1)
 
+        self.last_render_stats = {
+            'elapsed_ms': (time.perf_counter() - started) * 1000,
+            'rooms': len(rooms),
+            'created': created,
+            'updated': updated,
+            'removed': len(removed)
+        }
+        if self.render_timing_hook:
+            self.render_timing_hook(self.last_render_stats)
+
+    def update_status_list(self):
+        """Refreshes the dashboard in place (used by AppController)."""
+        self.load_room_cards()
+
     def open_room_detail(self, room_number):
         room_data = self.db_manager.get_room_by_number(room_number)
 
@@ -90,6 +187,145 @@ class RoomStatusView(customtkinter.CTkFrame):
         else:
             self._show_maintenance_options(room_number)
 
+    # --- Group Booking ---
+
+    def open_group_booking(self):
+        """Books many rooms for one party and one set of dates in a single step."""
+        if self.group_window is not None and self.group_window.winfo_exists():
+            self.group_window.destroy()
+
+        window = self.group_window = customtkinter.CTkToplevel(self.app_controller)
+        window.title("Group Booking")
+        window.geometry("560x700")
+        window.grid_columnconfigure((1, 2), weight=1)
+        window.grid_rowconfigure(4, weight=1)
+
+        # --- MODAL BEHAVIOR IMPLEMENTATION ---
+        window.transient(self.app_controller)
+        window.grab_set()
+        # -------------------------------------
+
+        customtkinter.CTkLabel(window, text="Group Booking", font=customtkinter.CTkFont(
+            size=16, weight="bold")).grid(row=0, column=0, columnspan=4, pady=10)
+
+        # Rows 1-2: Dates
+        customtkinter.CTkLabel(window, text="Check-in Date:").grid(
+            row=1, column=0, padx=10, pady=5, sticky="w")
+        self.group_checkin = customtkinter.CTkEntry(
+            window, placeholder_text="YYYY-MM-DD")
+        self.group_checkin.grid(row=1, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
+        self.group_checkin.insert(0, date.today().strftime('%Y-%m-%d'))
+        customtkinter.CTkButton(window, text="Select", width=80,
+                                command=lambda: self._open_calendar_popup(self.group_checkin, "Check-in")).grid(row=1, column=3, padx=10, pady=5)
+
+        customtkinter.CTkLabel(window, text="Check-out Date:").grid(
+            row=2, column=0, padx=10, pady=5, sticky="w")
+        self.group_checkout = customtkinter.CTkEntry(
+            window, placeholder_text="YYYY-MM-DD")
+        self.group_checkout.grid(row=2, column=1, columnspan=2, padx=5, pady=5, sticky="ew")
+        customtkinter.CTkButton(window, text="Select", width=80,
+                                command=lambda: self._open_calendar_popup(self.group_checkout, "Check-out")).grid(row=2, column=3, padx=10, pady=5)
+
+        # Row 3: Room type filter
+        room_types = sorted({r['type'] for r in self.db_manager.get_all_rooms() if r['type']})
+        self.group_room_type = customtkinter.CTkOptionMenu(
+            window, values=["All Types"] + room_types)
+        self.group_room_type.grid(row=3, column=0, columnspan=2, padx=10, pady=5, sticky="w")
+        customtkinter.CTkButton(window, text="Find Free Rooms",
+                                command=self._find_group_rooms).grid(row=3, column=2, padx=5, pady=5)
+        customtkinter.CTkButton(window, text="Select All", width=80,
+                                command=lambda: [box.select() for box, _ in self.group_room_boxes.values()]).grid(row=3, column=3, padx=10, pady=5)
+
+        # Row 4: Free rooms
+        self.group_room_frame = customtkinter.CTkScrollableFrame(
+            window, label_text="Free Rooms")
+        self.group_room_frame.grid(row=4, column=0, columnspan=4, padx=10, pady=5, sticky="nsew")
+        self.group_room_boxes = {}
+
+        # Rows 5-8: Lead guest, who holds every room
+        self.group_guest = {}
+        for row, (key, label, placeholder) in enumerate([
+                ('first_name', "First Name:", ""), ('last_name', "Last Name:", ""),
+                ('email', "Email:", ""), ('phone', "Phone:", ""),
+                ('address', "Address:", "Guest Address")], start=5):
+            customtkinter.CTkLabel(window, text=label).grid(
+                row=row, column=0, padx=10, pady=3, sticky="w")
+            entry = customtkinter.CTkEntry(window, placeholder_text=placeholder)
+            entry.grid(row=row, column=1, columnspan=3, padx=10, pady=3, sticky="ew")
+            self.group_guest[key] = entry
+
+        customtkinter.CTkButton(window, text="BOOK SELECTED ROOMS",
+                                command=self.handle_group_booking).grid(row=10, column=0, columnspan=4, pady=15)
+        self.group_status_label = customtkinter.CTkLabel(window, text="")
+        self.group_status_label.grid(row=11, column=0, columnspan=4, pady=(0, 10))
+
+    def _group_dates(self):
+        check_in = datetime.strptime(self.group_checkin.get(), '%Y-%m-%d').date()
+        check_out = datetime.strptime(self.group_checkout.get(), '%Y-%m-%d').date()
+        return check_in, check_out
+
+    def _find_group_rooms(self):
+        for box, _ in self.group_room_boxes.values():
+            box.destroy()
+        self.group_room_boxes = {}
+
+        try:
+            check_in, check_out = self._group_dates()
+        except ValueError:
+            self.group_status_label.configure(
+                text="Enter both dates as YYYY-MM-DD.", text_color="red")
+            return
+        if check_out <= check_in:
+            self.group_status_label.configure(
+                text="Check-out date must be after the check-in date.", text_color="red")
+            return
+
+        room_type = self.group_room_type.get()
+        free = self.db_manager.find_available_rooms(
+            check_in, check_out, None if room_type == "All Types" else room_type)
+        rooms = {r['number']: r for r in self.db_manager.get_all_rooms()}
+        for i, number in enumerate(free):
+            room = rooms.get(number)
+            if room is None or room['status'] == 'Out of Service':
+                continue
+            box = customtkinter.CTkCheckBox(
+                self.group_room_frame,
+                text=f"Room {number} ({room['type']}) - ${room['price']:.2f} / Night")
+            box.grid(row=i, column=0, padx=10, pady=2, sticky="w")
+            self.group_room_boxes[number] = (box, room['price'])
+
+        self.group_status_label.configure(
+            text=f"{len(self.group_room_boxes)} free rooms for {check_in} to {check_out}.",
+            text_color="gray")
+
+    def handle_group_booking(self):
+        selected = [(number, price) for number, (box, price) in self.group_room_boxes.items()
+                    if box.get()]
+        if not selected:
+            self.group_status_label.configure(text="Select at least one room.", text_color="red")
+            return
+
+        guest_data = {key: entry.get() for key, entry in self.group_guest.items()}
+        bookings = [{'room_number': number, 'guest': guest_data, 'price': price}
+                    for number, price in selected]
+
+        self.group_status_label.configure(
+            text=f"Booking {len(bookings)} rooms...", text_color="gray")
+        self.app_controller.db_worker.submit(
+            None, self.db_manager.book_group,
+            bookings, self.group_checkin.get(), self.group_checkout.get(),
+            on_done=lambda result: self._on_group_booking_done(*result),
+            on_error=lambda error: self._on_group_booking_done(False, error))
+
+    def _on_group_booking_done(self, success, message):
+        if success:
+            if self.group_window is not None and self.group_window.winfo_exists():
+                self.group_window.destroy()
+            self.load_room_cards()
+            messagebox.showinfo("Group Booking", message)
+        elif self.group_window is not None and self.group_window.winfo_exists():
+            self.group_status_label.configure(text=f"Error: {message}", text_color="red")
+
     # --- Helper Windows (Calendar/Charge) ---
 
     def _open_calendar_popup(self, target_entry, date_type_title):
@@ -117,6 +353,8 @@ class RoomStatusView(customtkinter.CTkFrame):
         if date_type_title == "Check-in":
             min_date_val = date.today()
 
+        # Imported on first use: most sessions never open a calendar.
+        from tkcalendar import Calendar
         self.cal = Calendar(tk_frame, selectmode='day',
                             date_pattern='yyyy-mm-dd', mindate=min_date_val)
         self.cal.pack(pady=10, padx=10, expand=True, fill='both')
@@ -279,13 +517,12 @@ class RoomStatusView(customtkinter.CTkFrame):
         guest = room_data['guest']
         price_per_night = room_data['price']
 
-        charges = self.db_manager.session.query(Charge).filter_by(
-            reservation_id_fk=res.booking_id).all()
-
-        days_stayed = (date.today() - res.check_in_date).days + 1
-        room_charge = days_stayed * price_per_night
-        extra_charges_total = sum(c.amount for c in charges)
-        estimated_total = room_charge + extra_charges_total
+        # The same folio check-out will bill (cached until charges change)
+        folio = self.db_manager.get_folio(res.booking_id, rate=price_per_night)
+        days_stayed = folio['nights']
+        room_charge = folio['room_charge']
+        charges = folio['charges']
+        estimated_total = folio['total']
 
         main_frame = customtkinter.CTkFrame(self.detail_window)
         main_frame.grid(row=1, column=0, padx=20, pady=10, sticky="nsew")
@@ -297,6 +534,10 @@ class RoomStatusView(customtkinter.CTkFrame):
             main_frame, text=f"Guest: {guest.first_name} {guest.last_name} ({guest.contact_phone})").pack(anchor="w", padx=20)
         customtkinter.CTkLabel(main_frame, text=f"Stay: {res.check_in_date} to {res.check_out_date} ({days_stayed} nights)").pack(
             anchor="w", padx=20, pady=(0, 10))
+        if room_data.get('arrived_on') is None:
+            # Without it the night audit reports the stay as a no-show.
+            customtkinter.CTkButton(main_frame, text="Confirm Guest Arrival",
+                                    command=lambda: self.handle_arrival(room_number, res.booking_id)).pack(pady=(0, 10))
 
         # 2. Charges Section
         charge_frame = customtkinter.CTkScrollableFrame(
@@ -315,9 +556,9 @@ class RoomStatusView(customtkinter.CTkFrame):
 
         row_idx = 2
         for charge in charges:
-            customtkinter.CTkLabel(charge_frame, text=charge.description).grid(
+            customtkinter.CTkLabel(charge_frame, text=charge['description']).grid(
                 row=row_idx, column=0, padx=10, sticky="w")
-            customtkinter.CTkLabel(charge_frame, text=f"${charge.amount:.2f}").grid(
+            customtkinter.CTkLabel(charge_frame, text=f"${charge['amount']:.2f}").grid(
                 row=row_idx, column=1, padx=10, sticky="e")
             row_idx += 1
 
@@ -339,6 +580,9 @@ class RoomStatusView(customtkinter.CTkFrame):
 
     # --- Controller Logic ---
 
+    def _detail_window_open(self):
+        return self.detail_window is not None and self.detail_window.winfo_exists()
+
     def handle_check_in(self, room_number, price):
         guest_data = {
             'first_name': self.entry_first.get(),
@@ -355,24 +599,52 @@ class RoomStatusView(customtkinter.CTkFrame):
             'price': price
         }
 
-        success, message = self.db_manager.check_in_guest(
-            guest_data, reservation_data)
+        self.error_label.configure(text="Saving booking...")
+        self.app_controller.db_worker.submit(
+            None, self.db_manager.check_in_guest,
+            guest_data, reservation_data,
+            on_done=lambda result: self._on_check_in_done(*result),
+            on_error=lambda error: self._on_check_in_done(False, error))
 
+    def _on_check_in_done(self, success, message):
         if success:
-            self.detail_window.destroy()
+            if self._detail_window_open():
+                self.detail_window.destroy()
             self.load_room_cards()
-        else:
+        elif self._detail_window_open():
             self.error_label.configure(text=f"Error: {message}")
 
-    def handle_check_out(self, room_number, booking_id, price_per_night):
-        success, message = self.db_manager.check_out_guest(
-            room_number, booking_id, price_per_night)
+    def handle_arrival(self, room_number, booking_id):
+        self.app_controller.db_worker.submit(
+            None, self.db_manager.record_arrival, booking_id,
+            on_done=lambda result: self._on_arrival_done(room_number, *result),
+            on_error=lambda error: self._on_arrival_done(room_number, False, error))
 
+    def _on_arrival_done(self, room_number, success, message):
         if success:
-            self.detail_window.destroy()
+            self.load_room_cards()
+            if self._detail_window_open():
+                self.open_room_detail(room_number)
+        elif self._detail_window_open():
+            self.checkout_error_label.configure(
+                text=f"Error: {message}", text_color="red")
+
+    def handle_check_out(self, room_number, booking_id, price_per_night):
+        self.checkout_error_label.configure(
+            text="Processing check-out...", text_color="gray")
+        self.app_controller.db_worker.submit(
+            None, self.db_manager.check_out_guest,
+            room_number, booking_id, price_per_night,
+            on_done=lambda result: self._on_check_out_done(*result),
+            on_error=lambda error: self._on_check_out_done(False, error))
+
+    def _on_check_out_done(self, success, message):
+        if success:
+            if self._detail_window_open():
+                self.detail_window.destroy()
             self.load_room_cards()
             messagebox.showinfo("Check-Out Success", message)
-        else:
+        elif self._detail_window_open():
             self.checkout_error_label.configure(
                 text=f"Error: {message}", text_color="red")
 
@@ -380,6 +652,6 @@ class RoomStatusView(customtkinter.CTkFrame):
         success = self.db_manager.update_room_status(room_number, new_status)
         if success:
             window_to_close.destroy()
-            self.load_room_cards()
-            # Important: Refresh the main dashboard via the controller
+            # Refreshes the dashboard via the controller, which repaints only
+            # the card that changed.
             self.app_controller.show_room_status_view()
@@ -0,0 +1,77 @@
+# tests/test_bulk_import.py
+
+"""
+Bulk imports write room_nights for the stays they import, and leave the
+nights of stays already on file alone.
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_import import BulkImporter
+from db_manager import DBManager, Reservation, Room, RoomNight
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DBManager(f"sqlite:///{tmp_path / 'hotel.db'}")
+    with manager.session_scope(write=True) as session:
+        session.add(Room(room_number=101, room_type='Single', price_per_night=100.0,
+                         status='Available'))
+        manager._commit(session)
+    yield manager
+    manager.engine.dispose()
+
+
+def _night_rates(db, booking_id):
+    with db.session_scope() as session:
+        return [rate for (rate,) in session.query(RoomNight.rate).filter_by(
+            booking_id_fk=booking_id).order_by(RoomNight.night_date)]
+
+
+def _import_reservations(db, tmp_path, lines):
+    path = tmp_path / 'reservations.csv'
+    path.write_text("room_number,guest_email,check_in_date,check_out_date\n" + "".join(lines))
+    return BulkImporter(db).import_files({'reservations': str(path)})['reservations']
+
+
+def test_import_keeps_booked_rates(db, tmp_path):
+    today = date.today()
+    guest = {'first_name': 'Ana', 'last_name': 'Silva', 'email': 'Ana@Example.com',
+             'phone': '', 'address': ''}
+    assert db.check_in_guest(guest, {
+        'room_number': 101, 'check_in_date_str': today.isoformat(),
+        'checkout_date_str': (today + timedelta(days=2)).isoformat(), 'price': 80.0})[0]
+    booked = db.get_room_by_number(101)['reservation'].booking_id
+    assert db.update_room_details(101, {'price_per_night': 150.0})[0]
+
+    stats = _import_reservations(db, tmp_path, [
+        f"101,ana@example.com,{today + timedelta(days=10)},{today + timedelta(days=13)}\n"])
+
+    assert stats['inserted'] == 1
+    assert _night_rates(db, booked) == [80.0, 80.0]
+    with db.session_scope() as session:
+        imported = session.query(Reservation.booking_id).filter(
+            Reservation.booking_id != booked).scalar()
+    assert _night_rates(db, imported) == [150.0, 150.0, 150.0]
+
+
+def test_duplicate_rows_get_no_extra_nights(db, tmp_path):
+    db.check_in_guest({'first_name': 'Ana', 'last_name': 'Silva', 'email': 'ana@example.com',
+                       'phone': '', 'address': ''},
+                      {'room_number': 101, 'check_in_date_str': date.today().isoformat(),
+                       'checkout_date_str': (date.today() + timedelta(days=1)).isoformat()})
+    path = tmp_path / 'reservations.csv'
+    path.write_text("booking_id,room_number,guest_email,check_in_date,check_out_date\n"
+                    "1,101,ana@example.com,2020-01-01,2020-01-05\n"
+                    "2,101,ana@example.com,2020-02-01,2020-02-03\n")
+    stats = BulkImporter(db).import_files({'reservations': str(path)})['reservations']
+
+    assert (stats['inserted'], stats['skipped']) == (1, 1)
+    assert _night_rates(db, 1) == [100.0]
+    assert _night_rates(db, 2) == [100.0, 100.0]
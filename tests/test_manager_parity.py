@@ -0,0 +1,191 @@
+# tests/test_manager_parity.py
+
+"""
+AsyncDBManager is a drop-in for DBManager: the same calls on the same
+database return the same results. Both managers run one script of calls --
+reads, then a check-in, charge and check-out, then the reads again -- each on
+its own copy of a small generated database. Besides the return values, the
+guest arrivals the writes record have to match.
+"""
+
+import asyncio
+import os
+import shutil
+import sqlite3
+import sys
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import func
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_generator import generate
+from db_manager import DBManager, Reservation, Room
+
+MANAGERS = ['DBManager', 'AsyncDBManager']
+
+WRITES = {'check_in_guest', 'add_extra_charge', 'check_out_guest', 'update_room_status'}
+
+# A room no generated stay uses, for the write steps.
+FREE_ROOM = 9000
+
+
+def _parity_steps(db):
+    """
+    The calls both managers make, in order, as (method, args, kwargs). Ids are
+    picked from the database up front, so both runs make exactly the same calls.
+    """
+    today = date.today()
+    rooms = db.get_all_rooms()
+    occupied = next(r['number'] for r in rooms if r['status'] == 'Occupied')
+    with db.session_scope() as session:
+        next_booking = session.query(func.max(Reservation.booking_id)).scalar() + 1
+    _, page = db.get_reservation_history(limit=5)
+    reads = [
+        ('get_room_status', (), {}),
+        ('get_room_status_if_changed', (None,), {}),
+        ('get_room_by_number', (occupied,), {}),
+        ('get_room_by_number', (-1,), {}),
+        ('get_rooms_needing_cleaning', (), {}),
+        ('search_guests', ('',), {'limit': 20}),
+        ('search_guests', ('jo smi',), {}),
+        ('search_guests', ('555',), {'limit': 10}),
+        ('search_guests', ('"*',), {}),
+        ('get_guest_by_id', (1,), {}),
+        ('get_reservation_history', (), {'limit': 50}),
+        ('get_reservation_history', ('an', 'Paid', today - timedelta(days=90), today), {}),
+        ('get_reservation_history', (), {'limit': 20, 'after': page[-1]['cursor']}),
+        ('get_revenue_report', (today - timedelta(days=364), today), {}),
+        ('get_revenue_report', (today, today - timedelta(days=1)), {}),
+        ('get_folio', (next_booking,), {}),
+        ('check_credentials', ('nobody', 'secret'), {}),
+    ]
+    guest = {'first_name': 'Parity', 'last_name': 'Check', 'email': 'parity@test.example',
+             'phone': '', 'address': ''}
+    stay = {'room_number': FREE_ROOM, 'check_in_date_str': today.isoformat(),
+            'checkout_date_str': (today + timedelta(days=3)).isoformat(), 'price': 90.0}
+    writes = [
+        ('check_in_guest', (guest, dict(stay, check_in_date_str='2000-01-01')), {}),
+        ('check_in_guest', (guest, dict(stay, check_in_date_str='not a date')), {}),
+        ('check_in_guest', (guest, stay), {}),
+        ('check_in_guest', (guest, stay), {}),
+        ('add_extra_charge', (FREE_ROOM, next_booking, 'Minibar', 12.5), {}),
+        ('get_folio', (next_booking,), {'rate': 90.0}),
+        ('check_out_guest', (FREE_ROOM, next_booking, 90.0), {}),
+        ('check_out_guest', (FREE_ROOM, -1, 90.0), {}),
+        ('update_room_status', (FREE_ROOM, 'Available'), {}),
+        ('update_room_status', (-1, 'Available'), {}),
+        # Setting a room with a stay in progress Occupied records its guest's arrival.
+        ('update_room_status', (occupied, 'Booked'), {}),
+        ('update_room_status', (occupied, 'Occupied'), {}),
+    ]
+    return reads + writes + reads
+
+
+def _comparable(value):
+    """Results in a form == can compare: ORM rows become dicts of their columns."""
+    if hasattr(value, '__table__'):
+        return {c.name: getattr(value, c.key) for c in value.__table__.columns}
+    if isinstance(value, (list, tuple)):
+        return [_comparable(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _comparable(v) for k, v in value.items()}
+    return value
+
+
+def _sync_results(db_path, steps):
+    db = DBManager(f"sqlite:///{db_path}")
+    try:
+        return [_comparable(getattr(db, name)(*call_args, **call_kwargs))
+                for name, call_args, call_kwargs in steps]
+    finally:
+        db.engine.dispose()
+
+
+async def _async_results(db_path, steps):
+    from async_db_manager import AsyncDBManager
+    db = await AsyncDBManager.open(f"sqlite+aiosqlite:///{db_path}")
+    try:
+        return [_comparable(await getattr(db, name)(*call_args, **call_kwargs))
+                for name, call_args, call_kwargs in steps]
+    finally:
+        await db.dispose()
+
+
+@pytest.fixture(scope='module')
+def template_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('parity') / 'template.db')
+    generate(path, rooms=20, guests=200, reservations=1000, charges=200, days=365, future_days=30)
+    db = DBManager(f"sqlite:///{path}")
+    with db.session_scope(write=True) as session:
+        session.merge(Room(room_number=FREE_ROOM, room_type='Test', description='',
+                           capacity=2, price_per_night=100.0, status='Available'))
+    db.engine.dispose()
+    return path
+
+
+@pytest.fixture(scope='module')
+def steps(template_db):
+    db = DBManager(f"sqlite:///{template_db}")
+    try:
+        return _parity_steps(db)
+    finally:
+        db.engine.dispose()
+
+
+def _arrivals(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            "SELECT booking_id_fk, arrived_on FROM guest_arrivals ORDER BY booking_id_fk").fetchall()
+
+
+def _run(manager, template_db, steps, tmp_path):
+    """
+    Runs the steps through `manager` on a fresh copy of the template database;
+    returns their results and the guest_arrivals rows afterwards.
+    """
+    db_path = str(tmp_path / f"{manager}.db")
+    shutil.copy(template_db, db_path)
+    if manager == 'DBManager':
+        results = _sync_results(db_path, steps)
+    else:
+        results = asyncio.run(_async_results(db_path, steps))
+    return results, _arrivals(db_path)
+
+
+@pytest.fixture(scope='module')
+def reference(template_db, steps, tmp_path_factory):
+    """DBManager's results and arrivals: what every manager has to return."""
+    return _run('DBManager', template_db, steps, tmp_path_factory.mktemp('reference'))
+
+
+@pytest.fixture(params=MANAGERS)
+def run(request, template_db, steps, tmp_path):
+    return _run(request.param, template_db, steps, tmp_path)
+
+
+def test_write_outcomes(run, steps, template_db):
+    """The write script does what it should: bad input and conflicts are refused."""
+    results, arrivals = run
+    # (success, message), except update_room_status's bare bool
+    outcomes = [result[0] if isinstance(result, list) else result
+                for (name, _, _), result in zip(steps, results) if name in WRITES]
+    assert outcomes == [False, False, True, False, True, True, False, True, False, True, True]
+    # The check-in for today and the room set Occupied by hand.
+    assert len(arrivals) == len(_arrivals(template_db)) + 2
+
+
+def test_same_results_as_dbmanager(run, reference, steps):
+    results, _ = run
+    expected_results, _ = reference
+    assert len(results) == len(expected_results) == len(steps)
+    mismatches = [f"step {i} {name}:\n  DBManager: {expected!r}\n  got:       {got!r}"
+                  for i, ((name, _, _), expected, got)
+                  in enumerate(zip(steps, expected_results, results))
+                  if expected != got]
+    assert not mismatches, "\n".join(mismatches)
+
+
+def test_same_arrivals_as_dbmanager(run, reference):
+    assert run[1] == reference[1]
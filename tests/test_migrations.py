@@ -0,0 +1,100 @@
+# tests/test_migrations.py
+
+"""
+Schema migrations: a fresh database and one created before the migrations
+existed both end up on the latest version, and the hot-path queries use the
+indexes migration 1 added for them.
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_manager import SCHEMA_MIGRATIONS, Base, Charge, DBManager, Guest, Reservation, Room, User
+
+# The tables as they were before versioned migrations: no secondary indexes,
+# PRAGMA user_version 0.
+BASELINE_TABLES = [User.__table__, Room.__table__, Guest.__table__,
+                   Reservation.__table__, Charge.__table__]
+
+# (query, parameters, index its plan must use)
+HOT_PATHS = {
+    'room_dates': (
+        "SELECT booking_id FROM reservations "
+        "WHERE room_number_fk = ? AND check_in_date < ? AND check_out_date > ?",
+        (101, '2026-01-10', '2026-01-05'),
+        'ix_reservations_room_dates'),
+    'charge_sum': (
+        "SELECT SUM(amount) FROM charges WHERE reservation_id_fk = ?",
+        (1,),
+        'ix_charges_reservation'),
+    'status_filter': (
+        "SELECT room_number FROM rooms WHERE status = ?",
+        ('Needs Cleaning',),
+        'ix_rooms_status'),
+}
+
+
+@pytest.fixture
+def fresh_db(tmp_path):
+    return f"sqlite:///{tmp_path / 'fresh.db'}"
+
+
+@pytest.fixture
+def old_db(tmp_path):
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine, tables=BASELINE_TABLES)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO rooms (room_number, room_type, price_per_night, status) "
+            "VALUES (101, 'Single', 100.0, 'Occupied')")
+        conn.exec_driver_sql(
+            "INSERT INTO guests (guest_id, first_name, last_name, contact_email) "
+            "VALUES (1, 'Ana', 'Silva', 'ana@example.com')")
+        conn.exec_driver_sql(
+            "INSERT INTO reservations (booking_id, room_number_fk, guest_id_fk, "
+            "check_in_date, check_out_date, is_paid) "
+            "VALUES (1, 101, 1, '2026-01-05', '2026-01-08', 0)")
+        conn.exec_driver_sql(
+            "INSERT INTO charges (reservation_id_fk, room_number_fk, description, amount) "
+            "VALUES (1, 101, 'Minibar', 12.5)")
+    engine.dispose()
+    return url
+
+
+@pytest.fixture(params=['fresh_db', 'old_db'])
+def db(request):
+    manager = DBManager(request.getfixturevalue(request.param))
+    yield manager
+    manager.engine.dispose()
+
+
+def _plan(db, query, params):
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_migrated_to_latest_version(db):
+    assert db.get_schema_version() == SCHEMA_MIGRATIONS[-1][0]
+
+
+@pytest.mark.parametrize('path', sorted(HOT_PATHS))
+def test_hot_path_uses_index(db, path):
+    query, params, index = HOT_PATHS[path]
+    plan = _plan(db, query, params)
+    assert index in plan, plan
+
+
+def test_old_rows_survive_migration(old_db):
+    manager = DBManager(old_db)
+    try:
+        folio = manager.get_folio(1)
+        assert (folio['room_number'], folio['extras']) == (101, 12.5)
+    finally:
+        manager.engine.dispose()
@@ -0,0 +1,214 @@
+# widgets.py
+
+import customtkinter
+
+
+class VirtualTable(customtkinter.CTkFrame):
+    """
+    A scrolling table that only creates widgets for the rows on screen.
+
+    Rows are pulled a page at a time by `fetch_page(last_row, deliver)`, which
+    must eventually call deliver(success, rows_or_error) -- typically from a
+    DBWorker callback. The next page is requested when the user scrolls near
+    the end of what has been loaded, so the cost of the first paint does not
+    depend on how many rows exist.
+
+    `format_row(row)` turns a row into a list of (text, text_color) cells, one
+    per header; text_color may be None for the default colour. If action_text
+    is given, the last header is a column of buttons that call on_action(row).
+    """
+
+    ROW_HEIGHT = 30
+    PREFETCH_ROWS = 20
+
+    def __init__(self, master, headers, col_weights, format_row, page_size=100,
+                 empty_text="No matching rows found.", action_text=None, on_action=None,
+                 **kwargs):
+        super().__init__(master, **kwargs)
+        self.headers = headers
+        self.format_row = format_row
+        self.action_text = action_text
+        self.on_action = on_action
+        self.text_columns = len(headers) - (1 if action_text else 0)
+        self.page_size = page_size
+        self.empty_text = empty_text
+
+        self.fetch_page = None
+        self.rows = []
+        self.exhausted = True
+        self.loading = False
+        self.top_index = 0
+        self._replace_on_page = False
+        # Bumped on every load() so pages from a superseded query are ignored.
+        self._generation = 0
+        self.row_widgets = []
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        header_frame = customtkinter.CTkFrame(self, fg_color="transparent")
+        header_frame.grid(row=0, column=0, sticky="ew", padx=(0, 16))
+        for col, header in enumerate(headers):
+            customtkinter.CTkLabel(header_frame, text=header, font=customtkinter.CTkFont(
+                weight="bold"), anchor="w").grid(row=0, column=col, padx=10, pady=5, sticky="ew")
+            header_frame.grid_columnconfigure(col, weight=col_weights[col], uniform="col")
+
+        self.body = customtkinter.CTkFrame(self, fg_color="transparent")
+        self.body.grid(row=1, column=0, sticky="nsew")
+        for col in range(len(headers)):
+            self.body.grid_columnconfigure(col, weight=col_weights[col], uniform="col")
+
+        self.scrollbar = customtkinter.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+
+        self.message_label = customtkinter.CTkLabel(self.body, text="")
+
+        self.body.bind("<Configure>", lambda event: self._resize_pool(event.height))
+        self._bind_wheel(self.body)
+
+    # --- Public API ---
+
+    def load(self, fetch_page, keep_rows=False):
+        """
+        Starts a new result set and paints its first page when it arrives.
+        With keep_rows the current rows stay on screen until then, which
+        avoids flicker when results are refreshed on every keystroke.
+        """
+        self._generation += 1
+        self.fetch_page = fetch_page
+        self.exhausted = False
+        self.loading = False
+        self._replace_on_page = keep_rows and bool(self.rows)
+        if not self._replace_on_page:
+            self.rows = []
+            self.top_index = 0
+            self._set_message("Loading...")
+        self._render()
+        # Kept rows may already fill the view, so ask for the first page now.
+        self._request_page()
+
+    def show_message(self, text, text_color=None):
+        self._generation += 1
+        self._replace_on_page = False
+        self.rows = []
+        self.exhausted = True
+        self.loading = False
+        self._render()
+        self._set_message(text, text_color)
+
+    def _set_message(self, text, text_color=None):
+        if text:
+            self.message_label.configure(text=text, text_color=text_color)
+            self.message_label.place(relx=0.5, y=20, anchor="n")
+        else:
+            self.message_label.place_forget()
+
+    # --- Paging ---
+
+    def _request_page(self):
+        if self.loading or self.exhausted or self.fetch_page is None:
+            return
+        self.loading = True
+        generation = self._generation
+        last_row = self.rows[-1] if self.rows and not self._replace_on_page else None
+        self.fetch_page(last_row, lambda success, page: self._on_page(
+            generation, success, page))
+
+    def _on_page(self, generation, success, page):
+        if generation != self._generation:
+            return
+        self.loading = False
+        if not success:
+            self.show_message(page, text_color="red")
+            return
+        if self._replace_on_page:
+            self._replace_on_page = False
+            self.rows = []
+            self.top_index = 0
+        self.rows.extend(page)
+        if len(page) < self.page_size:
+            self.exhausted = True
+        self._set_message("" if self.rows else self.empty_text)
+        self._render()
+
+    def _ensure_loaded(self):
+        needed = self.top_index + len(self.row_widgets) + self.PREFETCH_ROWS
+        if len(self.rows) < needed:
+            self._request_page()
+
+    # --- Rendering ---
+
+    def _resize_pool(self, height):
+        visible = max(1, height // self.ROW_HEIGHT)
+        while len(self.row_widgets) < visible:
+            row_idx = len(self.row_widgets)
+            cells = []
+            for col in range(self.text_columns):
+                cell = customtkinter.CTkLabel(self.body, text="", anchor="w", height=self.ROW_HEIGHT - 4)
+                cell.grid(row=row_idx, column=col, padx=10, pady=2, sticky="ew")
+                self._bind_wheel(cell)
+                cells.append(cell)
+            if self.action_text:
+                button = customtkinter.CTkButton(
+                    self.body, text=self.action_text, width=60, height=self.ROW_HEIGHT - 6,
+                    command=lambda offset=row_idx: self._on_action(offset))
+                button.grid(row=row_idx, column=self.text_columns, padx=10, pady=2)
+                self._bind_wheel(button)
+                cells.append(button)
+            self.row_widgets.append(cells)
+        while len(self.row_widgets) > visible:
+            for cell in self.row_widgets.pop():
+                cell.destroy()
+        self._render()
+
+    def _render(self):
+        self._ensure_loaded()
+        max_top = max(0, len(self.rows) - len(self.row_widgets))
+        self.top_index = min(self.top_index, max_top)
+
+        for offset, cells in enumerate(self.row_widgets):
+            index = self.top_index + offset
+            has_row = index < len(self.rows)
+            values = self.format_row(self.rows[index]) if has_row else [("", None)] * self.text_columns
+            for cell, (text, text_color) in zip(cells, values):
+                cell.configure(text=text, text_color=text_color or customtkinter.ThemeManager.theme["CTkLabel"]["text_color"])
+            if self.action_text:
+                # Pooled buttons stay alive; blank rows just hide theirs.
+                if has_row:
+                    cells[-1].grid()
+                else:
+                    cells[-1].grid_remove()
+
+        total = max(1, len(self.rows))
+        first = self.top_index / total
+        last = min(1.0, (self.top_index + len(self.row_widgets)) / total)
+        self.scrollbar.set(first, last)
+
+    def _on_action(self, offset):
+        index = self.top_index + offset
+        if self.on_action and index < len(self.rows):
+            self.on_action(self.rows[index])
+
+    # --- Scrolling ---
+
+    def _scroll_to(self, index):
+        self.top_index = max(0, int(index))
+        self._render()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self._scroll_to(float(args[1]) * len(self.rows))
+        elif args[0] == "scroll":
+            step = len(self.row_widgets) if args[2] == "pages" else 1
+            self._scroll_to(self.top_index + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4 or event.delta > 0:
+            self._scroll_to(self.top_index - 3)
+        else:
+            self._scroll_to(self.top_index + 3)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)
+        widget.bind("<Button-4>", self._on_wheel)
+        widget.bind("<Button-5>", self._on_wheel)